@@ -23,6 +23,16 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Columnas search_vector y sus índices GIN (solo PostgreSQL): los crea
+    # 0010_search_vectors y no están en los modelos
+    if type_ == "column" and name == "search_vector":
+        return False
+    if type_ == "index" and name is not None and name.endswith("_search_vector"):
+        return False
+    return True
+
+
 def run_migrations_offline() -> None:
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
@@ -30,6 +40,18 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_with(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -37,6 +59,12 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
+    # Al arrancar la app, migrations.py pasa su propia conexión
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations_with(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -44,12 +72,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        run_migrations_with(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,132 @@
+"""Baseline schema
+
+Tablas tal como las creaba Base.metadata.create_all antes de las
+migraciones (usuarios, álbumes, canciones, playlists y favoritos). Lo que se
+añadió después tiene su propia revisión encima de esta.
+
+En una base de datos que ya existe: `alembic stamp 0001_baseline` y después
+`alembic upgrade head`. Las revisiones siguientes no recrean las tablas ni
+las columnas que create_all ya hubiera creado.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17 17:50:25.488438
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0001_baseline'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('role', sa.Enum('USER', 'PREMIUM', 'CREATOR', 'ADMIN', name='userrole'), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('profile_picture', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('albums',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('cover_image', sa.String(), nullable=True),
+    sa.Column('release_date', sa.DateTime(), nullable=True),
+    sa.Column('creator_id', sa.Integer(), nullable=False),
+    sa.Column('is_approved', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_albums_id'), 'albums', ['id'], unique=False)
+    op.create_index(op.f('ix_albums_title'), 'albums', ['title'], unique=False)
+    op.create_table('playlists',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('cover_image', sa.String(), nullable=True),
+    sa.Column('is_public', sa.Boolean(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_playlists_id'), 'playlists', ['id'], unique=False)
+    op.create_table('songs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('artist', sa.String(), nullable=False),
+    sa.Column('duration', sa.Integer(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('cover_url', sa.String(), nullable=True),
+    sa.Column('genre', sa.String(), nullable=True),
+    sa.Column('album_id', sa.Integer(), nullable=True),
+    sa.Column('creator_id', sa.Integer(), nullable=False),
+    sa.Column('is_approved', sa.Boolean(), nullable=True),
+    sa.Column('play_count', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['album_id'], ['albums.id'], ),
+    sa.ForeignKeyConstraint(['creator_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_songs_id'), 'songs', ['id'], unique=False)
+    op.create_index(op.f('ix_songs_title'), 'songs', ['title'], unique=False)
+    op.create_table('liked_songs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('song_id', sa.Integer(), nullable=False),
+    sa.Column('liked_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_liked_songs_id'), 'liked_songs', ['id'], unique=False)
+    op.create_table('playlist_songs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('playlist_id', sa.Integer(), nullable=False),
+    sa.Column('song_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['playlist_id'], ['playlists.id'], ),
+    sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_playlist_songs_id'), 'playlist_songs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_playlist_songs_id'), table_name='playlist_songs')
+    op.drop_table('playlist_songs')
+    op.drop_index(op.f('ix_liked_songs_id'), table_name='liked_songs')
+    op.drop_table('liked_songs')
+    op.drop_index(op.f('ix_songs_title'), table_name='songs')
+    op.drop_index(op.f('ix_songs_id'), table_name='songs')
+    op.drop_table('songs')
+    op.drop_index(op.f('ix_playlists_id'), table_name='playlists')
+    op.drop_table('playlists')
+    op.drop_index(op.f('ix_albums_title'), table_name='albums')
+    op.drop_index(op.f('ix_albums_id'), table_name='albums')
+    op.drop_table('albums')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='userrole').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,43 @@
+"""Song renditions
+
+Versiones de cada canción a 64/128/256 kbps (ver transcoding.py).
+
+Revision ID: 0002_song_renditions
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:04.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0002_song_renditions'
+down_revision: Union[str, None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('song_renditions'):
+        return  # Creada por create_all antes de las migraciones
+    op.create_table('song_renditions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('song_id', sa.Integer(), nullable=False),
+    sa.Column('bitrate', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_song_renditions_id'), 'song_renditions', ['id'], unique=False)
+    op.create_index(op.f('ix_song_renditions_song_id'), 'song_renditions', ['song_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_song_renditions_song_id'), table_name='song_renditions')
+    op.drop_index(op.f('ix_song_renditions_id'), table_name='song_renditions')
+    op.drop_table('song_renditions')
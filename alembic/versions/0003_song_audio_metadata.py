@@ -0,0 +1,35 @@
+"""Song audio metadata
+
+Bitrate, frecuencia de muestreo y canales leídos del archivo al subirlo (ver
+audio_metadata.py). Nulas en las canciones que ya existían.
+
+Revision ID: 0003_song_audio_metadata
+Revises: 0002_song_renditions
+Create Date: 2026-10-18 09:24:12.640391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0003_song_audio_metadata'
+down_revision: Union[str, None] = '0002_song_renditions'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ['bitrate', 'sample_rate', 'channels']
+
+
+def upgrade() -> None:
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('songs')}
+    for name in COLUMNS:
+        if name not in existing:  # create_all pudo crear la tabla ya con ellas
+            op.add_column('songs', sa.Column(name, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('songs') as batch_op:
+        for name in reversed(COLUMNS):
+            batch_op.drop_column(name)
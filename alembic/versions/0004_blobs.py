@@ -0,0 +1,44 @@
+"""Content-addressed blobs
+
+Archivos subidos guardados una vez por contenido, con contador de
+referencias (ver blob_store.py).
+
+Revision ID: 0004_blobs
+Revises: 0003_song_audio_metadata
+Create Date: 2026-10-18 09:10:31.502377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0004_blobs'
+down_revision: Union[str, None] = '0003_song_audio_metadata'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('blobs'):
+        return  # Creada por create_all antes de las migraciones
+    op.create_table('blobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('path')
+    )
+    op.create_index(op.f('ix_blobs_id'), 'blobs', ['id'], unique=False)
+    op.create_index(op.f('ix_blobs_sha256'), 'blobs', ['sha256'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_blobs_sha256'), table_name='blobs')
+    op.drop_index(op.f('ix_blobs_id'), table_name='blobs')
+    op.drop_table('blobs')
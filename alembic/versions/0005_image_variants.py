@@ -0,0 +1,43 @@
+"""Cover image variants
+
+Miniaturas de las portadas por tamaño y formato (ver image_derivatives.py).
+
+Revision ID: 0005_image_variants
+Revises: 0004_blobs
+Create Date: 2026-10-18 09:10:52.730941
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0005_image_variants'
+down_revision: Union[str, None] = '0004_blobs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('image_variants'):
+        return  # Creada por create_all antes de las migraciones
+    op.create_table('image_variants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False),
+    sa.Column('bytes', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['blob_id'], ['blobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_image_variants_blob_id'), 'image_variants', ['blob_id'], unique=False)
+    op.create_index(op.f('ix_image_variants_id'), 'image_variants', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_image_variants_id'), table_name='image_variants')
+    op.drop_index(op.f('ix_image_variants_blob_id'), table_name='image_variants')
+    op.drop_table('image_variants')
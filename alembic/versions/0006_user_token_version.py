@@ -0,0 +1,33 @@
+"""User token version
+
+Versión de los tokens de cada usuario: se incrementa al cambiar el rol o
+desactivar la cuenta e invalida los JWT emitidos antes (ver auth.py). Las
+filas existentes empiezan en 0, igual que los tokens que ya circulan.
+
+Revision ID: 0006_user_token_version
+Revises: 0005_image_variants
+Create Date: 2026-10-18 09:31:47.205583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0006_user_token_version'
+down_revision: Union[str, None] = '0005_image_variants'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'token_version' in existing:
+        return  # create_all pudo crear la tabla ya con ella
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,70 @@
+"""Play events and rollups
+
+Eventos de reproducción y sus agregados por hora y por día (ver
+play_events.py).
+
+Revision ID: 0007_play_events
+Revises: 0006_user_token_version
+Create Date: 2026-10-18 09:11:20.264518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0007_play_events'
+down_revision: Union[str, None] = '0006_user_token_version'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    # Cada tabla por separado: create_all pudo crear solo alguna
+    if 'play_events' not in existing:
+        op.create_table('play_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('song_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('played_at', sa.DateTime(), nullable=False),
+        sa.Column('duration_listened', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_play_events_played_at'), 'play_events', ['played_at'], unique=False)
+        op.create_index(op.f('ix_play_events_song_id'), 'play_events', ['song_id'], unique=False)
+        op.create_index(op.f('ix_play_events_user_id'), 'play_events', ['user_id'], unique=False)
+    if 'song_plays_daily' not in existing:
+        op.create_table('song_plays_daily',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('song_id', sa.Integer(), nullable=False),
+        sa.Column('plays', sa.Integer(), nullable=False),
+        sa.Column('listened_seconds', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('day', 'song_id')
+        )
+        op.create_index(op.f('ix_song_plays_daily_song_id'), 'song_plays_daily', ['song_id'], unique=False)
+    if 'song_plays_hourly' not in existing:
+        op.create_table('song_plays_hourly',
+        sa.Column('hour', sa.DateTime(), nullable=False),
+        sa.Column('song_id', sa.Integer(), nullable=False),
+        sa.Column('plays', sa.Integer(), nullable=False),
+        sa.Column('listened_seconds', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('hour', 'song_id')
+        )
+        op.create_index(op.f('ix_song_plays_hourly_song_id'), 'song_plays_hourly', ['song_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_song_plays_hourly_song_id'), table_name='song_plays_hourly')
+    op.drop_table('song_plays_hourly')
+    op.drop_index(op.f('ix_song_plays_daily_song_id'), table_name='song_plays_daily')
+    op.drop_table('song_plays_daily')
+    op.drop_index(op.f('ix_play_events_user_id'), table_name='play_events')
+    op.drop_index(op.f('ix_play_events_song_id'), table_name='play_events')
+    op.drop_index(op.f('ix_play_events_played_at'), table_name='play_events')
+    op.drop_table('play_events')
@@ -0,0 +1,39 @@
+"""Song rankings
+
+Posiciones materializadas de los listados por popularidad (ver rankings.py).
+
+Revision ID: 0008_song_rankings
+Revises: 0007_play_events
+Create Date: 2026-10-18 09:11:43.889012
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0008_song_rankings'
+down_revision: Union[str, None] = '0007_play_events'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('song_rankings'):
+        return  # Creada por create_all antes de las migraciones
+    op.create_table('song_rankings',
+    sa.Column('song_id', sa.Integer(), nullable=False),
+    sa.Column('trending_score', sa.Float(), nullable=False),
+    sa.Column('trending_rank', sa.Integer(), nullable=False),
+    sa.Column('play_count_rank', sa.Integer(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['song_id'], ['songs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('song_id'),
+    sa.UniqueConstraint('play_count_rank'),
+    sa.UniqueConstraint('trending_rank')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('song_rankings')
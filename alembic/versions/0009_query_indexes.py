@@ -0,0 +1,61 @@
+"""Indexes for the route queries
+
+Índices para las consultas de routes/ que recorrían tablas enteras. Los
+modelos declaran los mismos índices, así que una base creada con create_all
+antes de las migraciones (o por un backend que aún creaba al arrancar los
+índices que faltaban) puede tenerlos ya cuando se marca en 0001_baseline: por
+eso se crean con IF NOT EXISTS. En PostgreSQL van con CONCURRENTLY para no
+bloquear las escrituras mientras se construyen sobre tablas grandes.
+scripts/check_query_plans.py comprueba los planes con EXPLAIN.
+
+Revision ID: 0009_query_indexes
+Revises: 0008_song_rankings
+Create Date: 2026-10-17 17:50:54.833792
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0009_query_indexes'
+down_revision: Union[str, None] = '0008_song_rankings'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nombre, tabla, columnas)
+INDEXES = [
+    # GET /songs/ paginado por cursor: un índice por orden (ver pagination.py)
+    ('ix_songs_approved_play_count', 'songs', ['is_approved', 'play_count', 'id']),
+    ('ix_songs_approved_title', 'songs', ['is_approved', 'title', 'id']),
+    ('ix_songs_approved_id', 'songs', ['is_approved', 'id']),
+    # GET /albums/ y canciones de un álbum (selectinload de Album.songs)
+    ('ix_albums_approved_id', 'albums', ['is_approved', 'id']),
+    ('ix_songs_album_id', 'songs', ['album_id']),
+    # Contenido de un creador (y cascada al borrar el usuario)
+    ('ix_songs_creator_id', 'songs', ['creator_id']),
+    ('ix_albums_creator_id', 'albums', ['creator_id']),
+    # DELETE /songs/{id} y /albums/{id}: ¿otra canción usa el mismo archivo?
+    ('ix_songs_file_path', 'songs', ['file_path']),
+    # Favoritos: listado paginado, like/unlike/is-liked y cascada al borrar la canción
+    ('ix_liked_songs_user_id', 'liked_songs', ['user_id', 'id']),
+    ('ix_liked_songs_user_song', 'liked_songs', ['user_id', 'song_id']),
+    ('ix_liked_songs_song_id', 'liked_songs', ['song_id']),
+    # Playlists: las del usuario, sus canciones en orden y duplicados
+    ('ix_playlists_owner_id', 'playlists', ['owner_id']),
+    ('ix_playlist_songs_playlist_position', 'playlist_songs', ['playlist_id', 'position']),
+    ('ix_playlist_songs_playlist_song', 'playlist_songs', ['playlist_id', 'song_id']),
+    ('ix_playlist_songs_song_id', 'playlist_songs', ['song_id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,63 @@
+"""Full-text search vectors
+
+Columnas generadas search_vector (tsvector, configuración 'simple') con un
+índice GIN en songs, albums y users, para la búsqueda de search_index.py.
+Solo en PostgreSQL 12+ (GENERATED ALWAYS ... STORED); en otros motores la
+búsqueda usa LIKE y esta revisión no hace nada.
+
+No están en los modelos: env.py las excluye de la comparación de
+autogenerate.
+
+Revision ID: 0010_search_vectors
+Revises: 0009_query_indexes
+Create Date: 2026-10-18 09:52:36.917420
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0010_search_vectors'
+down_revision: Union[str, None] = '0009_query_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# tabla -> expresión del tsvector (A pesa más que B, y B más que C)
+SEARCH_VECTORS = {
+    'songs': (
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(artist, '')), 'B')"
+    ),
+    'albums': (
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ),
+    'users': "setweight(to_tsvector('simple', coalesce(username, '')), 'A')",
+}
+
+
+def supported() -> bool:
+    bind = op.get_bind()
+    return bind.dialect.name == 'postgresql' and bind.dialect.server_version_info >= (12,)
+
+
+def upgrade() -> None:
+    if not supported():
+        return
+    # IF NOT EXISTS: antes las creaba la app al arrancar
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    if not supported():
+        return
+    for table in reversed(list(SEARCH_VECTORS)):
+        op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,38 @@
+"""Drop song_rankings.play_count_rank
+
+order_by=play_count ya no lee el ranking materializado: el índice
+(is_approved, play_count, id) lo sirve al momento y sin esperar al
+siguiente recálculo.
+
+Revision ID: 0011_drop_play_count_rank
+Revises: 0010_search_vectors
+Create Date: 2026-10-18 10:41:09.553172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0011_drop_play_count_rank'
+down_revision: Union[str, None] = '0010_search_vectors'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('song_rankings')}
+    if 'play_count_rank' not in existing:
+        return
+    # El ranking se recalcula entero en cada refresco: no hace falta conservarlo
+    op.execute('DELETE FROM song_rankings')
+    with op.batch_alter_table('song_rankings') as batch_op:
+        batch_op.drop_column('play_count_rank')
+
+
+def downgrade() -> None:
+    op.execute('DELETE FROM song_rankings')
+    with op.batch_alter_table('song_rankings') as batch_op:
+        batch_op.add_column(sa.Column('play_count_rank', sa.Integer(), nullable=False))
+        batch_op.create_unique_constraint('song_rankings_play_count_rank_key', ['play_count_rank'])
@@ -0,0 +1,53 @@
+"""Blob references per row
+
+Cada fila que guarda la URL de un archivo (songs.file_path y cover_url,
+albums.cover_image, users.profile_picture) tiene su propia referencia en
+blobs, y unclaimed cuenta las subidas que aún no tomó ninguna fila (ver
+blob_store.py). Los contadores existentes solo contaban subidas: un álbum
+subido de una vez dejaba su portada con 1 referencia para N canciones más el
+álbum. Se recalculan a partir de las filas; lo que sobra queda como subidas
+pendientes.
+
+ix_songs_file_path solo servía para comprobar al borrar si otra canción
+usaba el mismo archivo, que ahora resuelve el contador.
+
+Revision ID: 0012_blob_row_references
+Revises: 0011_drop_play_count_rank
+Create Date: 2026-10-18 12:02:37.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0012_blob_row_references'
+down_revision: Union[str, None] = '0011_drop_play_count_rank'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROW_REFERENCES = (
+    "(SELECT count(*) FROM songs WHERE songs.file_path = blobs.path)"
+    " + (SELECT count(*) FROM songs WHERE songs.cover_url = blobs.path)"
+    " + (SELECT count(*) FROM albums WHERE albums.cover_image = blobs.path)"
+    " + (SELECT count(*) FROM users WHERE users.profile_picture = blobs.path)"
+)
+
+
+def upgrade() -> None:
+    existing = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('blobs')}
+    if 'unclaimed' not in existing:
+        op.add_column('blobs', sa.Column('unclaimed', sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            f"UPDATE blobs SET unclaimed = CASE WHEN ref_count > {ROW_REFERENCES}"
+            f" THEN ref_count - ({ROW_REFERENCES}) ELSE 0 END"
+        )
+        op.execute(f"UPDATE blobs SET ref_count = {ROW_REFERENCES} + unclaimed")
+    op.drop_index('ix_songs_file_path', table_name='songs', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_songs_file_path', 'songs', ['file_path'], unique=False, if_not_exists=True)
+    with op.batch_alter_table('blobs') as batch_op:
+        batch_op.drop_column('unclaimed')
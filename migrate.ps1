@@ -6,9 +6,6 @@ $projectRoot = Split-Path -Parent $MyInvocation.MyCommand.Path
 
 & "$projectRoot\venv\Scripts\Activate.ps1"
 
-Write-Host "Generating migration..." -ForegroundColor Yellow
-alembic revision --autogenerate -m "Initial migration"
-
 Write-Host "Applying migrations..." -ForegroundColor Yellow
 alembic upgrade head
 
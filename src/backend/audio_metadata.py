@@ -0,0 +1,272 @@
+"""
+Extracción de metadatos técnicos de archivos de audio (MP3, OGG, WAV).
+
+Lee directamente las cabeceras del archivo, sin dependencias externas:
+- MP3: cabecera Xing/Info o VBRI cuando existe; si no, cuenta los frames.
+- WAV: chunks fmt y data del contenedor RIFF.
+- OGG: cabecera de identificación Vorbis/Opus y granule position de la última página.
+
+El parseo corre en el pool de procesos, y sus resultados (duración real, bitrate,
+sample rate y canales) se guardan en la canción, reemplazando la duración enviada
+por el cliente.
+"""
+import asyncio
+import logging
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from database import SessionLocal
+from models import Song
+from streaming import resolve_upload_path
+from transcoding import get_executor
+
+logger = logging.getLogger(__name__)
+
+AudioInfo = Dict[str, Union[int, float]]
+
+# Tablas de la cabecera de frame MPEG (kbps), indexadas por (versión MPEG-1?, capa)
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+
+def _parse_frame_header(data, offset: int) -> Optional[dict]:
+    """Interpreta la cabecera de 4 bytes de un frame MPEG; None si no es válida"""
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        "mpeg1": mpeg1,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "samples": samples,
+        "length": length,
+    }
+
+
+def _skip_id3v2(data) -> int:
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_first_frame(data, offset: int) -> Optional[int]:
+    """Busca el primer frame válido, confirmando que le sigue otro frame"""
+    while True:
+        offset = data.find(b"\xff", offset)
+        if offset < 0:
+            return None
+        header = _parse_frame_header(data, offset)
+        if header is not None:
+            following = offset + header["length"]
+            if following + 4 > len(data) or _parse_frame_header(data, following) is not None:
+                return offset
+        offset += 1
+
+
+def _parse_mp3(data) -> Optional[AudioInfo]:
+    start = _find_first_frame(data, _skip_id3v2(data))
+    if start is None:
+        return None
+    first = _parse_frame_header(data, start)
+    end = len(data) - 128 if len(data) >= 128 and data[-128:-125] == b"TAG" else len(data)
+
+    # Cabecera Xing/Info (VBR y CBR de LAME) dentro del primer frame
+    if first["mpeg1"]:
+        side_info = 17 if first["channels"] == 1 else 32
+    else:
+        side_info = 9 if first["channels"] == 1 else 17
+    xing = start + 4 + side_info
+    frames = None
+    audio_bytes = None
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        position = xing + 8
+        if flags & 0x01:
+            frames = struct.unpack_from(">I", data, position)[0]
+            position += 4
+        if flags & 0x02:
+            audio_bytes = struct.unpack_from(">I", data, position)[0]
+    elif data[start + 36:start + 40] == b"VBRI":
+        audio_bytes, frames = struct.unpack_from(">II", data, start + 46)
+
+    if not frames:
+        # Sin cabecera VBR: contar los frames uno por uno
+        frames = 0
+        offset = start
+        audio_bytes = 0
+        while offset + 4 <= end:
+            header = _parse_frame_header(data, offset)
+            if header is None:
+                offset = data.find(b"\xff", offset + 1, end)
+                if offset < 0:
+                    break
+                continue
+            frames += 1
+            audio_bytes += header["length"]
+            offset += header["length"]
+
+    duration = frames * first["samples"] / first["sample_rate"]
+    if duration <= 0:
+        return None
+    if not audio_bytes:
+        audio_bytes = end - start
+    return {
+        "duration": duration,
+        "bitrate": int(round(audio_bytes * 8 / duration / 1000)),
+        "sample_rate": first["sample_rate"],
+        "channels": first["channels"],
+    }
+
+
+def _parse_wav(data) -> Optional[AudioInfo]:
+    offset = 12
+    channels = sample_rate = byte_rate = None
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b"fmt " and chunk_size >= 16:
+            _, channels, sample_rate, byte_rate = struct.unpack_from("<HHII", data, body)
+        elif chunk_id == b"data" and byte_rate:
+            # Algunos encoders dejan el tamaño en 0 o truncado; acotar al archivo
+            data_size = min(chunk_size, len(data) - body) if chunk_size else len(data) - body
+            return {
+                "duration": data_size / byte_rate,
+                "bitrate": int(round(byte_rate * 8 / 1000)),
+                "sample_rate": sample_rate,
+                "channels": channels,
+            }
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _parse_ogg(data) -> Optional[AudioInfo]:
+    segments = data[26]
+    packet = 27 + segments
+    if data[packet:packet + 7] == b"\x01vorbis":
+        channels = data[packet + 11]
+        sample_rate = struct.unpack_from("<I", data, packet + 12)[0]
+        granule_rate, pre_skip = sample_rate, 0
+    elif data[packet:packet + 8] == b"OpusHead":
+        channels = data[packet + 9]
+        pre_skip = struct.unpack_from("<H", data, packet + 10)[0]
+        sample_rate = struct.unpack_from("<I", data, packet + 12)[0] or 48000
+        granule_rate = 48000  # Opus siempre cuenta granules a 48 kHz
+    else:
+        return None
+
+    last_page = data.rfind(b"OggS")
+    granule = struct.unpack_from("<q", data, last_page + 6)[0]
+    duration = (granule - pre_skip) / granule_rate
+    if duration <= 0 or not sample_rate:
+        return None
+    return {
+        "duration": duration,
+        "bitrate": int(round(len(data) * 8 / duration / 1000)),
+        "sample_rate": sample_rate,
+        "channels": channels,
+    }
+
+
+def read_audio_info(path: Union[str, Path]) -> Optional[AudioInfo]:
+    """
+    Retorna duración (segundos), bitrate (kbps), sample rate y canales del archivo,
+    o None si el formato no se reconoce. Se ejecuta en un proceso del pool.
+    """
+    with open(path, "rb") as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None  # Archivo vacío
+    with data:
+        try:
+            if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+                return _parse_wav(data)
+            if data[:4] == b"OggS":
+                return _parse_ogg(data)
+            return _parse_mp3(data)
+        except (struct.error, IndexError, ZeroDivisionError):
+            return None
+
+
+async def read_audio_info_async(path: Union[str, Path]) -> Optional[AudioInfo]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), read_audio_info, str(path))
+
+
+def apply_audio_info(song: Song, info: AudioInfo) -> None:
+    song.duration = max(1, int(round(info["duration"])))
+    song.bitrate = info["bitrate"]
+    song.sample_rate = info["sample_rate"]
+    song.channels = info["channels"]
+
+
+async def extract_song_metadata(song_id: int) -> None:
+    """Lee el audio de la canción y guarda sus metadatos reales en la fila"""
+    # Importación diferida: routes.upload programa esta tarea
+    from routes.upload import UPLOAD_DIR
+
+    db = SessionLocal()
+    try:
+        song = db.query(Song).filter(Song.id == song_id).first()
+        source = resolve_upload_path(UPLOAD_DIR, song.file_path) if song else None
+    finally:
+        db.close()
+
+    if source is None or not source.is_file():
+        return
+
+    info = await read_audio_info_async(source)
+    if info is None:
+        logger.warning("No se reconoció el formato de audio de la canción %s", song_id)
+        return
+
+    db = SessionLocal()
+    try:
+        song = db.query(Song).filter(Song.id == song_id).first()
+        if song is None:
+            return
+        apply_audio_info(song, info)
+        db.commit()
+    finally:
+        db.close()
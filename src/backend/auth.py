@@ -1,12 +1,26 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional
 from config import settings
 from schemas import TokenData
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt tarda ~100-300 ms por llamada y bloquearía el event loop (streams
+# incluidos). Se ejecuta en un pool de hilos propio (bcrypt libera el GIL) y
+# el semáforo limita los cálculos en curso: el resto espera en el event loop,
+# sin ocupar hilos, y si la espera supera PASSWORD_HASH_QUEUE_TIMEOUT se
+# responde 503 en lugar de acumular logins. Un semáforo de asyncio solo sirve
+# en el event loop en que se usa por primera vez: hay uno por loop (TestClient
+# y los tests abren loops nuevos).
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -16,6 +30,56 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+        )
+    return _hash_executor
+
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+
+def get_hash_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _hash_slots.get(loop)
+    if slots is None:
+        slots = _hash_slots[loop] = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+    return slots
+
+
+async def _run_hash(fn: Callable, *args):
+    slots = get_hash_slots()
+    try:
+        await asyncio.wait_for(slots.acquire(), timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_hash_executor(), fn, *args)
+    finally:
+        slots.release()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() sin bloquear el event loop"""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() sin bloquear el event loop"""
+    return await _run_hash(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -27,12 +91,34 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def create_user_token(user, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Token con el id, el rol y la versión de token del usuario, para autorizar
+    sin cargar la fila completa (ver dependencies.get_current_principal)
+    """
+    return create_access_token(
+        data={
+            "sub": user.email,
+            "uid": user.id,
+            "role": user.role.value,
+            "ver": user.token_version or 0,
+        },
+        expires_delta=expires_delta,
+    )
+
+
 def verify_token(token: str) -> Optional[TokenData]:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             return None
-        return TokenData(email=email)
+        # Los tokens anteriores solo traen "sub": equivalen a la versión 0
+        return TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            role=payload.get("role"),
+            token_version=payload.get("ver", 0),
+        )
     except JWTError:
         return None
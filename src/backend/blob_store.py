@@ -0,0 +1,213 @@
+"""
+Almacenamiento direccionado por contenido para los archivos subidos.
+
+Cada archivo se guarda una sola vez con su SHA-256 como nombre
+(uploads/songs/<sha256>.mp3) y la tabla blobs cuenta sus referencias. Subir
+de nuevo un archivo idéntico no ocupa disco: se borra la copia recién
+recibida y se incrementa el contador.
+
+Cada subida aporta una referencia pendiente (unclaimed). Cada fila que guarda
+la URL (songs.file_path y cover_url, albums.cover_image,
+users.profile_picture) tiene la suya: al crearse toma una pendiente con
+claim() o suma una nueva, y al borrarse o cambiar de archivo la suelta con
+release(). Un álbum subido con N canciones deja su portada con N + 1
+referencias. El archivo solo se borra del disco cuando el contador llega a
+cero. discard() descarta una subida que ninguna fila llegó a usar.
+
+Los archivos anteriores a este esquema (nombres uuid, sin fila en blobs) no
+llevan contador: release() los conserva y discard() los borra directamente.
+
+Las miniaturas de una portada (image_derivatives.py) cuelgan de su fila y se
+borran con ella.
+
+El archivo recibido se publica en el backend de almacenamiento (storage.py);
+con el backend local ya está en su sitio y no se copia.
+"""
+import os
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from image_derivatives import remove_variant_files
+from models import Blob
+from storage import UPLOAD_DIR, storage, storage_key
+from streaming import invalidate_cached_file
+from upload_stream import StoredFile
+
+
+def put(db: Session, stored: StoredFile) -> StoredFile:
+    """
+    Registra un archivo recién recibido. Retorna el StoredFile apuntando a la
+    copia única (que puede ser una ya existente, subida antes por cualquiera).
+    """
+    try:
+        blob = db.query(Blob).filter(Blob.sha256 == stored.sha256).with_for_update().first()
+        if blob is not None and _exists(blob.path):
+            blob.ref_count += 1
+            blob.unclaimed += 1
+            db.commit()
+            return _reuse(stored, blob)
+
+        final_path = stored.path.parent / f"{stored.sha256}{stored.path.suffix}"
+        os.replace(stored.path, final_path)
+        stored = replace(stored, path=final_path)
+        storage.put_file(storage_key(final_path), final_path, stored.content_type)
+        if blob is not None:
+            # La fila existía pero el archivo se perdió: se repone con esta copia
+            blob.path = stored.url
+            blob.ref_count += 1
+            blob.unclaimed += 1
+        else:
+            db.add(Blob(
+                sha256=stored.sha256,
+                path=stored.url,
+                size=stored.size,
+                content_type=stored.content_type,
+                ref_count=1,
+                unclaimed=1,
+            ))
+        db.commit()
+        return stored
+    except IntegrityError:
+        # Otra petición registró el mismo contenido a la vez; sumar una referencia
+        db.rollback()
+        blob = db.query(Blob).filter(Blob.sha256 == stored.sha256).with_for_update().one()
+        blob.ref_count += 1
+        blob.unclaimed += 1
+        db.commit()
+        return _reuse(stored, blob)
+    except Exception:
+        db.rollback()
+        stored.path.unlink(missing_ok=True)
+        raise
+
+
+def put_many(db: Session, files: List[StoredFile]) -> List[StoredFile]:
+    """put() de varios archivos; si uno falla, libera los ya registrados y borra el resto"""
+    stored: List[StoredFile] = []
+    try:
+        for item in files:
+            stored.append(put(db, item))
+    except Exception:
+        for item in files[len(stored) + 1:]:
+            item.path.unlink(missing_ok=True)
+        discard_many(db, [item.url for item in stored])
+        raise
+    return stored
+
+
+def claim(db: Session, url: Optional[str]) -> None:
+    """
+    Referencia de una fila que empieza a guardar `url`: toma la pendiente de
+    una subida o, si no queda ninguna, suma una. No confirma: va en la misma
+    transacción que crea o modifica la fila.
+    """
+    blob = _locked(db, url)
+    if blob is None:
+        return
+    if blob.unclaimed > 0:
+        blob.unclaimed -= 1
+    else:
+        blob.ref_count += 1
+    db.flush()
+
+
+def release(db: Session, url: Optional[str]) -> bool:
+    """
+    Suelta la referencia de una fila que ya no guarda `url` (se borró o cambió
+    de archivo). Retorna True si era la última y el archivo se borró.
+    """
+    blob = _locked(db, url)
+    if blob is None:
+        return False
+    return _drop_reference(db, blob)
+
+
+def release_many(db: Session, urls: List[Optional[str]]) -> List[str]:
+    """release() de varias URLs; retorna las que se borraron"""
+    return [url for url in urls if release(db, url)]
+
+
+def discard(db: Session, url: str) -> bool:
+    """
+    Descarta una subida que ninguna fila llegó a usar. Lanza BlobInUse si todas
+    sus referencias son de filas. Retorna True si el archivo se borró.
+    """
+    key = storage_key(url)
+    if key is None:
+        return False
+    blob = _locked(db, url)
+    if blob is None:
+        _delete_file(key, [])
+        return True
+    if blob.unclaimed <= 0:
+        db.rollback()
+        raise BlobInUse(url)
+    blob.unclaimed -= 1
+    return _drop_reference(db, blob)
+
+
+def discard_many(db: Session, urls: List[str]) -> None:
+    for url in urls:
+        discard(db, url)
+
+
+class BlobInUse(Exception):
+    """El archivo lo usan canciones, álbumes o usuarios y no se puede descartar"""
+
+
+def _locked(db: Session, url: Optional[str]) -> Optional[Blob]:
+    key = storage_key(url) if url else None
+    if key is None:
+        return None
+    return db.query(Blob).filter(Blob.path == f"/uploads/{key}").with_for_update().first()
+
+
+def _drop_reference(db: Session, blob: Blob) -> bool:
+    blob.ref_count -= 1
+    if blob.ref_count > 0:
+        db.commit()
+        return False
+    key = storage_key(blob.path)
+    variant_paths = [variant.file_path for variant in blob.variants]
+    db.delete(blob)
+    db.commit()
+    return _delete_file(key, variant_paths)
+
+
+def _delete_file(key: str, variant_paths: List[str]) -> bool:
+    remove_variant_files(variant_paths)
+    path = UPLOAD_DIR / key
+    invalidate_cached_file(path)
+    deleted = storage.delete(key)
+    path.unlink(missing_ok=True)  # Copia de trabajo cuando el backend es remoto
+    return deleted
+
+
+def _reuse(stored: StoredFile, blob: Blob) -> StoredFile:
+    """
+    Apunta el archivo recibido a la copia existente. Si este nodo no la tiene en
+    disco (backend remoto) lo recibido se conserva como copia de trabajo para el
+    pipeline de procesamiento; si la tiene, lo recibido sobra.
+    """
+    existing = _local_path(blob.path)
+    if stored.path != existing:
+        if existing.exists():
+            stored.path.unlink(missing_ok=True)
+        else:
+            os.replace(stored.path, existing)
+    return replace(stored, path=existing)
+
+
+def _local_path(url: str) -> Optional[Path]:
+    """Ruta relativa a UPLOAD_DIR (como las de StoredFile) o None si sale de uploads"""
+    key = storage_key(url)
+    return UPLOAD_DIR / key if key is not None else None
+
+
+def _exists(url: str) -> bool:
+    key = storage_key(url)
+    return key is not None and storage.stat(key) is not None
@@ -15,10 +15,29 @@ class Settings(BaseSettings):
     DB_NAME: str
     DB_USER: str
     DB_PASSWORD: str
+    # alembic upgrade head al arrancar; false si se migra en un paso aparte (varios workers)
+    DB_MIGRATE_ON_STARTUP: bool = True
+    # Sesiones asíncronas en las rutas (asyncpg/aiosqlite); false = Session síncrona en hilos
+    DB_ASYNC: bool = True
+    # Pool de conexiones (por proceso y por motor)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # Segundos de vida de una conexión; -1 = sin límite
+    DB_POOL_PRE_PING: bool = True  # SELECT 1 en cada checkout
+    DB_POOL_VALIDATE_SECONDS: int = 0  # >0: validar las conexiones libres en segundo plano
+    DB_POOL_LOG_SECONDS: int = 0  # >0: escribir el estado de los pools en el log
     
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Caché del usuario autenticado (0 = desactivado); con Redis se comparte entre workers
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_REDIS_URL: Optional[str] = None
+    # bcrypt en un pool de hilos: cálculos simultáneos y espera máxima por un hueco
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_TIMEOUT: int = 10  # Segundos; después se responde 503
     
     BACKEND_HOST: str = "0.0.0.0"
     BACKEND_PORT: int = 8000
@@ -28,6 +47,42 @@ class Settings(BaseSettings):
     
     MAX_FILE_SIZE: int = 10485760
     UPLOAD_DIR: str = "./uploads"
+    # Subidas reanudables: tamaño de cada trozo y vida de una sesión sin terminar
+    UPLOAD_CHUNK_SIZE: int = 5 * 1024 * 1024  # 5 MB
+    UPLOAD_SESSION_TTL_HOURS: int = 24
+    UPLOAD_SESSIONS_DIR: Optional[str] = None  # Por defecto upload_sessions/ junto a UPLOAD_DIR
+    
+    # Almacenamiento de archivos: "local" (UPLOAD_DIR) o "s3" (S3/MinIO)
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = "p-music"
+    S3_ENDPOINT_URL: Optional[str] = None  # p. ej. http://localhost:9000 para MinIO
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+    S3_REGION: str = "us-east-1"
+    S3_PRESIGN_SECONDS: int = 3600  # 0 = la API hace de proxy en lugar de redirigir
+    
+    # Streaming: número máximo de archivos de audio abiertos en caché
+    FILE_CACHE_SIZE: int = 128
+    # Conjunto de canciones más reproducidas mapeadas en memoria (mmap)
+    HOT_SET_SIZE: int = 20
+    HOT_SET_MAX_BYTES: int = 256 * 1024 * 1024  # 256 MB
+    HOT_SET_REFRESH_SECONDS: int = 300
+    
+    # Transcodificación a varias calidades (requiere ffmpeg instalado)
+    FFMPEG_PATH: str = "ffmpeg"
+    TRANSCODE_WORKERS: int = 2
+    HLS_SEGMENT_SECONDS: int = 6
+    PEAKS_BUCKETS: int = 1024  # Valores de la forma de onda precomputada
+    
+    # Reproducciones acumuladas en memoria y escritas en lote (0 = un UPDATE por reproducción)
+    PLAY_COUNTER_FLUSH_SECONDS: int = 2
+    PLAY_COUNTER_JOURNAL: Optional[str] = None  # Archivo local para no perderlas si el proceso cae (uno por pid)
+    # Ranking materializado para order_by=trending (0 = ordenar por play_count en cada petición)
+    TRENDING_REFRESH_SECONDS: int = 300
+    TRENDING_WINDOW_HOURS: int = 168  # Reproducciones recientes que cuentan para la puntuación
+    TRENDING_HALF_LIFE_HOURS: float = 24.0  # Una reproducción vale la mitad cada N horas
+    # Índice de sugerencias en memoria: reconstrucción completa cada N segundos (0 = solo al arrancar)
+    SUGGEST_REBUILD_SECONDS: int = 3600
     
     class Config:
         env_file = str(ENV_FILE)
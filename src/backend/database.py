@@ -1,16 +1,197 @@
+"""
+Conexión a la base de datos.
+
+Las rutas reciben por get_db una sesión con la interfaz de AsyncSession
+(`await db.execute(select(...))`, `await db.commit()`, ...):
+
+- DB_ASYNC=true (por defecto): AsyncSession sobre el driver asíncrono
+  (asyncpg para PostgreSQL, aiosqlite para SQLite). Las consultas no
+  bloquean el event loop.
+- DB_ASYNC=false, o si el driver asíncrono no está instalado: la Session
+  síncrona de siempre envuelta en ThreadedSession, que ejecuta cada operación
+  en el pool de hilos.
+
+El código síncrono existente (blob_store, tareas de fondo, scripts) sigue
+usando `engine` y `SessionLocal`; desde una ruta se llama con
+`await db.run_sync(funcion, ...)`, que le pasa una Session síncrona.
+
+El tamaño de los pools y su validación se configuran con DB_POOL_* (ver
+db_pool.py).
+"""
+import asyncio
+import importlib.util
+import logging
+from typing import Any, Callable, Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+
 from config import settings
+from db_pool import (
+    engine_options,
+    pool_stats,
+    validate_idle_connections,
+    validate_idle_connections_async,
+    watch_invalidations,
+)
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+logger = logging.getLogger(__name__)
+
+# Driver asíncrono por backend síncrono
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, "sync"))
+watch_invalidations(engine, "sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
-def get_db():
-    db = SessionLocal()
+def async_database_url(url: str) -> Optional[str]:
+    """
+    DATABASE_URL con el driver asíncrono (postgresql+asyncpg://...), o None si
+    el backend no tiene uno conocido o no está instalado
+    """
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None or importlib.util.find_spec(driver) is None:
+        return None
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+class ThreadedSession:
+    """
+    Session síncrona con la interfaz de AsyncSession que usan las rutas. Cada
+    operación con E/S corre en el pool de hilos; los resultados se leen
+    completos en el hilo (como hace AsyncSession) para no tocar el cursor
+    desde el event loop.
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def add_all(self, instances) -> None:
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        def run():
+            return self.sync_session.execute(statement, *args, **kwargs).freeze()
+        return (await run_in_threadpool(run))()
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return (await self.execute(statement, *args, **kwargs)).scalars()
+
+    async def get(self, entity, ident, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, entity, ident, **kwargs)
+
+    async def merge(self, instance: Any, load: bool = True) -> Any:
+        return await run_in_threadpool(self.sync_session.merge, instance, load=load)
+
+    async def refresh(self, instance: Any, attribute_names=None) -> None:
+        await run_in_threadpool(self.sync_session.refresh, instance, attribute_names)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def run_sync(self, fn: Callable, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+# Sin expirar al confirmar: con AsyncSession leer un atributo expirado haría
+# E/S implícita, y ambos modos deben comportarse igual
+ThreadedSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL) if settings.DB_ASYNC else None
+if settings.DB_ASYNC and ASYNC_DATABASE_URL is None:
+    logger.warning("Driver asíncrono no disponible para %s; se usa la sesión síncrona en hilos",
+                   make_url(settings.DATABASE_URL).get_backend_name())
+
+async_engine = (
+    create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, "async", is_async=True))
+    if ASYNC_DATABASE_URL else None
+)
+if async_engine is not None:
+    watch_invalidations(async_engine.sync_engine, "async")
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if async_engine is not None else None
+)
+
+
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    db = ThreadedSession(ThreadedSessionLocal())
     try:
         yield db
     finally:
-        db.close()
+        await db.close()
+
+
+def engines() -> dict:
+    result = {"sync": engine}
+    if async_engine is not None:
+        result["async"] = async_engine
+    return result
+
+
+def database_pool_stats() -> dict:
+    """Estado y contadores de cada pool (las rutas usan "async" si está activo)"""
+    return pool_stats(engines())
+
+
+async def run_pool_validator() -> None:
+    """Tarea de fondo que valida las conexiones libres cada DB_POOL_VALIDATE_SECONDS"""
+    if settings.DB_POOL_VALIDATE_SECONDS <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.DB_POOL_VALIDATE_SECONDS)
+        try:
+            if async_engine is not None:
+                await validate_idle_connections_async(async_engine, "async")
+            await asyncio.to_thread(validate_idle_connections, engine, "sync")
+        except Exception:
+            logger.exception("Error al validar las conexiones del pool")
+
+
+async def run_pool_stats_logger() -> None:
+    """Tarea de fondo que escribe el estado de los pools cada DB_POOL_LOG_SECONDS"""
+    if settings.DB_POOL_LOG_SECONDS <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.DB_POOL_LOG_SECONDS)
+        for name, stats in database_pool_stats().items():
+            logger.info("Pool %s: %s", name, stats)
+
+
+async def dispose_engines() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,169 @@
+"""
+Pool de conexiones a la base de datos: tamaño configurable, métricas y
+validación en segundo plano.
+
+pool_pre_ping hace un SELECT 1 en cada checkout, es decir, una ida y vuelta
+extra por petición. Con DB_POOL_PRE_PING=false y DB_POOL_VALIDATE_SECONDS>0
+las conexiones libres se validan periódicamente desde una tarea de fondo: la
+que esté rota se descarta antes de que la use una petición.
+
+Los pools llevan contadores (checkouts, esperas, timeouts, invalidaciones)
+que se consultan en /health/db o se escriben en el log cada
+DB_POOL_LOG_SECONDS, para ajustar DB_POOL_SIZE y DB_MAX_OVERFLOW por despliegue.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Tuple, Type, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from config import settings
+
+WAIT_SAMPLES = 1024  # Esperas recientes usadas para los percentiles
+
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits: "deque[float]" = deque(maxlen=WAIT_SAMPLES)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.validations = 0
+        self.validation_failures = 0
+
+    def record_wait(self, seconds: float, timed_out: bool) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self._waits.append(seconds * 1000)
+
+    def record_invalidation(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def record_validation(self, checked: int, failed: int) -> None:
+        with self._lock:
+            self.validations += checked
+            self.validation_failures += failed
+
+    def stats(self, pool) -> Dict[str, Union[int, float, str]]:
+        with self._lock:
+            waits = sorted(self._waits)
+            counters = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+                "validations": self.validations,
+                "validation_failures": self.validation_failures,
+            }
+        return {
+            "pool": type(pool).__name__,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            **counters,
+            "wait_ms_avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "wait_ms_p99": round(waits[min(len(waits) - 1, int(len(waits) * 0.99))], 3) if waits else 0.0,
+            "wait_ms_max": round(waits[-1], 3) if waits else 0.0,
+        }
+
+
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def _metered(base: Type[QueuePool], metrics: PoolMetrics) -> Type[QueuePool]:
+    """
+    Subclase del pool que mide cuánto tarda cada checkout (esperar una conexión
+    libre o abrir una nueva). SQLAlchemy no tiene un evento previo a la espera,
+    así que se envuelve _do_get; recreate() conserva la clase y las métricas.
+    """
+
+    class MeteredPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                entry = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_wait(time.perf_counter() - start, timed_out=True)
+                raise
+            metrics.record_wait(time.perf_counter() - start, timed_out=False)
+            return entry
+
+    MeteredPool.__name__ = base.__name__
+    return MeteredPool
+
+
+def engine_options(url: str, name: str, is_async: bool = False) -> dict:
+    """Argumentos de create_engine/create_async_engine para el pool `name`"""
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # SQLite en memoria usa su propio pool (una conexión por hilo)
+
+    metrics = pool_metrics.setdefault(name, PoolMetrics())
+    options.update(
+        poolclass=_metered(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def watch_invalidations(engine: Engine, name: str) -> None:
+    metrics = pool_metrics.get(name)
+    if metrics is not None:
+        event.listen(engine, "invalidate", lambda *args: metrics.record_invalidation())
+
+
+def pool_stats(engines: Dict[str, Union[Engine, AsyncEngine]]) -> Dict[str, dict]:
+    return {
+        name: pool_metrics[name].stats(engine.pool)
+        for name, engine in engines.items()
+        if name in pool_metrics
+    }
+
+
+def validate_idle_connections(engine: Engine, name: str) -> Tuple[int, int]:
+    """
+    Hace SELECT 1 sobre cada conexión libre. El pool es FIFO, así que pedir y
+    devolver tantas conexiones como haya libres las recorre todas; SQLAlchemy
+    invalida por sí solo la que resulte desconectada.
+    """
+    checked = failed = 0
+    for _ in range(engine.pool.checkedin()):
+        checked += 1
+        try:
+            with engine.connect() as connection:
+                connection.exec_driver_sql("SELECT 1")
+        except Exception:
+            failed += 1
+    if name in pool_metrics:
+        pool_metrics[name].record_validation(checked, failed)
+    return checked, failed
+
+
+async def validate_idle_connections_async(engine: AsyncEngine, name: str) -> Tuple[int, int]:
+    """validate_idle_connections() para el motor asíncrono"""
+    checked = failed = 0
+    for _ in range(engine.pool.checkedin()):
+        checked += 1
+        try:
+            async with engine.connect() as connection:
+                await connection.exec_driver_sql("SELECT 1")
+        except Exception:
+            failed += 1
+    if name in pool_metrics:
+        pool_metrics[name].record_validation(checked, failed)
+    return checked, failed
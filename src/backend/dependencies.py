@@ -1,38 +1,93 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from database import get_db
 from models import User, UserRole
 from auth import verify_token
+from schemas import TokenData
+from user_cache import load_user, load_user_values
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    credentials_exception = HTTPException(
+@dataclass(frozen=True)
+class Principal:
+    """
+    Usuario autenticado según los claims del token: id, email y rol. Basta para
+    las rutas que solo comprueban permisos o propiedad; las que necesitan la
+    fila completa usan get_current_user.
+    """
+    id: int
+    email: str
+    role: UserRole
+    token_version: int = 0
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def decode_token(token: str) -> TokenData:
     token_data = verify_token(token)
     if token_data is None or token_data.email is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
-        raise credentials_exception
-    
-    if not user.is_active:
+        raise credentials_exception()
+    return token_data
+
+
+def check_token_state(token_data: TokenData, token_version: Optional[int], is_active: Optional[bool]) -> None:
+    # Cambiar el rol o desactivar la cuenta incrementa token_version: los
+    # tokens emitidos antes dejan de valer
+    if (token_version or 0) != token_data.token_version:
+        raise credentials_exception()
+    if not is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    token_data = decode_token(token)
+
+    # Caché de pocos segundos: las rutas frecuentes no consultan users en cada llamada
+    user = await load_user(db, token_data.email)
+    if user is None:
+        raise credentials_exception()
+
+    check_token_state(token_data, user.token_version, user.is_active)
+
     return user
 
 
+async def get_current_principal(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+) -> Principal:
+    token_data = decode_token(token)
+
+    # Solo se comprueba que el token no esté revocado, normalmente desde el caché
+    values = await load_user_values(db, token_data.email)
+    if values is None:
+        raise credentials_exception()
+
+    check_token_state(token_data, values["token_version"], values["is_active"])
+
+    # La versión coincide, así que el rol del token es el actual. Los tokens
+    # anteriores a estos claims toman id y rol de la fila
+    return Principal(
+        id=token_data.user_id if token_data.user_id is not None else values["id"],
+        email=token_data.email,
+        role=UserRole(token_data.role) if token_data.role else values["role"],
+        token_version=token_data.token_version,
+    )
+
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -40,7 +95,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 
 
 def require_role(required_roles: list[UserRole]):
-    async def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    async def role_checker(current_user: Principal = Depends(get_current_principal)) -> Principal:
         if current_user.role not in required_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,144 @@
+"""
+Caché LRU de descriptores abiertos y resultados de stat para el streaming.
+
+Las canciones más escuchadas se piden constantemente; mantener su archivo
+abierto evita un open() + fstat() por petición. Como las lecturas usan
+os.pread (posicional), un mismo descriptor puede compartirse entre peticiones
+concurrentes. Cada entrada lleva un contador de referencias para no cerrar un
+archivo que todavía se está enviando cuando es desalojado o invalidado.
+"""
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, Union
+
+from config import settings
+
+
+class CachedFile:
+    """Archivo abierto junto con su stat, compartido entre peticiones"""
+
+    __slots__ = ("key", "file", "stat", "refs", "retired")
+
+    def __init__(self, key: str, file: BinaryIO, stat: os.stat_result):
+        self.key = key
+        self.file = file
+        self.stat = stat
+        self.refs = 0
+        self.retired = False  # Fuera del caché; se cierra cuando refs llegue a 0
+
+
+class FileHandleCache:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, CachedFile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return str(Path(path).resolve())
+
+    def acquire(self, path: Union[str, Path]) -> CachedFile:
+        """
+        Retorna la entrada del archivo (abriéndolo si no está en caché) con una
+        referencia tomada. Debe liberarse con release(). Lanza OSError si no existe.
+        """
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.refs += 1
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Abrir fuera del lock para no serializar el disco
+        file = open(key, "rb")
+        try:
+            stat = os.fstat(file.fileno())
+        except OSError:
+            file.close()
+            raise
+        entry = CachedFile(key, file, stat)
+        entry.refs = 1
+
+        if self.capacity <= 0:
+            entry.retired = True
+            return entry
+
+        to_close = []
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Otra petición lo abrió mientras tanto; usar esa entrada
+                existing.refs += 1
+                self._entries.move_to_end(key)
+                entry.retired = True
+                entry.refs = 0
+                to_close.append(entry)
+                entry = existing
+            else:
+                self._entries[key] = entry
+                while len(self._entries) > self.capacity:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.evictions += 1
+                    evicted.retired = True
+                    if evicted.refs == 0:
+                        to_close.append(evicted)
+
+        for stale in to_close:
+            stale.file.close()
+        return entry
+
+    def release(self, entry: CachedFile) -> None:
+        with self._lock:
+            entry.refs -= 1
+            should_close = entry.retired and entry.refs <= 0
+        if should_close:
+            entry.file.close()
+
+    def invalidate(self, path: Union[str, Path]) -> bool:
+        """Saca un archivo del caché (p. ej. al eliminarlo). Retorna True si estaba cacheado"""
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return False
+            self.invalidations += 1
+            entry.retired = True
+            should_close = entry.refs <= 0
+        if should_close:
+            entry.file.close()
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            for entry in entries:
+                entry.retired = True
+        for entry in entries:
+            if entry.refs <= 0:
+                entry.file.close()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "capacity": self.capacity,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+file_cache = FileHandleCache(settings.FILE_CACHE_SIZE)
@@ -0,0 +1,164 @@
+"""
+Capa de canciones "calientes" mapeadas en memoria.
+
+Las N canciones con más reproducciones se mantienen mapeadas (mmap de solo
+lectura) y las peticiones de rango se sirven rebanando el mapa como memoryview,
+sin pasar por el sistema de archivos. El conjunto se recalcula periódicamente
+desde la tabla songs respetando un presupuesto total de bytes.
+
+Los mapas nunca se cierran explícitamente: cada rebanada enviada mantiene viva
+su referencia, así que al salir del conjunto basta con soltar el mapa y el
+último memoryview en uso lo libera.
+"""
+import asyncio
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy.orm import selectinload
+
+from config import settings
+from database import SessionLocal
+from models import Song
+
+logger = logging.getLogger(__name__)
+
+
+class MappedFile:
+    """Archivo mapeado en memoria con su stat al momento de mapearlo"""
+
+    __slots__ = ("key", "view", "stat")
+
+    def __init__(self, key: str, view: memoryview, stat: os.stat_result):
+        self.key = key
+        self.view = view
+        self.stat = stat
+
+
+class HotSetCache:
+    def __init__(self, max_songs: int, max_bytes: int):
+        self.max_songs = max_songs
+        self.max_bytes = max_bytes
+        self._entries: Dict[str, MappedFile] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return str(Path(path).resolve())
+
+    def get(self, path: Union[str, Path]) -> Optional[MappedFile]:
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def invalidate(self, path: Union[str, Path]) -> bool:
+        with self._lock:
+            return self._entries.pop(self._key(path), None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _map(key: str, stat: os.stat_result) -> MappedFile:
+        with open(key, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return MappedFile(key, memoryview(mapped), stat)
+
+    def refresh(self, paths: List[Path]) -> None:
+        """
+        Reemplaza el conjunto con los archivos dados (ordenados por popularidad),
+        mapeando en orden mientras quepan en el presupuesto de bytes.
+        """
+        with self._lock:
+            current = dict(self._entries)
+
+        selected: Dict[str, MappedFile] = {}
+        total_bytes = 0
+        for path in paths[: self.max_songs]:
+            key = self._key(path)
+            if key in selected:
+                continue
+            try:
+                stat = os.stat(key)
+            except OSError:
+                continue
+            if stat.st_size == 0 or total_bytes + stat.st_size > self.max_bytes:
+                continue
+
+            entry = current.get(key)
+            if entry is None or entry.stat.st_mtime_ns != stat.st_mtime_ns or entry.stat.st_size != stat.st_size:
+                try:
+                    entry = self._map(key, stat)
+                except (OSError, ValueError) as e:
+                    logger.warning("No se pudo mapear %s: %s", key, e)
+                    continue
+            selected[key] = entry
+            total_bytes += stat.st_size
+
+        with self._lock:
+            self._entries = selected
+            self.refreshes += 1
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_songs": self.max_songs,
+                "max_bytes": self.max_bytes,
+                "songs": len(self._entries),
+                "bytes": sum(entry.stat.st_size for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+hot_set = HotSetCache(settings.HOT_SET_SIZE, settings.HOT_SET_MAX_BYTES)
+
+
+def refresh_hot_set() -> None:
+    """Recalcula el conjunto caliente a partir de las canciones más reproducidas"""
+    # Importación diferida para evitar el ciclo streaming -> hot_set -> streaming
+    from routes.upload import UPLOAD_DIR
+    from streaming import resolve_upload_path
+    from transcoding import DEFAULT_BITRATE, select_rendition
+
+    db = SessionLocal()
+    try:
+        songs = db.query(Song).options(selectinload(Song.renditions)).filter(
+            Song.is_approved == True
+        ).order_by(Song.play_count.desc()).limit(hot_set.max_songs).all()
+        # Se mapea el archivo que /stream sirve por defecto: la rendition de
+        # DEFAULT_BITRATE si existe, si no el original
+        file_paths = []
+        for song in songs:
+            rendition = select_rendition(song, DEFAULT_BITRATE)
+            file_paths.append(rendition.file_path if rendition else song.file_path)
+    finally:
+        db.close()
+
+    paths = [resolve_upload_path(UPLOAD_DIR, file_path) for file_path in file_paths]
+    hot_set.refresh([path for path in paths if path is not None])
+
+
+async def run_hot_set_refresher() -> None:
+    """Tarea de fondo que refresca el conjunto caliente cada HOT_SET_REFRESH_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(refresh_hot_set)
+        except Exception:
+            logger.exception("Error al refrescar el conjunto de canciones calientes")
+        await asyncio.sleep(settings.HOT_SET_REFRESH_SECONDS)
@@ -0,0 +1,197 @@
+"""
+Miniaturas de las portadas de álbumes y canciones.
+
+Las portadas se guardan tal como se subieron (hasta 5 MB) y las vistas en
+cuadrícula solo necesitan unos cientos de píxeles. Al subir una portada se
+generan versiones cuadradas de 64/300/640 px en WebP y JPEG (para clientes
+sin WebP) en el pool de procesos de transcoding, y se registran en la tabla
+image_variants ligadas al blob de la portada. Como las portadas se guardan por
+contenido, una misma imagen usada por un álbum y sus canciones se procesa una
+sola vez, y las miniaturas se borran junto con el blob.
+
+Si Pillow no está instalado se omite el procesamiento y se sirve el original.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from database import SessionLocal
+from models import Blob, ImageVariant
+from storage import UPLOAD_DIR, publish, storage, storage_key
+from streaming import build_storage_response, invalidate_cached_file
+from transcoding import get_executor
+
+logger = logging.getLogger(__name__)
+
+COVER_SIZES = (64, 300, 640)  # Lado en píxeles
+COVER_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+THUMBS_DIR = UPLOAD_DIR / "covers" / "thumbs"
+# La URL /albums/{id}/cover no cambia si se reemplaza la portada: caché corto
+COVER_CACHE_CONTROL = "public, max-age=3600"
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _render_variants(source: str, output_dir: str, stem: str, sizes: Sequence[int]) -> List[Tuple[int, str, str, int]]:
+    """
+    Se ejecuta en un proceso del pool. Recorta al centro y reduce la imagen a
+    cada tamaño (sin ampliar) y retorna (tamaño, formato, ruta, bytes) por archivo.
+    """
+    from PIL import Image, ImageOps
+
+    results = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode != "RGB":
+            # JPEG no admite transparencia: se compone sobre fondo blanco
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+
+        side = min(image.size)
+        for size in sizes:
+            if size > side:
+                continue
+            thumb = ImageOps.fit(image, (size, size), Image.LANCZOS)
+            for fmt in COVER_FORMATS:
+                destination = os.path.join(output_dir, f"{stem}_{size}.{fmt}")
+                partial = destination + ".part"
+                if fmt == "webp":
+                    thumb.save(partial, format="WEBP", quality=80, method=4)
+                else:
+                    thumb.save(partial, format="JPEG", quality=82, optimize=True, progressive=True)
+                os.replace(partial, destination)
+                results.append((size, fmt, destination, os.path.getsize(destination)))
+    return results
+
+
+async def generate_cover_variants(cover_url: str) -> None:
+    """
+    Genera y registra las miniaturas de la portada `cover_url` si aún no las
+    tiene. Pensado para ejecutarse como tarea de fondo después de la subida.
+    """
+    if not pillow_available():
+        logger.warning("Pillow no está instalado; se omiten las miniaturas de %s", cover_url)
+        return
+
+    db = SessionLocal()
+    try:
+        blob = db.query(Blob).filter(Blob.path == cover_url).first()
+        if blob is None or blob.variants:
+            return
+        stem = blob.sha256
+    finally:
+        db.close()
+
+    key = storage_key(cover_url)
+    source = UPLOAD_DIR / key if key is not None else None
+    if source is None or not source.is_file():
+        logger.warning("Portada %s sin copia local; se omiten las miniaturas", cover_url)
+        return
+
+    THUMBS_DIR.mkdir(parents=True, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    try:
+        results = await loop.run_in_executor(
+            get_executor(), _render_variants, str(source), str(THUMBS_DIR), stem, COVER_SIZES
+        )
+    except Exception as e:
+        logger.error("Error al generar las miniaturas de %s: %s", cover_url, e)
+        return
+
+    for _, fmt, destination, _ in results:
+        await asyncio.to_thread(publish, Path(destination), COVER_FORMATS[fmt])
+
+    db = SessionLocal()
+    try:
+        blob = db.query(Blob).filter(Blob.path == cover_url).first()
+        if blob is None:
+            # La portada se eliminó mientras se procesaba
+            for _, _, destination, _ in results:
+                _delete_file(Path(destination))
+            return
+        if blob.variants:
+            return  # Otra tarea con la misma imagen terminó antes
+        for size, fmt, destination, byte_size in results:
+            db.add(ImageVariant(
+                blob_id=blob.id,
+                size=size,
+                format=fmt,
+                file_path="/uploads/" + Path(destination).relative_to(UPLOAD_DIR).as_posix(),
+                bytes=byte_size,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def remove_variant_files(file_paths: List[str]) -> None:
+    """Borra los archivos de miniaturas (se llama al eliminar el blob de la portada)"""
+    for url in file_paths:
+        key = storage_key(url)
+        if key is not None:
+            _delete_file(UPLOAD_DIR / key)
+
+
+def _delete_file(path: Path) -> None:
+    invalidate_cached_file(path)
+    key = storage_key(path)
+    if key is not None:
+        storage.delete(key)
+    path.unlink(missing_ok=True)
+
+
+def choose_variant(
+    variants: List[ImageVariant], size: Optional[int], fmt: Optional[str], accept: Optional[str]
+) -> Optional[ImageVariant]:
+    """
+    La miniatura más pequeña que cubra `size` en el formato pedido (o WebP si el
+    cliente lo acepta). None significa servir el original: no se pidió tamaño o
+    es mayor que todas las miniaturas.
+    """
+    if size is None:
+        return None
+    if fmt is None:
+        fmt = "webp" if accept and "image/webp" in accept else "jpeg"
+    candidates = sorted(
+        (variant for variant in variants if variant.format == fmt and variant.size >= size),
+        key=lambda variant: variant.size,
+    )
+    return candidates[0] if candidates else None
+
+
+async def build_cover_response(
+    request: Request, db: AsyncSession, cover_url: str, size: Optional[int], fmt: Optional[str]
+) -> Response:
+    """
+    Sirve la portada `cover_url` al tamaño pedido. Lanza FileNotFoundError si
+    ni la miniatura ni el original existen.
+    """
+    if cover_url.startswith(("http://", "https://")):
+        return RedirectResponse(cover_url, status_code=307)  # Portada externa, sin miniaturas
+    key = storage_key(cover_url)
+    if key is None:
+        raise FileNotFoundError(cover_url)
+
+    blob = await db.scalar(
+        select(Blob).options(selectinload(Blob.variants)).where(Blob.path == f"/uploads/{key}")
+    )
+    variant = choose_variant(blob.variants if blob else [], size, fmt, request.headers.get("accept"))
+    if variant is not None:
+        key = storage_key(variant.file_path)
+
+    response = build_storage_response(request, key, cache_control=COVER_CACHE_CONTROL)
+    if fmt is None:
+        response.headers["Vary"] = "Accept"
+    return response
@@ -1,13 +1,38 @@
-from fastapi import FastAPI, Request
+import asyncio
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from pathlib import Path
-from routes import auth, users, songs, playlists, albums, upload
-from database import engine, Base
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from routes import auth, users, songs, playlists, albums, upload, stream, charts, search
+from database import (
+    engine,
+    database_pool_stats,
+    dispose_engines,
+    run_pool_stats_logger,
+    run_pool_validator,
+)
+from dependencies import Principal, require_role
+from models import UserRole
 from config import settings
+from file_cache import file_cache
+from hot_set import hot_set, run_hot_set_refresher
+from migrations import upgrade_database
+from play_counter import flush_play_counter, play_counter, run_play_counter_flusher
+from rankings import run_rankings_refresher
+from resumable_upload import run_session_purger
+from search_index import enable_fulltext_search
+from suggest_index import run_suggest_index_refresher, suggest_index
+from transcoding import shutdown_executor
+from auth import shutdown_hash_executor
+from storage import UPLOAD_DIR, LocalStorage, storage, storage_key
+from streaming import build_storage_response
 
-Base.metadata.create_all(bind=engine)
+# El esquema lo crean las migraciones de Alembic (ver migrations.py)
+if settings.DB_MIGRATE_ON_STARTUP:
+    upgrade_database(engine)
+enable_fulltext_search(engine)
 
 app = FastAPI(
     title="Music Streaming API",
@@ -22,30 +47,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["*"],  # Importante para audio streaming
+    expose_headers=["*", "X-Next-Cursor"],  # Importante para audio streaming y la paginación
 )
 
-# Crear directorio de uploads si no existe
-UPLOAD_DIR = Path("uploads")
+# Crear directorio de uploads si no existe (con S3 es el espacio de trabajo local)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-# Middleware personalizado para CORS en archivos estáticos
-@app.middleware("http")
-async def add_cors_to_static_files(request: Request, call_next):
-    response = await call_next(request)
-    
-    # Añadir headers CORS a archivos estáticos (uploads)
-    if request.url.path.startswith("/uploads"):
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range"
-        response.headers["Accept-Ranges"] = "bytes"
-    
-    return response
-
-# Montar directorio de archivos estáticos
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Middleware personalizado para CORS en archivos estáticos (portadas, avatares).
+# Es ASGI puro: solo modifica las cabeceras de /uploads y deja pasar el resto sin
+# envolver el cuerpo, así /stream puede usar zero-copy y enviar memoryviews.
+class StaticFilesCORSMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith("/uploads"):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["Access-Control-Allow-Origin"] = "*"
+                headers["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
+                headers["Access-Control-Allow-Headers"] = "*"
+                headers["Access-Control-Expose-Headers"] = "Content-Length, Content-Range"
+                headers["Accept-Ranges"] = "bytes"
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+app.add_middleware(StaticFilesCORSMiddleware)
+
+# Montar directorio de archivos estáticos. Con un backend remoto /uploads/<clave>
+# redirige a la URL prefirmada del objeto
+if isinstance(storage, LocalStorage):
+    app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+else:
+    @app.api_route("/uploads/{path:path}", methods=["GET", "HEAD"])
+    async def uploaded_file(path: str, request: Request):
+        key = storage_key(path)
+        try:
+            if key is None:
+                raise FileNotFoundError(path)
+            return build_storage_response(request, key)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Not Found")
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -53,6 +101,9 @@ app.include_router(songs.router)
 app.include_router(playlists.router)
 app.include_router(albums.router)
 app.include_router(upload.router)
+app.include_router(stream.router)
+app.include_router(charts.router)
+app.include_router(search.router)
 
 
 @app.get("/")
@@ -64,11 +115,66 @@ async def root():
     }
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.hot_set_task = asyncio.create_task(run_hot_set_refresher())
+    app.state.pool_tasks = [
+        asyncio.create_task(run_pool_validator()),
+        asyncio.create_task(run_pool_stats_logger()),
+    ]
+    play_counter.open_journal()
+    app.state.play_counter_task = asyncio.create_task(run_play_counter_flusher())
+    app.state.rankings_task = asyncio.create_task(run_rankings_refresher())
+    app.state.suggest_task = asyncio.create_task(run_suggest_index_refresher())
+    app.state.session_purge_task = asyncio.create_task(run_session_purger())
+
+
+@app.on_event("shutdown")
+async def close_cached_files():
+    app.state.hot_set_task.cancel()
+    for task in app.state.pool_tasks:
+        task.cancel()
+    app.state.play_counter_task.cancel()
+    app.state.rankings_task.cancel()
+    app.state.suggest_task.cancel()
+    app.state.session_purge_task.cancel()
+    await flush_play_counter()
+    hot_set.clear()
+    file_cache.clear()
+    shutdown_executor()
+    shutdown_hash_executor()
+    await dispose_engines()
+
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/db")
+async def database_pool_health(
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
+):
+    """Estado de los pools de conexiones: conexiones en uso, overflow y esperas"""
+    return database_pool_stats()
+
+
+@app.get("/health/plays")
+async def play_counter_health(
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
+):
+    """Reproducciones pendientes de volcar y estadísticas de los volcados"""
+    return play_counter.stats()
+
+
+@app.get("/health/suggest")
+async def suggest_index_health(
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
+):
+    """Tamaño del índice de sugerencias"""
+    return suggest_index.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,49 @@
+"""
+Procesamiento posterior a la creación de una canción.
+
+Agrupa las etapas que se ejecutan como tarea de fondo sobre el audio subido.
+Primero se extraen los metadatos reales del archivo (las demás etapas usan el
+bitrate leído); después el resto corre en paralelo. El fallo de una etapa no
+detiene a las demás.
+"""
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional
+
+from audio_metadata import extract_song_metadata
+from peaks import compute_song_peaks, remove_peaks
+from segmenting import remove_segments, segment_song
+from streaming import invalidate_cached_file
+from transcoding import remove_renditions, transcode_song
+
+logger = logging.getLogger(__name__)
+
+SONG_STAGES = (transcode_song, segment_song, compute_song_peaks)
+
+
+async def process_new_song(song_id: int) -> None:
+    try:
+        await extract_song_metadata(song_id)
+    except Exception as e:
+        logger.error("Etapa extract_song_metadata falló para la canción %s: %s", song_id, e)
+
+    results = await asyncio.gather(
+        *[stage(song_id) for stage in SONG_STAGES],
+        return_exceptions=True,
+    )
+    for stage, result in zip(SONG_STAGES, results):
+        if isinstance(result, Exception):
+            logger.error("Etapa %s falló para la canción %s: %s", stage.__name__, song_id, result)
+
+
+def release_song_files(upload_dir: Path, song_id: int, audio_path: Optional[Path]) -> None:
+    """
+    Se llama después de eliminar una canción: saca su audio de los cachés de
+    streaming y borra todo lo generado a partir de él (el original se conserva).
+    """
+    if audio_path is not None:
+        invalidate_cached_file(audio_path)
+        remove_peaks(audio_path)
+    remove_renditions(upload_dir, song_id)
+    remove_segments(upload_dir, song_id)
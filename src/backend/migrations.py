@@ -0,0 +1,52 @@
+"""
+Migraciones de Alembic al arrancar.
+
+El esquema lo definen las revisiones de alembic/versions: main.py ya no usa
+create_all, que crea las tablas que faltan pero nunca añade columnas ni
+índices a una tabla existente. Al arrancar se aplica `alembic upgrade head`
+sobre la misma conexión del motor síncrono.
+
+Una base de datos creada con create_all antes de las migraciones no tiene
+tabla alembic_version: se marca en 0001_baseline y se actualiza desde ahí.
+Las revisiones siguientes no recrean las tablas ni las columnas que
+create_all ya hubiera creado.
+
+Con varios workers, o si se migra en un paso aparte del despliegue,
+DB_MIGRATE_ON_STARTUP=false y `alembic upgrade head` antes de arrancar.
+"""
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = Path(__file__).resolve().parent.parent.parent / "alembic"
+BASELINE_REVISION = "0001_baseline"
+
+
+def alembic_config(connection) -> Config:
+    # Sin alembic.ini: su configuración de logging sustituiría la de la app
+    config = Config()
+    config.set_main_option("script_location", str(ALEMBIC_DIR))
+    config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(engine: Engine) -> None:
+    tables = inspect(engine).get_table_names()
+    if "alembic_version" not in tables and "users" in tables:
+        logger.info("Base de datos sin migraciones: se marca en %s", BASELINE_REVISION)
+        run_command(engine, command.stamp, BASELINE_REVISION)
+    run_command(engine, command.upgrade, "head")
+
+
+def run_command(engine: Engine, alembic_command, revision: str) -> None:
+    # Conexión sin transacción abierta: Alembic gestiona las suyas (y los
+    # bloques autocommit de las revisiones que los usan)
+    with engine.connect() as connection:
+        alembic_command(alembic_config(connection), revision)
+        connection.commit()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Float, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -26,6 +26,8 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.USER, nullable=False)
     is_active = Column(Boolean, default=True)
     profile_picture = Column(String, nullable=True)
+    # Se incrementa al cambiar el rol o desactivar la cuenta: invalida los tokens emitidos
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -43,13 +45,18 @@ class Album(Base):
     description = Column(Text, nullable=True)
     cover_image = Column(String, nullable=True)
     release_date = Column(DateTime, nullable=True)
-    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     is_approved = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     creator = relationship("User", back_populates="albums")
     songs = relationship("Song", back_populates="album", cascade="all, delete-orphan")
+    
+    # Listado paginado por cursor (ver pagination.py)
+    __table_args__ = (
+        Index("ix_albums_approved_id", "is_approved", "id"),
+    )
 
 
 class Song(Base):
@@ -62,10 +69,13 @@ class Song(Base):
     file_path = Column(String, nullable=False)
     cover_url = Column(String, nullable=True)
     genre = Column(String, nullable=True)
-    album_id = Column(Integer, ForeignKey("albums.id"), nullable=True)
-    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    album_id = Column(Integer, ForeignKey("albums.id"), nullable=True, index=True)
+    creator_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     is_approved = Column(Boolean, default=False)
     play_count = Column(Integer, default=0)
+    bitrate = Column(Integer, nullable=True)  # kbps, leído del archivo
+    sample_rate = Column(Integer, nullable=True)  # Hz
+    channels = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -73,6 +83,101 @@ class Song(Base):
     album = relationship("Album", back_populates="songs")
     playlist_songs = relationship("PlaylistSong", back_populates="song", cascade="all, delete-orphan")
     liked_by = relationship("LikedSong", back_populates="song", cascade="all, delete-orphan")
+    renditions = relationship("SongRendition", back_populates="song", cascade="all, delete-orphan")
+    
+    # Un índice por orden del listado paginado por cursor (ver pagination.py)
+    __table_args__ = (
+        Index("ix_songs_approved_play_count", "is_approved", "play_count", "id"),
+        Index("ix_songs_approved_title", "is_approved", "title", "id"),
+        Index("ix_songs_approved_id", "is_approved", "id"),
+    )
+
+
+class SongRendition(Base):
+    __tablename__ = "song_renditions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False, index=True)
+    bitrate = Column(Integer, nullable=False)  # kbps
+    format = Column(String, nullable=False, default="mp3")
+    file_path = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    song = relationship("Song", back_populates="renditions")
+
+
+class PlayEvent(Base):
+    """Una reproducción; la tabla solo recibe inserciones en lote (ver play_events.py)"""
+    __tablename__ = "play_events"
+    
+    id = Column(Integer, primary_key=True)
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
+    played_at = Column(DateTime, nullable=False, index=True)  # UTC
+    duration_listened = Column(Integer, nullable=True)  # Segundos escuchados
+
+
+class SongPlaysHourly(Base):
+    """Reproducciones por canción y hora (UTC), mantenidas al insertar los eventos"""
+    __tablename__ = "song_plays_hourly"
+    
+    hour = Column(DateTime, primary_key=True)
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True, index=True)
+    plays = Column(Integer, nullable=False, default=0)
+    listened_seconds = Column(Integer, nullable=False, default=0)
+
+
+class SongPlaysDaily(Base):
+    """Reproducciones por canción y día (UTC), mantenidas al insertar los eventos"""
+    __tablename__ = "song_plays_daily"
+    
+    day = Column(Date, primary_key=True)
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True, index=True)
+    plays = Column(Integer, nullable=False, default=0)
+    listened_seconds = Column(Integer, nullable=False, default=0)
+
+
+class SongRanking(Base):
+    """Posición de cada canción aprobada en el listado trending (ver rankings.py)"""
+    __tablename__ = "song_rankings"
+    
+    song_id = Column(Integer, ForeignKey("songs.id", ondelete="CASCADE"), primary_key=True)
+    trending_score = Column(Float, nullable=False, default=0.0)
+    trending_rank = Column(Integer, nullable=False, unique=True)
+    refreshed_at = Column(DateTime, nullable=False)  # UTC
+
+
+class Blob(Base):
+    """Archivo subido guardado una sola vez por contenido (ver blob_store.py)"""
+    __tablename__ = "blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    path = Column(String, unique=True, nullable=False)  # Ruta pública, /uploads/...
+    size = Column(Integer, nullable=False)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=1)
+    # Referencias de subidas que aún no tomó ninguna fila (ver blob_store.claim)
+    unclaimed = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    variants = relationship("ImageVariant", back_populates="blob", cascade="all, delete-orphan")
+
+
+class ImageVariant(Base):
+    """Miniatura de una portada (ver image_derivatives.py)"""
+    __tablename__ = "image_variants"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    blob_id = Column(Integer, ForeignKey("blobs.id"), nullable=False, index=True)
+    size = Column(Integer, nullable=False)  # Lado en píxeles
+    format = Column(String, nullable=False)  # webp, jpeg
+    file_path = Column(String, nullable=False)
+    bytes = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    blob = relationship("Blob", back_populates="variants")
 
 
 class Playlist(Base):
@@ -83,7 +188,7 @@ class Playlist(Base):
     description = Column(Text, nullable=True)
     cover_image = Column(String, nullable=True)
     is_public = Column(Boolean, default=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -96,12 +201,18 @@ class PlaylistSong(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     playlist_id = Column(Integer, ForeignKey("playlists.id"), nullable=False)
-    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False, index=True)
     position = Column(Integer, nullable=False)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
     
     playlist = relationship("Playlist", back_populates="playlist_songs")
     song = relationship("Song", back_populates="playlist_songs")
+    
+    # Canciones de una playlist en orden, y comprobación de duplicados
+    __table_args__ = (
+        Index("ix_playlist_songs_playlist_position", "playlist_id", "position"),
+        Index("ix_playlist_songs_playlist_song", "playlist_id", "song_id"),
+    )
 
 
 class LikedSong(Base):
@@ -109,8 +220,13 @@ class LikedSong(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False)
+    song_id = Column(Integer, ForeignKey("songs.id"), nullable=False, index=True)
     liked_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="liked_songs")
     song = relationship("Song", back_populates="liked_by")
+    
+    __table_args__ = (
+        Index("ix_liked_songs_user_id", "user_id", "id"),  # Favoritos paginados por cursor
+        Index("ix_liked_songs_user_song", "user_id", "song_id"),  # ¿Le gusta esta canción?
+    )
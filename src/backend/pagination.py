@@ -0,0 +1,118 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+Con `offset(skip)` la base de datos recorre y descarta todas las filas
+anteriores, así que cada página es más lenta que la anterior. Además, si el
+orden cambia entre dos peticiones (reproducciones nuevas), las filas se
+repiten o se saltan. Con el cursor, la página siguiente empieza justo después
+de la última fila vista: `WHERE (clave, id) < (última clave, último id)`,
+que es un recorrido del índice compuesto del orden.
+
+El cursor es opaco para el cliente: JSON con el nombre del orden y los
+valores de la última fila, en base64 url-safe. Se devuelve en la cabecera
+X-Next-Cursor (el cuerpo sigue siendo la lista de siempre) y solo cuando la
+página viene llena. `skip` sigue funcionando, pero está obsoleto.
+
+Las claves de orden son columnas sin NULL y terminan siempre en una columna
+única (el id o la posición del ranking), así el orden es total.
+"""
+import base64
+import binascii
+import json
+import math
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import BigInteger, and_, or_
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+SortKey = Tuple[object, bool]  # (columna, descendente)
+
+INT32_MAX = 2**31 - 1
+INT64_MAX = 2**63 - 1
+
+
+def encode_cursor(order: str, values: Sequence) -> str:
+    payload = json.dumps({"o": order, "k": list(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str, keys: Sequence[SortKey]) -> list:
+    invalid = HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        raise invalid
+    if not isinstance(payload, dict) or payload.get("o") != order:
+        raise invalid  # Cursor de otro orden u otro listado
+    values = payload.get("k")
+    if (
+        not isinstance(values, list)
+        or len(values) != len(keys)
+        or not all(valid_key(column, value) for (column, _), value in zip(keys, values))
+    ):
+        raise invalid
+    return values
+
+
+def valid_key(column, value) -> bool:
+    """
+    Si `value` se puede comparar con `column` en la base de datos. Un cursor
+    manipulado con una cadena en una columna entera, NaN o un entero que no
+    cabe en la columna haría fallar la consulta (500) en vez de dar un 400.
+    """
+    if isinstance(value, bool):
+        return False  # bool es un int para Python, no para la base de datos
+    if isinstance(value, float) and not math.isfinite(value):
+        return False  # json.loads acepta NaN e Infinity
+    try:
+        expected = column.type.python_type
+    except NotImplementedError:
+        return isinstance(value, (int, float, str))
+    if expected is int:
+        limit = INT64_MAX if isinstance(column.type, BigInteger) else INT32_MAX
+        return isinstance(value, int) and -limit - 1 <= value <= limit
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def after(keys: Sequence[SortKey], values: Sequence):
+    """Filas posteriores a `values` en el orden de `keys` (comparación lexicográfica)"""
+    conditions = []
+    for position, (column, descending) in enumerate(keys):
+        previous_equal = [keys[i][0] == values[i] for i in range(position)]
+        beyond = column < values[position] if descending else column > values[position]
+        conditions.append(and_(*previous_equal, beyond))
+    return or_(*conditions)
+
+
+async def fetch_page(
+    db,
+    query: Select,
+    keys: Sequence[SortKey],
+    order: str,
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    response: Response,
+) -> List:
+    """
+    Ejecuta `query` (sin ORDER BY) ordenada por `keys` y devuelve una página
+    de entidades. Si la página viene llena, pone el cursor de la siguiente en
+    la respuesta.
+    """
+    query = query.add_columns(*[column for column, _ in keys]).order_by(
+        *[column.desc() if descending else column.asc() for column, descending in keys]
+    )
+    if cursor:
+        query = query.where(after(keys, decode_cursor(cursor, order, keys)))
+    elif skip:
+        query = query.offset(skip)  # Obsoleto: se mantiene para clientes antiguos
+
+    rows = (await db.execute(query.limit(limit))).all()
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(order, rows[-1][1:])
+    return [row[0] for row in rows]
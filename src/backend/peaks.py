@@ -0,0 +1,139 @@
+"""
+Cálculo de picos (waveform) precomputados para el visualizador del reproductor.
+
+Para cada canción se genera un arreglo compacto de PEAKS_BUCKETS valores int8
+(0-127, amplitud máxima normalizada de cada tramo) y se guarda como blob binario
+junto al audio (<archivo>.peaks). Así los clientes dibujan la forma de onda sin
+decodificar el archivo completo.
+
+Los WAV PCM de 16 bits se leen directamente; el resto de formatos se decodifican
+con ffmpeg a PCM mono de baja resolución, suficiente para una forma de onda.
+"""
+import array
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import wave
+from pathlib import Path
+from typing import Optional
+
+from config import settings
+from database import SessionLocal
+from models import Song
+from storage import publish, storage, storage_key
+from streaming import invalidate_cached_file, resolve_upload_path
+from transcoding import encoder_available, get_executor
+
+logger = logging.getLogger(__name__)
+
+PEAKS_SUFFIX = ".peaks"
+DECODE_SAMPLE_RATE = 8000  # Hz; solo se necesita la envolvente
+
+
+def peaks_path(audio_path: Path) -> Path:
+    return audio_path.with_name(audio_path.name + PEAKS_SUFFIX)
+
+
+def peaks_key(audio_key: str) -> str:
+    return audio_key + PEAKS_SUFFIX
+
+
+def _read_wav_samples(path: str) -> Optional[array.array]:
+    """Muestras del primer canal de un WAV PCM de 16 bits, o None si no aplica"""
+    try:
+        with wave.open(path, "rb") as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            channels = wav.getnchannels()
+            samples = array.array("h", wav.readframes(wav.getnframes()))
+    except (wave.Error, EOFError):
+        return None
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples[::channels] if channels > 1 else samples
+
+
+def _decode_samples(encoder: str, path: str) -> array.array:
+    result = subprocess.run(
+        [
+            encoder, "-nostdin", "-loglevel", "error",
+            "-i", path,
+            "-vn", "-ac", "1", "-ar", str(DECODE_SAMPLE_RATE),
+            "-f", "s16le", "-",
+        ],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    samples = array.array("h")
+    samples.frombytes(result.stdout[: len(result.stdout) // 2 * 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def compute_peaks(samples: array.array, buckets: int) -> bytes:
+    """Reduce las muestras a `buckets` valores 0-127 (amplitud máxima por tramo)"""
+    if not samples:
+        return bytes(buckets)
+    peaks = bytearray(buckets)
+    total = len(samples)
+    for index in range(buckets):
+        start = index * total // buckets
+        end = max((index + 1) * total // buckets, start + 1)
+        chunk = samples[start:end]
+        peak = max(max(chunk), -min(chunk))
+        peaks[index] = min(127, peak * 127 // 32767)
+    return bytes(peaks)
+
+
+def _generate_peaks(encoder: Optional[str], source: str, destination: str, buckets: int) -> bool:
+    """Se ejecuta en un proceso del pool. Retorna False si no se pudo decodificar"""
+    samples = _read_wav_samples(source)
+    if samples is None:
+        if encoder is None:
+            return False
+        samples = _decode_samples(encoder, source)
+    partial = destination + ".part"
+    with open(partial, "wb") as file:
+        file.write(compute_peaks(samples, buckets))
+    os.replace(partial, destination)
+    return True
+
+
+def remove_peaks(audio_path: Path) -> None:
+    path = peaks_path(audio_path)
+    invalidate_cached_file(path)
+    key = storage_key(path)
+    if key is not None:
+        storage.delete(key)
+    path.unlink(missing_ok=True)
+
+
+async def compute_song_peaks(song_id: int) -> None:
+    """Genera el archivo de picos de una canción en el pool de procesos"""
+    # Importación diferida: routes.upload programa esta tarea
+    from routes.upload import UPLOAD_DIR
+
+    db = SessionLocal()
+    try:
+        song = db.query(Song).filter(Song.id == song_id).first()
+        source = resolve_upload_path(UPLOAD_DIR, song.file_path) if song else None
+    finally:
+        db.close()
+
+    if source is None or not source.is_file() or peaks_path(source).is_file():
+        return
+
+    encoder = settings.FFMPEG_PATH if encoder_available() else None
+    loop = asyncio.get_running_loop()
+    generated = await loop.run_in_executor(
+        get_executor(), _generate_peaks,
+        encoder, str(source), str(peaks_path(source)), settings.PEAKS_BUCKETS,
+    )
+    if not generated:
+        logger.warning("No se pudieron calcular los picos de la canción %s (falta encoder)", song_id)
+        return
+    await asyncio.to_thread(publish, peaks_path(source), "application/octet-stream")
@@ -0,0 +1,305 @@
+"""
+Contador de reproducciones con escritura diferida.
+
+POST /songs/{id}/play no escribe en la base de datos: guarda la reproducción
+en memoria y una tarea de fondo vuelca cada PLAY_COUNTER_FLUSH_SECONDS lo
+acumulado con play_events.write_plays: los eventos, un UPDATE atómico por
+canción (`play_count = play_count + n`) y los agregados por hora y día, todo
+en una sola transacción. Así no hay una transacción por reproducción ni se
+pierden incrementos entre peticiones concurrentes. Al apagar la app se
+vuelca lo pendiente.
+
+Durabilidad: por defecto lo pendiente vive solo en memoria y una caída del
+proceso pierde como mucho el último intervalo. Con PLAY_COUNTER_JOURNAL cada
+reproducción se añade también a un archivo local, uno por proceso
+(`<PLAY_COUNTER_JOURNAL>.<pid>`) para que los workers no escriban en el mismo.
+Al arrancar, cada worker recupera los journals de procesos que ya no existen
+(los toma con un rename, así solo los cuenta uno). Si el proceso cae justo
+después de confirmar un volcado y antes de borrar su journal, esas
+reproducciones se cuentan dos veces (se prefiere contar de más a perderlas).
+
+Si la base de datos rechaza un volcado por sus datos (IntegrityError o
+DataError, p. ej. el usuario de una reproducción ya no existe), el lote se
+parte en mitades hasta aislar las reproducciones rechazadas, que se descartan
+con un error en el log; el resto se escribe. Cualquier otro error (base de
+datos caída) devuelve el lote entero al buffer para el siguiente intervalo.
+
+Con PLAY_COUNTER_FLUSH_SECONDS=0 no hay buffer: cada reproducción se
+escribe en su propia transacción.
+"""
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from config import settings
+from database import SessionLocal
+from play_events import Play, write_plays
+
+logger = logging.getLogger(__name__)
+
+
+class PlayCounter:
+    def __init__(self, journal_base: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._plays: List[Play] = []
+        self._pending: Dict[int, int] = {}  # Reproducciones pendientes por canción
+        self.journal_base = Path(journal_base) if journal_base else None
+        self.journal_path: Optional[Path] = None  # El de este proceso, ver open_journal
+        self._journal = None
+        self.recorded = 0
+        self.flushes = 0
+        self.flushed_plays = 0
+        self.failures = 0
+        self.dropped = 0
+        self.last_flush_ms = 0.0
+
+    def open_journal(self) -> None:
+        """
+        Abre el journal de este proceso y recupera los de procesos caídos. Se
+        llama al arrancar la app y no al importar el módulo: con un servidor
+        que importa la app antes de crear los workers, el pid sería el del
+        proceso padre, compartido por todos.
+        """
+        if self.journal_base is None or self._journal is not None:
+            return
+        self.journal_path = self.journal_base.with_name(f"{self.journal_base.name}.{os.getpid()}")
+        self._recover()
+        self._journal = open(self.journal_path, "a", encoding="ascii")
+
+    @property
+    def _flushing_path(self) -> Path:
+        return self.journal_path.with_name(self.journal_path.name + ".flushing")
+
+    @property
+    def _recovering_path(self) -> Path:
+        return self.journal_path.with_name(self.journal_path.name + ".recovering")
+
+    def _orphan_journals(self) -> List[Path]:
+        """Journals de procesos que ya no existen (o de este pid en un arranque anterior)"""
+        pattern = re.compile(rf"{re.escape(self.journal_base.name)}(?:\.(\d+))?(?:\.flushing|\.recovering)?")
+        orphans = []
+        for path in self.journal_base.parent.iterdir():
+            match = pattern.fullmatch(path.name)
+            if match is None:
+                continue
+            # Sin pid: journal de una versión anterior, compartido por todos los procesos
+            pid = int(match.group(1)) if match.group(1) else None
+            if pid is None or pid == os.getpid() or not _process_alive(pid):
+                orphans.append(path)
+        # El .recovering propio primero: los demás se renombran a esa ruta
+        return sorted(orphans, key=lambda path: path != self._recovering_path)
+
+    def _recover(self) -> None:
+        """Suma al buffer las reproducciones de journals que no llegaron a volcarse"""
+        self.journal_base.parent.mkdir(parents=True, exist_ok=True)
+        recovered = 0
+        for path in self._orphan_journals():
+            try:
+                os.rename(path, self._recovering_path)
+            except FileNotFoundError:
+                continue  # Lo tomó otro worker que arrancaba a la vez
+            plays = []
+            with open(self._recovering_path, encoding="ascii") as journal:
+                for line in journal:
+                    play = _parse_journal_line(line)
+                    if play is not None:
+                        plays.append(play)
+            # Pasan al journal del próximo volcado de este proceso antes de borrar el recuperado
+            with open(self._flushing_path, "a", encoding="ascii") as flushing:
+                flushing.writelines(_journal_line(play) for play in plays)
+                flushing.flush()
+                os.fsync(flushing.fileno())
+            self._recovering_path.unlink()
+            for play in plays:
+                self._add(play)
+            recovered += len(plays)
+        if recovered:
+            logger.info("Recuperadas %d reproducciones del journal", recovered)
+
+    def _add(self, play: Play) -> None:
+        self._plays.append(play)
+        self._pending[play.song_id] = self._pending.get(play.song_id, 0) + 1
+
+    def record(self, play: Play) -> None:
+        with self._lock:
+            self._add(play)
+            self.recorded += 1
+            if self._journal is not None:
+                self._journal.write(_journal_line(play))
+                self._journal.flush()
+
+    def pending(self, song_id: int) -> int:
+        with self._lock:
+            return self._pending.get(song_id, 0)
+
+    def _take(self) -> List[Play]:
+        with self._lock:
+            plays, self._plays, self._pending = self._plays, [], {}
+            if self._journal is not None and plays:
+                # El journal actual pasa a ser el del volcado en curso; si ya
+                # había uno (volcado anterior fallido) se conservan ambas partes
+                self._journal.close()
+                if self._flushing_path.exists():
+                    with open(self._flushing_path, "a", encoding="ascii") as flushing:
+                        flushing.write(self.journal_path.read_text(encoding="ascii"))
+                    self.journal_path.unlink()
+                else:
+                    os.replace(self.journal_path, self._flushing_path)
+                self._journal = open(self.journal_path, "a", encoding="ascii")
+            return plays
+
+    def _restore(self, plays: List[Play], partial: bool) -> None:
+        with self._lock:
+            for play in plays:
+                self._add(play)
+            if partial and self.journal_path is not None:
+                # Parte del lote ya está en la base de datos: el journal del
+                # volcado se queda solo con lo que falta
+                remaining = self._flushing_path.with_name(self._flushing_path.name + ".tmp")
+                with open(remaining, "w", encoding="ascii") as journal:
+                    journal.writelines(_journal_line(play) for play in plays)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                os.replace(remaining, self._flushing_path)
+
+    def _write(self, plays: List[Play]) -> int:
+        db = SessionLocal()
+        try:
+            written = write_plays(db, plays)
+            db.commit()
+            return written
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Vuelca lo pendiente en la base de datos; devuelve las reproducciones escritas"""
+        plays = self._take()
+        if not plays:
+            return 0
+
+        start = time.perf_counter()
+        batches = [plays]
+        written = 0
+        dropped = 0
+        while batches:
+            batch = batches.pop()
+            try:
+                written += self._write(batch)
+            except (IntegrityError, DataError):
+                if len(batch) == 1:
+                    logger.error("Reproducción descartada, la base de datos la rechaza: %s", batch[0], exc_info=True)
+                    dropped += 1
+                else:
+                    # Se parte el lote para aislar las reproducciones rechazadas
+                    middle = len(batch) // 2
+                    batches += [batch[middle:], batch[:middle]]
+            except Exception:
+                remaining = batch + [play for pending in batches for play in pending]
+                self._restore(remaining, len(remaining) < len(plays))
+                with self._lock:
+                    self.failures += 1
+                    self.dropped += dropped
+                raise
+
+        if self.journal_path is not None:
+            self._flushing_path.unlink(missing_ok=True)
+        with self._lock:
+            self.flushes += 1
+            self.flushed_plays += written
+            self.dropped += dropped
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+        return written
+
+    def close(self) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+    def stats(self) -> Dict[str, Union[int, float, bool]]:
+        with self._lock:
+            return {
+                "flush_seconds": settings.PLAY_COUNTER_FLUSH_SECONDS,
+                "journal": self.journal_base is not None,
+                "pending_songs": len(self._pending),
+                "pending_plays": len(self._plays),
+                "recorded": self.recorded,
+                "flushes": self.flushes,
+                "flushed_plays": self.flushed_plays,
+                "failures": self.failures,
+                "dropped": self.dropped,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+            }
+
+
+def _journal_line(play: Play) -> str:
+    user = play.user_id if play.user_id is not None else "-"
+    duration = play.duration_listened if play.duration_listened is not None else "-"
+    return f"{play.song_id} {user} {play.played_at.isoformat()} {duration}\n"
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, pero es de otro usuario
+    return True
+
+
+def _parse_journal_line(line: str) -> Optional[Play]:
+    fields = line.split()
+    try:
+        if len(fields) == 1:  # Formato anterior: solo el id de la canción
+            return Play(int(fields[0]), None, datetime.utcnow())
+        song_id, user, played_at, duration = fields
+        return Play(
+            int(song_id),
+            None if user == "-" else int(user),
+            datetime.fromisoformat(played_at),
+            None if duration == "-" else int(duration),
+        )
+    except ValueError:
+        return None  # Línea incompleta (el proceso cayó mientras se escribía)
+
+
+play_counter = PlayCounter(settings.PLAY_COUNTER_JOURNAL)
+
+
+def buffering_enabled() -> bool:
+    return settings.PLAY_COUNTER_FLUSH_SECONDS > 0
+
+
+async def run_play_counter_flusher() -> None:
+    """Tarea de fondo que vuelca las reproducciones cada PLAY_COUNTER_FLUSH_SECONDS"""
+    if not buffering_enabled():
+        return
+    while True:
+        await asyncio.sleep(settings.PLAY_COUNTER_FLUSH_SECONDS)
+        try:
+            await asyncio.to_thread(play_counter.flush)
+        except Exception:
+            logger.exception("Error al volcar el contador de reproducciones")
+
+
+async def flush_play_counter() -> None:
+    """Volcado final al apagar la app"""
+    try:
+        plays = await asyncio.to_thread(play_counter.flush)
+        if plays:
+            logger.info("Volcadas %d reproducciones pendientes", plays)
+    except Exception:
+        logger.exception("No se pudieron volcar las reproducciones pendientes")
+    play_counter.close()
@@ -0,0 +1,117 @@
+"""
+Registro de reproducciones y agregados por hora y por día.
+
+Cada reproducción se guarda en play_events (canción, usuario, momento y
+segundos escuchados). En la misma transacción se suman a song_plays_hourly
+y song_plays_daily con un upsert (`plays = plays + n`), de modo que los
+rankings (/charts) leen solo esos agregados, sin recorrer los eventos.
+
+write_plays recibe las reproducciones en lote: play_counter.py las acumula
+en memoria y las vuelca cada PLAY_COUNTER_FLUSH_SECONDS.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Table, and_, bindparam, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import PlayEvent, Song, SongPlaysDaily, SongPlaysHourly
+
+
+class Play(NamedTuple):
+    song_id: int
+    user_id: Optional[int]
+    played_at: datetime  # UTC, sin zona horaria
+    duration_listened: Optional[int] = None
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment: datetime) -> date:
+    return moment.date()
+
+
+def _rollup_rows(plays: Iterable[Play], bucket_column: str, bucket) -> List[dict]:
+    totals: Dict[Tuple, List[int]] = defaultdict(lambda: [0, 0])
+    for play in plays:
+        total = totals[(bucket(play.played_at), play.song_id)]
+        total[0] += 1
+        total[1] += play.duration_listened or 0
+    return [
+        {bucket_column: key, "song_id": song_id, "plays": count, "listened_seconds": seconds}
+        for (key, song_id), (count, seconds) in totals.items()
+    ]
+
+
+def _upsert_rollup(db: Session, table: Table, bucket_column: str, rows: List[dict]) -> None:
+    """Suma `rows` a la tabla de agregados con INSERT ... ON CONFLICT DO UPDATE"""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        statement = dialect_insert(table)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[bucket_column, "song_id"],
+                set_={
+                    "plays": table.c.plays + statement.excluded.plays,
+                    "listened_seconds": table.c.listened_seconds + statement.excluded.listened_seconds,
+                },
+            ),
+            rows,
+        )
+        return
+
+    # Otros motores: actualizar y, si la fila no existía, insertarla
+    for row in rows:
+        result = db.execute(
+            update(table)
+            .where(and_(table.c[bucket_column] == row[bucket_column], table.c.song_id == row["song_id"]))
+            .values(
+                plays=table.c.plays + row["plays"],
+                listened_seconds=table.c.listened_seconds + row["listened_seconds"],
+            )
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table), [row])
+
+
+def write_plays(db: Session, plays: List[Play]) -> int:
+    """
+    Inserta las reproducciones, suma play_count y actualiza los agregados, sin
+    confirmar la transacción. Las de canciones que ya no existen se descartan.
+    Devuelve cuántas se escribieron.
+    """
+    song_ids = {play.song_id for play in plays}
+    existing = set(db.scalars(select(Song.id).where(Song.id.in_(song_ids)))) if song_ids else set()
+    plays = [play for play in plays if play.song_id in existing]
+    if not plays:
+        return 0
+
+    db.execute(insert(PlayEvent.__table__), [play._asdict() for play in plays])
+
+    counts: Dict[int, int] = defaultdict(int)
+    for play in plays:
+        counts[play.song_id] += 1
+    songs = Song.__table__
+    # executemany: un UPDATE por canción dentro de la misma transacción
+    db.execute(
+        update(songs)
+        .where(songs.c.id == bindparam("song"))
+        .values(play_count=songs.c.play_count + bindparam("plays")),
+        [{"song": song_id, "plays": count} for song_id, count in counts.items()],
+    )
+
+    _upsert_rollup(db, SongPlaysHourly.__table__, "hour", _rollup_rows(plays, "hour", hour_bucket))
+    _upsert_rollup(db, SongPlaysDaily.__table__, "day", _rollup_rows(plays, "day", day_bucket))
+    return len(plays)
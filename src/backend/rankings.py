@@ -0,0 +1,105 @@
+"""
+Ranking materializado de canciones para la portada.
+
+La puntuación "trending" depende de las reproducciones recientes, así que
+no se puede indexar: ordenar por ella en cada petición es agregar los
+agregados por hora de todas las canciones. La tabla song_rankings guarda la
+posición de cada canción aprobada y se recalcula cada
+TRENDING_REFRESH_SECONDS; GET /songs/?order_by=trending es un recorrido del
+índice de la posición. order_by=play_count no usa el ranking: el índice
+(is_approved, play_count, id) ya lo sirve al momento.
+
+La puntuación suma las reproducciones de las últimas TRENDING_WINDOW_HOURS
+(agregados por hora de play_events.py) con decaimiento exponencial: cada
+reproducción vale la mitad cada TRENDING_HALF_LIFE_HOURS. Los empates (p. ej.
+canciones sin reproducciones recientes) se ordenan por play_count.
+
+El recálculo es un solo INSERT ... SELECT con row_number() en la base de
+datos; las canciones no pasan por Python. El peso de cada hora se calcula
+aquí (son TRENDING_WINDOW_HOURS valores) porque SQLite no siempre tiene
+power(). Las canciones aprobadas después del último recálculo aparecen en
+el siguiente.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import DateTime, case, delete, func, insert, literal, select
+
+from config import settings
+from database import SessionLocal
+from models import Song, SongPlaysHourly, SongRanking
+from play_events import hour_bucket
+
+logger = logging.getLogger(__name__)
+
+
+def materialized_enabled() -> bool:
+    return settings.TRENDING_REFRESH_SECONDS > 0
+
+
+def hour_weights(now: datetime) -> Dict[datetime, float]:
+    """Peso de cada hora de la ventana: la mitad cada TRENDING_HALF_LIFE_HOURS"""
+    current = hour_bucket(now)
+    weights = {}
+    for hours_ago in range(settings.TRENDING_WINDOW_HOURS + 1):
+        hour = current - timedelta(hours=hours_ago)
+        # Edad medida desde la mitad de la hora del agregado
+        age_hours = max(0.0, (now - hour).total_seconds() / 3600 - 0.5)
+        weights[hour] = 0.5 ** (age_hours / settings.TRENDING_HALF_LIFE_HOURS)
+    return weights
+
+
+def trending_scores(now: datetime):
+    """Subconsulta (song_id, score) con la puntuación de las canciones con reproducciones recientes"""
+    weights = hour_weights(now)
+    weight = case(*[(SongPlaysHourly.hour == hour, value) for hour, value in weights.items()], else_=0.0)
+    return (
+        select(SongPlaysHourly.song_id, func.sum(SongPlaysHourly.plays * weight).label("score"))
+        .where(SongPlaysHourly.hour >= min(weights))
+        .group_by(SongPlaysHourly.song_id)
+        .subquery()
+    )
+
+
+def refresh_rankings(now: Optional[datetime] = None) -> int:
+    """Recalcula song_rankings en una sola transacción; devuelve las canciones clasificadas"""
+    now = now or datetime.utcnow()
+    scores = trending_scores(now)
+    score = func.coalesce(scores.c.score, 0.0)
+    ranked = (
+        select(
+            Song.id,
+            score,
+            func.row_number().over(order_by=(score.desc(), func.coalesce(Song.play_count, 0).desc(), Song.id)),
+            literal(now, DateTime),
+        )
+        .outerjoin(scores, scores.c.song_id == Song.id)
+        .where(Song.is_approved == True)
+    )
+    db = SessionLocal()
+    try:
+        db.execute(delete(SongRanking))
+        result = db.execute(insert(SongRanking).from_select(
+            ["song_id", "trending_score", "trending_rank", "refreshed_at"], ranked
+        ))
+        db.commit()
+        return result.rowcount
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_rankings_refresher() -> None:
+    """Tarea de fondo que recalcula el ranking cada TRENDING_REFRESH_SECONDS"""
+    if not materialized_enabled():
+        return
+    while True:
+        try:
+            await asyncio.to_thread(refresh_rankings)
+        except Exception:
+            logger.exception("Error al recalcular el ranking de canciones")
+        await asyncio.sleep(settings.TRENDING_REFRESH_SECONDS)
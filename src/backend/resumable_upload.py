@@ -0,0 +1,219 @@
+"""
+Subidas reanudables por partes (sesión → trozos numerados → finalizar).
+
+Un álbum completo en una sola petición multipart se pierde entero si la
+conexión cae cerca del final. Aquí el cliente abre una sesión por archivo
+declarando nombre, tipo y tamaño, envía los trozos con PUT (cada uno se puede
+reintentar por separado) y al terminar el servidor los concatena en la
+ubicación final calculando el SHA-256. El estado vive en disco, en un
+manifiesto JSON por sesión, así que cualquier worker puede atender cualquier
+trozo y ninguno queda ocupado durante toda la subida.
+
+Las sesiones viven en UPLOAD_SESSIONS_DIR (por defecto upload_sessions/ junto
+a UPLOAD_DIR, en el mismo disco que los archivos finales). Una tarea de fondo
+borra cada hora las que pasan de UPLOAD_SESSION_TTL_HOURS sin terminarse.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+import aiofiles
+import anyio
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect, Request
+
+from config import settings
+from storage import UPLOAD_DIR
+from upload_stream import FileRule, StoredFile
+
+logger = logging.getLogger(__name__)
+
+# Fuera de uploads/ para que los trozos no se sirvan por el StaticFiles
+SESSIONS_DIR = Path(settings.UPLOAD_SESSIONS_DIR or UPLOAD_DIR.parent / "upload_sessions")
+MANIFEST_NAME = "session.json"
+PURGE_INTERVAL_SECONDS = 3600
+
+
+@dataclass
+class UploadSession:
+    id: str
+    user_id: int
+    kind: str
+    filename: str
+    content_type: str
+    size: int
+    chunk_size: int
+    created_at: float
+
+    @property
+    def total_chunks(self) -> int:
+        return max(1, math.ceil(self.size / self.chunk_size))
+
+    @property
+    def directory(self) -> Path:
+        return SESSIONS_DIR / self.id
+
+    def expected_length(self, index: int) -> int:
+        if index < self.total_chunks - 1:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.total_chunks - 1)
+
+    def chunk_path(self, index: int) -> Path:
+        return self.directory / f"{index:05d}.part"
+
+    def received_chunks(self) -> List[int]:
+        return [i for i in range(self.total_chunks) if self.chunk_path(i).exists()]
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "total_chunks": self.total_chunks,
+            "received_chunks": self.received_chunks(),
+        }
+
+
+def create_session(user_id: int, kind: str, rule: FileRule, filename: str, content_type: str, size: int) -> UploadSession:
+    if content_type not in rule.allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{rule.label} debe ser uno de: {', '.join(rule.allowed_types)}"
+        )
+    if size <= 0:
+        raise HTTPException(status_code=400, detail="El archivo está vacío")
+    if size > rule.max_size:
+        max_size_mb = rule.max_size / (1024 * 1024)
+        raise HTTPException(status_code=413, detail=f"{rule.label} no debe superar {max_size_mb} MB")
+
+    session = UploadSession(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        kind=kind,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        created_at=time.time(),
+    )
+    session.directory.mkdir(parents=True)
+    (session.directory / MANIFEST_NAME).write_text(json.dumps(asdict(session)))
+    return session
+
+
+def load_session(upload_id: str, user_id: int) -> UploadSession:
+    """Lanza 404 si la sesión no existe, expiró o pertenece a otro usuario"""
+    try:
+        uuid.UUID(upload_id)  # Evita rutas arbitrarias en el nombre del directorio
+        data = json.loads((SESSIONS_DIR / upload_id / MANIFEST_NAME).read_text())
+    except (ValueError, OSError):
+        raise HTTPException(status_code=404, detail="Sesión de subida no encontrada")
+    session = UploadSession(**data)
+    if session.user_id != user_id or _expired(session):
+        raise HTTPException(status_code=404, detail="Sesión de subida no encontrada")
+    return session
+
+
+async def receive_chunk(session: UploadSession, index: int, request: Request) -> None:
+    """
+    Escribe el cuerpo de la petición como el trozo `index`. Se escribe primero en
+    un temporal y se renombra, así un trozo a medias nunca cuenta como recibido
+    y reenviarlo simplemente lo reemplaza.
+    """
+    if index < 0 or index >= session.total_chunks:
+        raise HTTPException(status_code=400, detail=f"Índice de trozo fuera de rango (0-{session.total_chunks - 1})")
+    expected = session.expected_length(index)
+
+    destination = session.chunk_path(index)
+    partial = destination.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    received = 0
+    try:
+        async with aiofiles.open(partial, "wb") as out:
+            async for data in request.stream():
+                received += len(data)
+                if received > expected:
+                    raise HTTPException(status_code=413, detail=f"El trozo {index} debe medir {expected} bytes")
+                await out.write(data)
+        if received != expected:
+            raise HTTPException(status_code=400, detail=f"El trozo {index} debe medir {expected} bytes, se recibieron {received}")
+        os.replace(partial, destination)
+    except ClientDisconnect:
+        raise HTTPException(status_code=400, detail="La subida del trozo se interrumpió")
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+async def assemble(session: UploadSession, rule: FileRule) -> StoredFile:
+    """
+    Concatena los trozos en el directorio final de la regla. La sesión se
+    conserva: el llamador la elimina con discard_session() cuando ya registró el
+    archivo, así un fallo posterior permite reintentar sin volver a subir.
+    """
+    missing = [i for i in range(session.total_chunks) if not session.chunk_path(i).exists()]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Faltan trozos: {missing}")
+
+    extension = session.filename.split(".")[-1]
+    path = rule.directory / f"{uuid.uuid4()}.{extension}"
+    digest = hashlib.sha256()
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            for index in range(session.total_chunks):
+                async with aiofiles.open(session.chunk_path(index), "rb") as chunk:
+                    while data := await chunk.read(1024 * 1024):
+                        digest.update(data)
+                        await out.write(data)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    return StoredFile(
+        field=session.kind,
+        filename=session.filename,
+        content_type=session.content_type,
+        path=path,
+        size=session.size,
+        sha256=digest.hexdigest(),
+    )
+
+
+async def discard_session(session: UploadSession) -> None:
+    await anyio.to_thread.run_sync(shutil.rmtree, session.directory, True)
+
+
+def _expired(session: UploadSession) -> bool:
+    return time.time() - session.created_at > settings.UPLOAD_SESSION_TTL_HOURS * 3600
+
+
+def purge_expired_sessions() -> None:
+    """Borra las sesiones abandonadas"""
+    if not SESSIONS_DIR.exists():
+        return
+    for directory in SESSIONS_DIR.iterdir():
+        try:
+            created_at = json.loads((directory / MANIFEST_NAME).read_text())["created_at"]
+        except (OSError, ValueError, KeyError):
+            created_at = directory.stat().st_mtime
+        if time.time() - created_at > settings.UPLOAD_SESSION_TTL_HOURS * 3600:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+async def run_session_purger() -> None:
+    """Tarea de fondo que borra las sesiones expiradas cada PURGE_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(purge_expired_sessions)
+        except Exception:
+            logger.exception("Error al borrar las sesiones de subida expiradas")
+        await asyncio.sleep(PURGE_INTERVAL_SECONDS)
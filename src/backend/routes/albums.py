@@ -1,35 +1,78 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+from typing import List, Optional, Set
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Album, User, UserRole
-from schemas import AlbumCreate, AlbumResponse
-from dependencies import get_current_user, require_role
+import blob_store
+from models import Album, UserRole
+from schemas import AlbumCreate, AlbumResponse, AlbumSummary
+from dependencies import Principal, get_current_principal, require_role
+from routes.upload import UPLOAD_DIR
+from streaming import resolve_upload_path
+from media_pipeline import release_song_files
+from image_derivatives import COVER_FORMATS, build_cover_response
+from pagination import fetch_page
 
 router = APIRouter(prefix="/albums", tags=["albums"])
 
+ALBUM_INCLUDES = {"songs"}
 
-@router.get("/", response_model=List[AlbumResponse])
+
+def parse_include(include: Optional[str]) -> Set[str]:
+    """?include=songs (lista separada por comas)"""
+    requested = {part.strip() for part in include.split(",") if part.strip()} if include else set()
+    if requested - ALBUM_INCLUDES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"include inválido, debe ser uno de: {', '.join(sorted(ALBUM_INCLUDES))}"
+        )
+    return requested
+
+
+async def get_album_with_songs(db: AsyncSession, album_id: int) -> Optional[Album]:
+    """Álbum con sus canciones ya cargadas (AlbumResponse las incluye)"""
+    return await db.scalar(
+        select(Album).options(selectinload(Album.songs)).where(Album.id == album_id)
+    )
+
+
+@router.get(
+    "/",
+    response_model=None,
+    responses={200: {"model": List[AlbumResponse], "description": "songs solo con ?include=songs"}},
+)
 async def get_albums(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = 50,
     approved_only: bool = True,
-    db: Session = Depends(get_db)
+    include: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    query = db.query(Album)
+    """
+    Álbumes más recientes primero, paginados por cursor (cabecera X-Next-Cursor).
+    Sin canciones salvo con ?include=songs, que las carga todas en una sola
+    consulta más (selectinload) en lugar de una por álbum.
+    """
+    with_songs = "songs" in parse_include(include)
+    # raiseload: si algo intentara cargar las canciones de una en una, falla
+    query = select(Album).options(selectinload(Album.songs) if with_songs else raiseload(Album.songs))
     if approved_only:
-        query = query.filter(Album.is_approved == True)
+        query = query.where(Album.is_approved == True)
     
-    albums = query.offset(skip).limit(limit).all()
-    return albums
+    albums = await fetch_page(db, query, [(Album.id, True)], "albums", cursor, skip, limit, response)
+    model = AlbumResponse if with_songs else AlbumSummary
+    return [model.model_validate(album) for album in albums]
 
 
 @router.get("/{album_id}", response_model=AlbumResponse)
-async def get_album(album_id: int, db: Session = Depends(get_db)):
-    album = db.query(Album).filter(Album.id == album_id).first()
+async def get_album(album_id: int, db: AsyncSession = Depends(get_db)):
+    album = await get_album_with_songs(db, album_id)
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -38,11 +81,44 @@ async def get_album(album_id: int, db: Session = Depends(get_db)):
     return album
 
 
+@router.get("/{album_id}/cover")
+async def get_album_cover(
+    album_id: int,
+    request: Request,
+    size: Optional[int] = None,  # Lado en píxeles que se va a mostrar (64, 300, 640)
+    format: Optional[str] = None,  # webp o jpeg; por defecto según Accept
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Portada del álbum en la miniatura más pequeña que cubra ?size=.
+    Sin size, o si aún no hay miniaturas, se sirve la imagen original.
+    """
+    if format is not None and format not in COVER_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato inválido, debe ser uno de: {', '.join(COVER_FORMATS)}"
+        )
+    album = await db.get(Album, album_id)
+    if not album or not album.cover_image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+    
+    try:
+        return await build_cover_response(request, db, album.cover_image, size, format)
+    except OSError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+
+
 @router.post("/", response_model=AlbumResponse, status_code=status.HTTP_201_CREATED)
 async def create_album(
     album: AlbumCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.CREATOR, UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.CREATOR, UserRole.ADMIN]))
 ):
     # Los creators y admins aprueban automáticamente sus propios álbumes
     is_approved = current_user.role in [UserRole.CREATOR, UserRole.ADMIN]
@@ -56,19 +132,18 @@ async def create_album(
     )
     
     db.add(new_album)
-    db.commit()
-    db.refresh(new_album)
+    await db.commit()
     
-    return new_album
+    return await get_album_with_songs(db, new_album.id)
 
 
 @router.patch("/{album_id}/approve")
 async def approve_album(
     album_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
 ):
-    album = db.query(Album).filter(Album.id == album_id).first()
+    album = await db.get(Album, album_id)
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -76,7 +151,7 @@ async def approve_album(
         )
     
     album.is_approved = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Album approved successfully", "album": album}
 
@@ -85,13 +160,13 @@ async def approve_album(
 async def update_album(
     album_id: int,
     album_data: dict,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Actualiza un álbum existente. Solo el creador o un admin puede actualizar.
     """
-    album = db.query(Album).filter(Album.id == album_id).first()
+    album = await db.get(Album, album_id)
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -105,6 +180,8 @@ async def update_album(
             detail="Not authorized to update this album"
         )
     
+    previous_cover = album.cover_image
+    
     # Actualizar campos si se proporcionan
     if 'title' in album_data:
         album.title = album_data['title']
@@ -117,8 +194,14 @@ async def update_album(
     if 'release_date' in album_data:
         album.release_date = album_data['release_date']
     
-    db.commit()
-    db.refresh(album)
+    # Cambio de portada: el álbum toma una referencia a la nueva y suelta la anterior
+    cover_changed = album.cover_image != previous_cover
+    if cover_changed:
+        await db.run_sync(blob_store.claim, album.cover_image)
+    await db.commit()
+    if cover_changed:
+        await db.run_sync(blob_store.release, previous_cover)
+    await db.refresh(album)
     
     return album
 
@@ -126,10 +209,10 @@ async def update_album(
 @router.delete("/{album_id}")
 async def delete_album(
     album_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    album = db.query(Album).filter(Album.id == album_id).first()
+    album = await get_album_with_songs(db, album_id)
     if not album:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -142,7 +225,18 @@ async def delete_album(
             detail="Not authorized to delete this album"
         )
     
-    db.delete(album)
-    db.commit()
+    song_files = [(song.id, song.file_path) for song in album.songs]
+    urls = [album.cover_image] + [url for song in album.songs for url in (song.file_path, song.cover_url)]
+    await db.delete(album)
+    await db.commit()
+    
+    # Soltar una referencia por fila; los archivos que otras canciones o
+    # álbumes siguen usando (mismo contenido) se conservan
+    deleted = set(await db.run_sync(blob_store.release_many, urls))
+    
+    # Las canciones se eliminan en cascada; sacarlas de los cachés y borrar lo derivado
+    for song_id, file_path in song_files:
+        audio_path = resolve_upload_path(UPLOAD_DIR, file_path) if file_path in deleted else None
+        release_song_files(UPLOAD_DIR, song_id, audio_path)
     
     return {"message": "Album deleted successfully"}
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import Table, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import get_db
+from models import Song, SongPlaysDaily, SongPlaysHourly
+from schemas import ChartEntry
+from play_events import hour_bucket
+
+router = APIRouter(prefix="/charts", tags=["charts"])
+
+MAX_CHART_SIZE = 100
+
+
+async def build_chart(db: AsyncSession, table: Table, bucket_column: str, start, end, limit: int) -> List[dict]:
+    """
+    Canciones aprobadas con más reproducciones entre start (incluido) y end
+    (excluido), sumando solo las filas de la tabla de agregados
+    """
+    bucket = table.c[bucket_column]
+    totals = (
+        select(
+            table.c.song_id,
+            func.sum(table.c.plays).label("plays"),
+            func.sum(table.c.listened_seconds).label("listened_seconds"),
+        )
+        .where(bucket >= start, bucket < end)
+        .group_by(table.c.song_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(Song, totals.c.plays, totals.c.listened_seconds)
+        .join(totals, Song.id == totals.c.song_id)
+        .where(Song.is_approved == True)
+        .order_by(totals.c.plays.desc(), Song.id)
+        .limit(limit)
+    )).all()
+    return [
+        {"rank": rank, "plays": plays, "listened_seconds": listened_seconds, "song": song}
+        for rank, (song, plays, listened_seconds) in enumerate(rows, start=1)
+    ]
+
+
+@router.get("/daily", response_model=List[ChartEntry])
+async def get_daily_chart(
+    day: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=MAX_CHART_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ranking de un día (UTC). Sin `day`, las últimas 24 horas a partir de los
+    agregados por hora.
+    """
+    if day is None:
+        end = hour_bucket(datetime.utcnow()) + timedelta(hours=1)
+        return await build_chart(db, SongPlaysHourly.__table__, "hour", end - timedelta(hours=24), end, limit)
+    return await build_chart(db, SongPlaysDaily.__table__, "day", day, day + timedelta(days=1), limit)
+
+
+@router.get("/weekly", response_model=List[ChartEntry])
+async def get_weekly_chart(
+    week_ending: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=MAX_CHART_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranking de los 7 días (UTC) que terminan en `week_ending`, por defecto hoy"""
+    end = (week_ending or datetime.utcnow().date()) + timedelta(days=1)
+    return await build_chart(db, SongPlaysDaily.__table__, "day", end - timedelta(days=7), end, limit)
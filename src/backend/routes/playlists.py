@@ -1,46 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Playlist, PlaylistSong, User, Song
+from models import Playlist, PlaylistSong, Song
 from schemas import PlaylistCreate, PlaylistResponse, PlaylistWithSongs
-from dependencies import get_current_user
+from dependencies import Principal, get_current_principal
+from pagination import fetch_page
 
 router = APIRouter(prefix="/playlists", tags=["playlists"])
 
 
 @router.get("/", response_model=List[PlaylistResponse])
 async def get_playlists(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlists = db.query(Playlist).filter(
+    """Playlists públicas y propias, más recientes primero (paginado por cursor)"""
+    query = select(Playlist).where(
         (Playlist.is_public == True) | (Playlist.owner_id == current_user.id)
-    ).offset(skip).limit(limit).all()
-    return playlists
+    )
+    return await fetch_page(db, query, [(Playlist.id, True)], "playlists", cursor, skip, limit, response)
 
 
 @router.get("/my", response_model=List[PlaylistResponse])
 async def get_my_playlists(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlists = db.query(Playlist).filter(Playlist.owner_id == current_user.id).all()
+    playlists = (await db.scalars(select(Playlist).where(Playlist.owner_id == current_user.id))).all()
     return playlists
 
 
 @router.get("/{playlist_id}", response_model=PlaylistWithSongs)
 async def get_playlist(
     playlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -53,9 +58,9 @@ async def get_playlist(
             detail="Not authorized to access this playlist"
         )
     
-    playlist_songs = db.query(Song).join(PlaylistSong).filter(
+    playlist_songs = (await db.scalars(select(Song).join(PlaylistSong).where(
         PlaylistSong.playlist_id == playlist_id
-    ).order_by(PlaylistSong.position).all()
+    ).order_by(PlaylistSong.position))).all()
     
     return {**playlist.__dict__, "songs": playlist_songs}
 
@@ -63,8 +68,8 @@ async def get_playlist(
 @router.post("/", response_model=PlaylistResponse, status_code=status.HTTP_201_CREATED)
 async def create_playlist(
     playlist: PlaylistCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     new_playlist = Playlist(
         name=playlist.name,
@@ -74,8 +79,8 @@ async def create_playlist(
     )
     
     db.add(new_playlist)
-    db.commit()
-    db.refresh(new_playlist)
+    await db.commit()
+    await db.refresh(new_playlist)
     
     return new_playlist
 
@@ -84,10 +89,10 @@ async def create_playlist(
 async def add_song_to_playlist(
     playlist_id: int,
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -100,17 +105,17 @@ async def add_song_to_playlist(
             detail="Not authorized to modify this playlist"
         )
     
-    song = db.query(Song).filter(Song.id == song_id).first()
+    song = await db.get(Song, song_id)
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Song not found"
         )
     
-    existing = db.query(PlaylistSong).filter(
+    existing = await db.scalar(select(PlaylistSong).where(
         PlaylistSong.playlist_id == playlist_id,
         PlaylistSong.song_id == song_id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -118,9 +123,9 @@ async def add_song_to_playlist(
             detail="Song already in playlist"
         )
     
-    max_position = db.query(PlaylistSong).filter(
+    max_position = await db.scalar(select(func.count()).select_from(PlaylistSong).where(
         PlaylistSong.playlist_id == playlist_id
-    ).count()
+    ))
     
     playlist_song = PlaylistSong(
         playlist_id=playlist_id,
@@ -129,7 +134,7 @@ async def add_song_to_playlist(
     )
     
     db.add(playlist_song)
-    db.commit()
+    await db.commit()
     
     return {"message": "Song added to playlist successfully"}
 
@@ -138,10 +143,10 @@ async def add_song_to_playlist(
 async def remove_song_from_playlist(
     playlist_id: int,
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,10 +159,10 @@ async def remove_song_from_playlist(
             detail="Not authorized to modify this playlist"
         )
     
-    playlist_song = db.query(PlaylistSong).filter(
+    playlist_song = await db.scalar(select(PlaylistSong).where(
         PlaylistSong.playlist_id == playlist_id,
         PlaylistSong.song_id == song_id
-    ).first()
+    ))
     
     if not playlist_song:
         raise HTTPException(
@@ -165,8 +170,8 @@ async def remove_song_from_playlist(
             detail="Song not in playlist"
         )
     
-    db.delete(playlist_song)
-    db.commit()
+    await db.delete(playlist_song)
+    await db.commit()
     
     return {"message": "Song removed from playlist successfully"}
 
@@ -174,10 +179,10 @@ async def remove_song_from_playlist(
 @router.delete("/{playlist_id}")
 async def delete_playlist(
     playlist_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    playlist = db.query(Playlist).filter(Playlist.id == playlist_id).first()
+    playlist = await db.get(Playlist, playlist_id)
     if not playlist:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -190,7 +195,7 @@ async def delete_playlist(
             detail="Not authorized to delete this playlist"
         )
     
-    db.delete(playlist)
-    db.commit()
+    await db.delete(playlist)
+    await db.commit()
     
     return {"message": "Playlist deleted successfully"}
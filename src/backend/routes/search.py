@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import get_db
+from models import Album, Song, User, UserRole
+from schemas import SearchResults, Suggestion
+from search_index import parse_terms, search_filter
+from suggest_index import MAX_SUGGESTIONS, suggest_index
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+MAX_SEARCH_RESULTS = 50
+
+
+@router.get("", response_model=SearchResults)
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Canciones, álbumes y creadores que coinciden con `q`, ordenados por
+    relevancia (el último término cuenta como prefijo). Solo contenido
+    aprobado y cuentas activas.
+    """
+    terms = parse_terms(q)
+
+    condition, rank = search_filter("songs", [Song.title, Song.artist], terms)
+    songs = (await db.scalars(
+        select(Song)
+        .where(Song.is_approved == True, condition)
+        .order_by(rank.desc(), Song.play_count.desc(), Song.id)
+        .limit(limit)
+    )).all()
+
+    condition, rank = search_filter("albums", [Album.title, Album.description], terms)
+    albums = (await db.scalars(
+        select(Album)
+        .where(Album.is_approved == True, condition)
+        .order_by(rank.desc(), Album.created_at.desc(), Album.id)
+        .limit(limit)
+    )).all()
+
+    condition, rank = search_filter("users", [User.username], terms)
+    creators = (await db.scalars(
+        select(User)
+        .where(
+            User.is_active == True,
+            User.role.in_([UserRole.CREATOR, UserRole.ADMIN]),
+            condition,
+        )
+        .order_by(rank.desc(), User.username)
+        .limit(limit)
+    )).all()
+
+    return {"songs": songs, "albums": albums, "creators": creators}
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)
+):
+    """
+    Autocompletado mientras se escribe: canciones, artistas y álbumes
+    aprobados cuyo título (o alguna de sus palabras) empieza por `q`. Sale
+    del índice en memoria, sin consultar la base de datos.
+    """
+    return suggest_index.suggest(q, limit)
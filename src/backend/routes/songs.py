@@ -1,60 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status, UploadFile, File
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from typing import List, Optional
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
-from models import Song, User, UserRole, LikedSong
+import blob_store
+from models import Song, SongRanking, UserRole, LikedSong
 from schemas import SongCreate, SongResponse
-from dependencies import get_current_user, require_role
+from dependencies import Principal, get_current_principal, require_role
+from routes.upload import UPLOAD_DIR
+from storage import storage_key
+from streaming import IMMUTABLE_CACHE_CONTROL, build_storage_response, resolve_upload_path
+from media_pipeline import process_new_song, release_song_files
+from peaks import peaks_key
+from image_derivatives import COVER_FORMATS, build_cover_response
+from play_counter import buffering_enabled, play_counter
+from play_events import Play, write_plays
+from rankings import materialized_enabled
+from search_index import parse_terms, search_filter
+from pagination import fetch_page
 
 router = APIRouter(prefix="/songs", tags=["songs"])
 
+# Claves de orden del listado; siempre terminan en el id (ver pagination.py)
+SONG_ORDERS = {
+    "play_count": [(Song.play_count, True), (Song.id, True)],
+    "created_at": [(Song.id, True)],  # El id crece con la fecha de alta
+    "title": [(Song.title, False), (Song.id, False)],
+}
+
 
 @router.get("/", response_model=List[SongResponse])
 async def get_songs(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = 50,
     approved_only: bool = True,
-    order_by: str = "play_count",  # play_count, created_at, title
+    order_by: str = "play_count",  # play_count, trending, created_at, title
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Obtiene lista de canciones con filtros y ordenamiento
-    - order_by: play_count (default), created_at, title
+    - order_by: play_count (default), trending, created_at, title
     - search: busca por título o artista
+    - cursor: el de la cabecera X-Next-Cursor de la página anterior
+    
+    trending lee el ranking materializado (ver rankings.py), que solo incluye
+    canciones aprobadas y se recalcula cada TRENDING_REFRESH_SECONDS: una
+    canción aprobada después aparece en el siguiente recálculo. play_count se
+    ordena al momento.
     """
-    query = db.query(Song)
+    if approved_only and order_by == "trending" and materialized_enabled():
+        query = select(Song).join(SongRanking, SongRanking.song_id == Song.id)
+        if search:
+            query = query.where(search_filter("songs", [Song.title, Song.artist], parse_terms(search))[0])
+        # La posición es única: basta como clave del cursor
+        keys = [(SongRanking.trending_rank, False)]
+        return await fetch_page(db, query, keys, "rank:trending", cursor, skip, limit, response)
+    
+    query = select(Song)
     
     if approved_only:
-        query = query.filter(Song.is_approved == True)
+        query = query.where(Song.is_approved == True)
     
-    # Búsqueda por título o artista
+    # Búsqueda por título o artista (índice de texto completo, ver search_index.py)
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            (Song.title.ilike(search_term)) | (Song.artist.ilike(search_term))
-        )
+        query = query.where(search_filter("songs", [Song.title, Song.artist], parse_terms(search))[0])
     
-    # Ordenamiento
-    if order_by == "play_count":
-        query = query.order_by(Song.play_count.desc())
-    elif order_by == "created_at":
-        query = query.order_by(Song.created_at.desc())
-    elif order_by == "title":
-        query = query.order_by(Song.title.asc())
-    else:
-        query = query.order_by(Song.play_count.desc())  # Default
-    
-    songs = query.offset(skip).limit(limit).all()
-    return songs
+    # Sin ranking materializado, trending se ordena por play_count
+    if order_by not in SONG_ORDERS:
+        order_by = "play_count"
+    return await fetch_page(db, query, SONG_ORDERS[order_by], order_by, cursor, skip, limit, response)
 
 
 @router.get("/{song_id}", response_model=SongResponse)
-async def get_song(song_id: int, db: Session = Depends(get_db)):
-    song = db.query(Song).filter(Song.id == song_id).first()
+async def get_song(song_id: int, db: AsyncSession = Depends(get_db)):
+    song = await db.get(Song, song_id)
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -63,11 +89,75 @@ async def get_song(song_id: int, db: Session = Depends(get_db)):
     return song
 
 
+@router.get("/{song_id}/peaks")
+async def get_song_peaks(song_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Forma de onda precomputada: arreglo binario de int8 (0-127), un valor por tramo.
+    Responde 404 mientras aún no se ha generado.
+    """
+    song = await db.get(Song, song_id)
+    if not song:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+    
+    audio_key = storage_key(song.file_path)
+    try:
+        if audio_key is None:
+            raise FileNotFoundError(song.file_path)
+        return build_storage_response(
+            request,
+            peaks_key(audio_key),
+            media_type="application/octet-stream",
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+    except OSError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Peaks not available"
+        )
+
+
+@router.get("/{song_id}/cover")
+async def get_song_cover(
+    song_id: int,
+    request: Request,
+    size: Optional[int] = None,  # Lado en píxeles que se va a mostrar (64, 300, 640)
+    format: Optional[str] = None,  # webp o jpeg; por defecto según Accept
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Portada de la canción en la miniatura más pequeña que cubra ?size=.
+    Sin size, o si aún no hay miniaturas, se sirve la imagen original.
+    """
+    if format is not None and format not in COVER_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato inválido, debe ser uno de: {', '.join(COVER_FORMATS)}"
+        )
+    song = await db.get(Song, song_id)
+    if not song or not song.cover_url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+    
+    try:
+        return await build_cover_response(request, db, song.cover_url, size, format)
+    except OSError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not found"
+        )
+
+
 @router.post("/", response_model=SongResponse, status_code=status.HTTP_201_CREATED)
 async def create_song(
     song: SongCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.CREATOR, UserRole.ADMIN]))
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.CREATOR, UserRole.ADMIN]))
 ):
     """
     Crea una nueva canción
@@ -89,8 +179,14 @@ async def create_song(
     )
     
     db.add(new_song)
-    db.commit()
-    db.refresh(new_song)
+    # La canción toma una referencia a cada archivo que guarda (ver blob_store.py)
+    await db.run_sync(blob_store.claim, new_song.file_path)
+    await db.run_sync(blob_store.claim, new_song.cover_url)
+    await db.commit()
+    await db.refresh(new_song)
+    
+    # Transcodificar y segmentar el audio después de responder
+    background_tasks.add_task(process_new_song, new_song.id)
     
     return new_song
 
@@ -98,10 +194,10 @@ async def create_song(
 @router.patch("/{song_id}/approve")
 async def approve_song(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
 ):
-    song = db.query(Song).filter(Song.id == song_id).first()
+    song = await db.get(Song, song_id)
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,7 +205,7 @@ async def approve_song(
         )
     
     song.is_approved = True
-    db.commit()
+    await db.commit()
     
     return {"message": "Song approved successfully", "song": song}
 
@@ -117,10 +213,10 @@ async def approve_song(
 @router.delete("/{song_id}")
 async def delete_song(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    song = db.query(Song).filter(Song.id == song_id).first()
+    song = await db.get(Song, song_id)
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -133,8 +229,18 @@ async def delete_song(
             detail="Not authorized to delete this song"
         )
     
-    db.delete(song)
-    db.commit()
+    file_path = song.file_path
+    cover_url = song.cover_url
+    await db.delete(song)
+    await db.commit()
+    
+    # Soltar las referencias de la canción: el audio y la portada se borran con
+    # la última, y solo entonces sus picos y su entrada en los cachés
+    deleted = await db.run_sync(blob_store.release_many, [file_path, cover_url])
+    audio_path = resolve_upload_path(UPLOAD_DIR, file_path) if file_path in deleted else None
+    
+    # El audio ya no es accesible; sacarlo de los cachés y borrar lo derivado
+    release_song_files(UPLOAD_DIR, song_id, audio_path)
     
     return {"message": "Song deleted successfully"}
 
@@ -142,32 +248,41 @@ async def delete_song(
 @router.post("/{song_id}/play")
 async def increment_play_count(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    duration_listened: Optional[int] = Query(None, ge=0, description="Segundos escuchados"),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Incrementa el contador de reproducciones de una canción"""
-    song = db.query(Song).filter(Song.id == song_id).first()
-    if not song:
+    """
+    Registra una reproducción de la canción. Se acumula en memoria y se escribe
+    en lote (ver play_counter.py); play_count incluye las pendientes de este proceso.
+    """
+    play_count = await db.scalar(select(Song.play_count).where(Song.id == song_id))
+    if play_count is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Song not found"
         )
     
-    song.play_count += 1
-    db.commit()
+    play = Play(song_id, current_user.id, datetime.utcnow(), duration_listened)
+    if buffering_enabled():
+        play_counter.record(play)
+        return {"message": "Play count incremented", "play_count": play_count + play_counter.pending(song_id)}
+    
+    await db.run_sync(write_plays, [play])
+    await db.commit()
     
-    return {"message": "Play count incremented", "play_count": song.play_count}
+    return {"message": "Play count incremented", "play_count": play_count + 1}
 
 
 @router.post("/{song_id}/like")
 async def like_song(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Agrega una canción a favoritos del usuario"""
     # Verificar que la canción existe
-    song = db.query(Song).filter(Song.id == song_id).first()
+    song = await db.get(Song, song_id)
     if not song:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -175,10 +290,10 @@ async def like_song(
         )
     
     # Verificar si ya está en favoritos
-    existing_like = db.query(LikedSong).filter(
+    existing_like = await db.scalar(select(LikedSong).where(
         LikedSong.user_id == current_user.id,
         LikedSong.song_id == song_id
-    ).first()
+    ))
     
     if existing_like:
         raise HTTPException(
@@ -193,7 +308,7 @@ async def like_song(
     )
     
     db.add(new_like)
-    db.commit()
+    await db.commit()
     
     return {"message": "Song liked successfully", "song_id": song_id}
 
@@ -201,14 +316,14 @@ async def like_song(
 @router.delete("/{song_id}/like")
 async def unlike_song(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Elimina una canción de favoritos del usuario"""
-    liked_song = db.query(LikedSong).filter(
+    liked_song = await db.scalar(select(LikedSong).where(
         LikedSong.user_id == current_user.id,
         LikedSong.song_id == song_id
-    ).first()
+    ))
     
     if not liked_song:
         raise HTTPException(
@@ -216,55 +331,38 @@ async def unlike_song(
             detail="Song not in liked songs"
         )
     
-    db.delete(liked_song)
-    db.commit()
+    await db.delete(liked_song)
+    await db.commit()
     
     return {"message": "Song unliked successfully", "song_id": song_id}
 
 
 @router.get("/liked/all", response_model=List[SongResponse])
 async def get_liked_songs(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """Obtiene todas las canciones favoritas del usuario"""
-    liked_songs = db.query(Song).join(LikedSong).filter(
-        LikedSong.user_id == current_user.id
-    ).order_by(LikedSong.liked_at.desc()).offset(skip).limit(limit).all()
-    
-    return liked_songs
+    """Obtiene las canciones favoritas del usuario, las últimas primero (paginado por cursor)"""
+    query = select(Song).join(LikedSong).where(LikedSong.user_id == current_user.id)
+    # El id del like crece con liked_at
+    return await fetch_page(db, query, [(LikedSong.id, True)], "liked", cursor, skip, limit, response)
 
 
 @router.get("/{song_id}/is-liked")
 async def check_if_liked(
     song_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Verifica si una canción está en favoritos del usuario"""
-    liked = db.query(LikedSong).filter(
+    liked = await db.scalar(select(LikedSong).where(
         LikedSong.user_id == current_user.id,
         LikedSong.song_id == song_id
-    ).first()
+    ))
     
     return {"is_liked": liked is not None, "song_id": song_id}
 
-
-@router.post("/{song_id}/play")
-async def increment_play_count(
-    song_id: int,
-    db: Session = Depends(get_db)
-):
-    song = db.query(Song).filter(Song.id == song_id).first()
-    if not song:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Song not found"
-        )
-    
-    song.play_count += 1
-    db.commit()
-    
-    return {"message": "Play count incremented", "play_count": song.play_count}
@@ -0,0 +1,103 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import get_db
+from models import Song, UserRole
+from dependencies import Principal, require_role
+from file_cache import file_cache
+from hot_set import hot_set
+from routes.upload import UPLOAD_DIR
+from segmenting import HLS_MEDIA_TYPES, is_valid_hls_filename, segments_dir
+from storage import storage_key
+from streaming import IMMUTABLE_CACHE_CONTROL, build_storage_response
+from transcoding import choose_bitrate, select_rendition
+
+router = APIRouter(prefix="/stream", tags=["stream"])
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
+):
+    """Contadores de los cachés de streaming (descriptores abiertos y mmap)"""
+    return {"file_cache": file_cache.stats(), "hot_set": hot_set.stats()}
+
+
+@router.api_route("/{song_id}", methods=["GET", "HEAD"])
+async def stream_song(
+    song_id: int,
+    request: Request,
+    quality: Optional[str] = None,  # low, medium, high, original o kbps
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Sirve el audio de una canción con soporte de Range (simple y múltiple),
+    ETag/Last-Modified y peticiones condicionales (If-Range, If-None-Match).
+    La calidad se elige con ?quality= o, si no se indica, con las cabeceras
+    Save-Data / Downlink del cliente. Sin ninguna de ellas se sirve la calidad
+    alta (DEFAULT_BITRATE, 256 kbps), o el original si no hay rendition de
+    ese bitrate; es el mismo archivo que mantiene mapeado el conjunto caliente.
+    """
+    song = await db.scalar(
+        select(Song).options(selectinload(Song.renditions)).where(Song.id == song_id)
+    )
+    if not song:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Song not found"
+        )
+
+    bitrate = choose_bitrate(quality, request.headers.get("save-data"), request.headers.get("downlink"))
+    rendition = select_rendition(song, bitrate)
+    file_path = rendition.file_path if rendition else song.file_path
+
+    key = storage_key(file_path)
+    if key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audio file not found"
+        )
+
+    try:
+        response = build_storage_response(request, key)
+    except OSError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audio file not found"
+        )
+    
+    if quality is None:
+        response.headers["Vary"] = "Save-Data, Downlink"
+    return response
+
+
+@router.api_route("/{song_id}/hls/{filename}", methods=["GET", "HEAD"])
+async def stream_song_segment(song_id: int, filename: str, request: Request):
+    """
+    Sirve el manifiesto (index.m3u8) o un segmento HLS de una canción.
+    No consulta la base de datos: los archivos se eliminan junto con la canción.
+    """
+    if not is_valid_hls_filename(filename):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Segment not found"
+        )
+
+    key = storage_key(segments_dir(UPLOAD_DIR, song_id) / filename)
+    try:
+        return build_storage_response(
+            request,
+            key,
+            media_type=HLS_MEDIA_TYPES[os.path.splitext(filename)[1]],
+            cache_control=IMMUTABLE_CACHE_CONTROL,
+        )
+    except OSError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Segment not found"
+        )
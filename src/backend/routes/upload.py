@@ -5,21 +5,28 @@ from pathlib import Path
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import uuid
-import shutil
 
 from database import get_db
-from dependencies import get_current_user
+from dependencies import Principal, get_current_principal, get_current_user
+from media_pipeline import process_new_song
+from image_derivatives import generate_cover_variants
+from audio_metadata import read_audio_info_async
+from upload_stream import FileRule, StoredFile, receive_upload
+import resumable_upload
+import blob_store
+from storage import UPLOAD_DIR, storage, storage_key
 from models import User, Song, Album
+from schemas import UploadSessionCreate, AlbumFinalize
+from user_cache import invalidate_user
 from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
-# Configuración de directorios con estructura organizada
-UPLOAD_DIR = Path("uploads")
+# Configuración de directorios con estructura organizada (UPLOAD_DIR viene de storage)
 SONGS_DIR = UPLOAD_DIR / "songs"
 COVERS_SONGS_DIR = UPLOAD_DIR / "covers" / "songs"
 COVERS_ALBUMS_DIR = UPLOAD_DIR / "covers" / "albums"
@@ -35,86 +42,90 @@ ALLOWED_IMAGE_TYPES = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
 MAX_AUDIO_SIZE = 20 * 1024 * 1024  # 20 MB
 MAX_IMAGE_SIZE = 5 * 1024 * 1024   # 5 MB
 
+# Reglas para upload_stream: tipo, tamaño máximo y directorio de destino por campo
+SONG_RULE = FileRule("Audio", ALLOWED_AUDIO_TYPES, MAX_AUDIO_SIZE, SONGS_DIR)
+COVER_RULE = FileRule("Imagen", ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, COVERS_SONGS_DIR)
+ALBUM_COVER_RULE = FileRule("Imagen", ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, COVERS_ALBUMS_DIR)
+AVATAR_RULE = FileRule("Imagen", ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, AVATARS_DIR)
+ALBUM_RULES = {
+    "album_cover": FileRule("Portada de álbum", ALLOWED_IMAGE_TYPES, MAX_IMAGE_SIZE, COVERS_ALBUMS_DIR),
+    "songs": FileRule("Canción", ALLOWED_AUDIO_TYPES, MAX_AUDIO_SIZE, SONGS_DIR, multiple=True),
+}
+# Tipos de archivo que se pueden subir por sesiones reanudables
+SESSION_RULES = {
+    "song": SONG_RULE,
+    "cover": COVER_RULE,
+    "album_cover": ALBUM_COVER_RULE,
+}
 
-def validate_file_type(file: UploadFile, allowed_types: List[str], file_type: str):
-    """Valida el tipo MIME del archivo"""
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"{file_type} debe ser uno de: {', '.join(allowed_types)}"
-        )
+
+async def receive_single_file(request: Request, rule: FileRule, db: AsyncSession) -> StoredFile:
+    """
+    Recibe un formulario con un único archivo en el campo "file" y lo registra
+    en el almacén por contenido (un archivo idéntico ya subido se reutiliza)
+    """
+    form = await receive_upload(request, {"file": rule})
+    stored = form.file("file")
+    if stored is None:
+        raise HTTPException(status_code=400, detail="No se recibió ningún archivo")
+    return await db.run_sync(blob_store.put, stored)
 
 
-def validate_file_size(file: UploadFile, max_size: int, file_type: str):
-    """Valida el tamaño del archivo"""
-    file.file.seek(0, 2)  # Ir al final del archivo
-    size = file.file.tell()  # Obtener posición (tamaño)
-    file.file.seek(0)  # Volver al inicio
+async def song_upload_response(stored: StoredFile) -> dict:
+    # Leer duración, bitrate, etc. del archivo real (en el pool de procesos)
+    audio_info = await read_audio_info_async(stored.path)
     
-    if size > max_size:
-        max_size_mb = max_size / (1024 * 1024)
-        raise HTTPException(
-            status_code=400,
-            detail=f"{file_type} no debe superar {max_size_mb} MB"
-        )
+    return {
+        "message": "Canción subida exitosamente",
+        "filename": stored.path.name,
+        "path": stored.url,
+        "size": stored.size,
+        "sha256": stored.sha256,
+        "duration": int(round(audio_info["duration"])) if audio_info else None,
+        "bitrate": audio_info["bitrate"] if audio_info else None,
+        "sample_rate": audio_info["sample_rate"] if audio_info else None,
+        "channels": audio_info["channels"] if audio_info else None
+    }
 
 
-def save_upload_file(upload_file: UploadFile, destination: Path) -> str:
-    """Guarda el archivo subido y retorna la ruta relativa con barras correctas para URLs"""
-    try:
-        with destination.open("wb") as buffer:
-            shutil.copyfileobj(upload_file.file, buffer)
-        # Convertir a string y reemplazar backslashes con forward slashes para URLs
-        relative_path = str(destination.relative_to(UPLOAD_DIR))
-        return relative_path.replace("\\", "/")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error al guardar archivo: {str(e)}")
-    finally:
-        upload_file.file.close()
+def cover_upload_response(stored: StoredFile, message: str) -> dict:
+    return {
+        "message": message,
+        "filename": stored.path.name,
+        "path": stored.url,
+        "size": stored.size,
+        "sha256": stored.sha256
+    }
 
 
 @router.post("/song")
 async def upload_song(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Sube un archivo de audio (canción)
     Solo accesible para creators y admins
     """
-    # Verificar permisos
+    # Verificar permisos (antes de leer el cuerpo)
     if current_user.role not in ["creator", "admin"]:
         raise HTTPException(
             status_code=403,
             detail="Solo creators y admins pueden subir canciones"
         )
     
-    # Validar tipo y tamaño
-    validate_file_type(file, ALLOWED_AUDIO_TYPES, "Audio")
-    validate_file_size(file, MAX_AUDIO_SIZE, "Audio")
-    
-    # Generar nombre único
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = SONGS_DIR / unique_filename
-    
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
-    
-    return {
-        "message": "Canción subida exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
-    }
+    # Recibir en streaming: valida tipo y tamaño mientras se escribe en songs/
+    stored = await receive_single_file(request, SONG_RULE, db)
+    return await song_upload_response(stored)
 
 
 @router.post("/cover")
 async def upload_cover(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Sube una imagen de portada (cover)
@@ -127,30 +138,18 @@ async def upload_cover(
             detail="Solo creators y admins pueden subir covers"
         )
     
-    # Validar tipo y tamaño
-    validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
-    validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
-    
-    # Generar nombre único y guardar en covers/songs (para portadas de canciones)
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = COVERS_SONGS_DIR / unique_filename
-    
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
-    
-    return {
-        "message": "Cover subido exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
-    }
+    # Guardar en covers/songs (para portadas de canciones)
+    stored = await receive_single_file(request, COVER_RULE, db)
+    background_tasks.add_task(generate_cover_variants, stored.url)
+    return cover_upload_response(stored, "Cover subido exitosamente")
 
 
 @router.post("/album-cover")
 async def upload_album_cover(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Sube una portada de álbum.
@@ -163,65 +162,43 @@ async def upload_album_cover(
             detail="Solo creators y admins pueden subir portadas de álbumes"
         )
     
-    # Validar tipo y tamaño
-    validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
-    validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
-    
-    # Generar nombre único y guardar en covers/albums
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = COVERS_ALBUMS_DIR / unique_filename
-    
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
-    
-    return {
-        "message": "Portada de álbum subida exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "size": file_path.stat().st_size
-    }
+    # Guardar en covers/albums
+    stored = await receive_single_file(request, ALBUM_COVER_RULE, db)
+    background_tasks.add_task(generate_cover_variants, stored.url)
+    return cover_upload_response(stored, "Portada de álbum subida exitosamente")
 
 
 @router.post("/avatar")
 async def upload_avatar(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Sube una imagen de avatar de usuario
     """
-    # Validar tipo y tamaño
-    validate_file_type(file, ALLOWED_IMAGE_TYPES, "Imagen")
-    validate_file_size(file, MAX_IMAGE_SIZE, "Imagen")
-    
-    # Generar nombre único
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"user_{current_user.id}_{uuid.uuid4()}.{file_extension}"
-    file_path = AVATARS_DIR / unique_filename
-    
-    # Si el usuario ya tiene un avatar, eliminar el anterior
-    if current_user.avatar_url:
+    stored = await receive_single_file(request, AVATAR_RULE, db)
+    previous = current_user.profile_picture
+    
+    # Actualizar usuario en BD (y la copia del caché de get_current_user)
+    await db.run_sync(blob_store.claim, stored.url)
+    current_user.profile_picture = stored.url
+    await db.commit()
+    await invalidate_user(current_user.email)
+    
+    # Si el usuario ya tenía un avatar, soltar su referencia (también si es
+    # el mismo archivo: la subida acaba de sumar otra)
+    if previous:
         try:
-            old_avatar_path = UPLOAD_DIR / current_user.avatar_url.replace("/uploads/", "")
-            if old_avatar_path.exists():
-                old_avatar_path.unlink()
+            await db.run_sync(blob_store.release, previous)
         except Exception:
             pass  # Ignorar errores al eliminar avatar anterior
     
-    # Guardar archivo
-    relative_path = save_upload_file(file, file_path)
-    
-    # Actualizar usuario en BD
-    current_user.avatar_url = f"/uploads/{relative_path}"
-    db.commit()
-    
     return {
         "message": "Avatar subido exitosamente",
-        "filename": unique_filename,
-        "path": f"/uploads/{relative_path}",
-        "avatar_url": current_user.avatar_url
+        "filename": stored.path.name,
+        "path": stored.url,
+        "avatar_url": stored.url
     }
 
 
@@ -229,11 +206,16 @@ async def upload_avatar(
 async def delete_file(
     file_type: str,
     filename: str,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Elimina un archivo subido
     Solo accesible para creators y admins
+
+    Los archivos se comparten por contenido: se descarta una subida que aún no
+    usa ninguna canción, álbum o usuario, y el archivo solo se borra del disco
+    cuando no le quedan referencias. Si solo lo usan filas, responde 409.
     """
     # Verificar permisos
     if current_user.role not in ["creator", "admin"]:
@@ -257,10 +239,10 @@ async def delete_file(
             detail="Tipo de archivo inválido"
         )
     
-    file_path = type_map[file_type] / filename
+    key = storage_key(type_map[file_type] / filename)
     
     # Verificar si el archivo existe
-    if not file_path.exists():
+    if key is None or storage.stat(key) is None:
         raise HTTPException(
             status_code=404,
             detail="Archivo no encontrado"
@@ -268,8 +250,13 @@ async def delete_file(
     
     # Eliminar archivo
     try:
-        file_path.unlink()
+        await db.run_sync(blob_store.discard, f"/uploads/{key}")
         return {"message": "Archivo eliminado exitosamente"}
+    except blob_store.BlobInUse:
+        raise HTTPException(
+            status_code=409,
+            detail="El archivo está en uso"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -279,20 +266,18 @@ async def delete_file(
 
 @router.post("/album")
 async def upload_album(
-    album_title: str = Form(...),
-    release_year: int = Form(None),
-    album_cover: UploadFile = File(...),
-    songs: List[UploadFile] = File(...),
-    song_titles: List[str] = Form(None),
-    song_artists: List[str] = Form(None),
-    song_durations: List[int] = Form(None),
-    song_genres: List[str] = Form(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Sube un álbum completo con múltiples canciones y una portada
     Solo accesible para creators y admins
+
+    Campos: album_title, release_year, album_cover, songs (varios) y, opcionalmente,
+    song_titles, song_artists, song_durations y song_genres en el mismo orden que songs.
+    Para álbumes grandes conviene usar las sesiones reanudables y /album/finalize.
     """
     # Verificar permisos
     if current_user.role not in ["creator", "admin"]:
@@ -301,8 +286,67 @@ async def upload_album(
             detail="Solo creators y admins pueden subir álbumes"
         )
     
+    # Recibir en streaming: la portada y cada canción se validan y escriben al llegar
+    form = await receive_upload(request, ALBUM_RULES)
+    try:
+        album_title = form.get("album_title")
+        if not album_title:
+            raise HTTPException(status_code=400, detail="Debe incluir el título del álbum")
+        
+        album_cover = form.file("album_cover")
+        if album_cover is None:
+            raise HTTPException(status_code=400, detail="Debe incluir la portada del álbum")
+        
+        try:
+            release_year = int(form.get("release_year")) if form.get("release_year") else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Año de lanzamiento inválido")
+    except Exception:
+        form.discard()
+        raise
+    
+    # Registrar por contenido: portadas y canciones repetidas no ocupan disco
+    stored = await db.run_sync(blob_store.put_many, [album_cover] + form.filelist("songs"))
+    try:
+        album, new_songs = await db.run_sync(
+            create_album, current_user, album_title, release_year, stored[0], stored[1:],
+            song_titles=form.getlist("song_titles"),
+            song_artists=form.getlist("song_artists"),
+            song_durations=form.getlist("song_durations"),
+            song_genres=form.getlist("song_genres"),
+        )
+    except Exception:
+        await db.run_sync(blob_store.discard_many, [item.url for item in stored])
+        raise
+    
+    # Miniaturas de la portada, transcodificar y segmentar el audio después de responder
+    background_tasks.add_task(generate_cover_variants, stored[0].url)
+    for new_song in new_songs:
+        background_tasks.add_task(process_new_song, new_song.id)
+    
+    return album
+
+
+def create_album(
+    db: Session,
+    current_user: Principal,
+    album_title: str,
+    release_year: Optional[int],
+    album_cover: StoredFile,
+    songs: List[StoredFile],
+    song_titles: Optional[List[str]] = None,
+    song_artists: Optional[List[str]] = None,
+    song_durations: Optional[list] = None,
+    song_genres: Optional[List[str]] = None,
+):
+    """
+    Registra el álbum y sus canciones a partir de archivos ya guardados, en una
+    sola transacción: si algo falla no queda un álbum a medias en la BD.
+    Retorna la respuesta del endpoint y las canciones creadas. Es síncrona: las
+    rutas la llaman con db.run_sync().
+    """
     # Validar que haya al menos una canción
-    if not songs or len(songs) == 0:
+    if not songs:
         raise HTTPException(
             status_code=400,
             detail="Debe incluir al menos una canción"
@@ -331,81 +375,71 @@ async def upload_album(
             detail=f"Se esperan {num_songs} géneros, se recibieron {len(song_genres)}"
         )
     
-    # Subir portada del álbum
-    validate_file_type(album_cover, ALLOWED_IMAGE_TYPES, "Portada de álbum")
-    validate_file_size(album_cover, MAX_IMAGE_SIZE, "Portada de álbum")
-    
-    cover_extension = album_cover.filename.split(".")[-1]
-    cover_filename = f"{uuid.uuid4()}.{cover_extension}"
-    cover_path = COVERS_ALBUMS_DIR / cover_filename
-    cover_relative_path = save_upload_file(album_cover, cover_path)
-    
     # Crear álbum en la base de datos
     release_date = datetime(release_year, 1, 1) if release_year else None
     is_approved = current_user.role in ["creator", "admin"]
     
     new_album = Album(
         title=album_title,
-        cover_image=f"/uploads/{cover_relative_path}",
+        cover_image=album_cover.url,
         release_date=release_date,
         creator_id=current_user.id,
         is_approved=is_approved
     )
     
-    db.add(new_album)
-    db.commit()
-    db.refresh(new_album)
-    
-    # Subir y crear canciones
-    uploaded_songs = []
-    for idx, song_file in enumerate(songs):
-        # Validar archivo de audio
-        validate_file_type(song_file, ALLOWED_AUDIO_TYPES, f"Canción {idx + 1}")
-        validate_file_size(song_file, MAX_AUDIO_SIZE, f"Canción {idx + 1}")
-        
-        # Guardar archivo de audio
-        song_extension = song_file.filename.split(".")[-1]
-        song_filename = f"{uuid.uuid4()}.{song_extension}"
-        song_path = SONGS_DIR / song_filename
-        song_relative_path = save_upload_file(song_file, song_path)
-        
-        # Obtener metadata de la canción con conversión segura de tipos
-        title = song_titles[idx] if song_titles and idx < len(song_titles) else f"Track {idx + 1}"
-        artist = song_artists[idx] if song_artists and idx < len(song_artists) else "Unknown Artist"
+    try:
+        db.add(new_album)
+        db.flush()  # Obtener el id sin confirmar todavía
+        blob_store.claim(db, album_cover.url)
         
-        # Convertir duración a int de forma segura
-        try:
-            duration = int(song_durations[idx]) if song_durations and idx < len(song_durations) else 180
-        except (ValueError, TypeError):
-            duration = 180
+        # Crear canciones (los archivos ya están en songs/)
+        uploaded_songs = []
+        new_songs = []
+        for idx, song_file in enumerate(songs):
+            # Obtener metadata de la canción con conversión segura de tipos
+            title = song_titles[idx] if song_titles and song_titles[idx] else f"Track {idx + 1}"
+            artist = song_artists[idx] if song_artists and song_artists[idx] else "Unknown Artist"
             
-        genre = song_genres[idx] if song_genres and idx < len(song_genres) else None
-        
-        # Evitar géneros vacíos
-        if genre and genre.strip().lower() in ['', 'sin género', 'none']:
-            genre = None
-        
-        # Crear canción en la base de datos
-        new_song = Song(
-            title=title,
-            artist=artist,
-            duration=duration,
-            genre=genre,
-            file_path=f"/uploads/{song_relative_path}",
-            cover_url=f"/uploads/{cover_relative_path}",  # Usar la misma portada del álbum
-            album_id=new_album.id,
-            creator_id=current_user.id,
-            is_approved=is_approved
-        )
+            # Convertir duración a int de forma segura
+            try:
+                duration = int(song_durations[idx]) if song_durations else 180
+            except (ValueError, TypeError):
+                duration = 180
+                
+            genre = song_genres[idx] if song_genres else None
+            
+            # Evitar géneros vacíos
+            if genre and genre.strip().lower() in ['', 'sin género', 'none']:
+                genre = None
+            
+            # Crear canción en la base de datos
+            new_song = Song(
+                title=title,
+                artist=artist,
+                duration=duration,
+                genre=genre,
+                file_path=song_file.url,
+                cover_url=album_cover.url,  # Usar la misma portada del álbum
+                album_id=new_album.id,
+                creator_id=current_user.id,
+                is_approved=is_approved
+            )
+            
+            db.add(new_song)
+            # Una referencia por fila: la portada queda con una por canción más la del álbum
+            blob_store.claim(db, song_file.url)
+            blob_store.claim(db, album_cover.url)
+            new_songs.append(new_song)
+            uploaded_songs.append({
+                "title": title,
+                "artist": artist,
+                "file_path": song_file.url
+            })
         
-        db.add(new_song)
-        uploaded_songs.append({
-            "title": title,
-            "artist": artist,
-            "file_path": f"/uploads/{song_relative_path}"
-        })
-    
-    db.commit()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     
     return {
         "message": "Álbum subido exitosamente",
@@ -417,4 +451,158 @@ async def upload_album(
         },
         "songs": uploaded_songs,
         "total_songs": len(uploaded_songs)
-    }
+    }, new_songs
+
+
+# --- Subidas reanudables ---------------------------------------------------
+#
+# 1. POST   /upload/sessions                     → upload_id, chunk_size, total_chunks
+# 2. PUT    /upload/sessions/{id}/chunks/{index} → cuerpo crudo del trozo (reintentable)
+#    GET    /upload/sessions/{id}                → received_chunks, para reanudar
+# 3. POST   /upload/sessions/{id}/complete       → archivo suelto (song, cover, album_cover)
+#    POST   /upload/album/finalize               → varias sesiones como un álbum
+
+
+def require_creator(current_user: Principal):
+    if current_user.role not in ["creator", "admin"]:
+        raise HTTPException(
+            status_code=403,
+            detail="Solo creators y admins pueden subir contenido"
+        )
+
+
+@router.post("/sessions", status_code=201)
+async def create_upload_session(
+    data: UploadSessionCreate,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Abre una sesión de subida reanudable para un archivo"""
+    require_creator(current_user)
+    rule = SESSION_RULES.get(data.kind)
+    if rule is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipo de subida inválido, debe ser uno de: {', '.join(SESSION_RULES)}"
+        )
+    session = resumable_upload.create_session(
+        current_user.id, data.kind, rule, data.filename, data.content_type, data.size
+    )
+    return session.to_dict()
+
+
+@router.get("/sessions/{upload_id}")
+async def get_upload_session(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Estado de la sesión: qué trozos ya se recibieron"""
+    return resumable_upload.load_session(upload_id, current_user.id).to_dict()
+
+
+@router.put("/sessions/{upload_id}/chunks/{index}")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Recibe el trozo `index` (desde 0) como cuerpo crudo de la petición"""
+    session = resumable_upload.load_session(upload_id, current_user.id)
+    await resumable_upload.receive_chunk(session, index, request)
+    return {"upload_id": upload_id, "index": index, "received_chunks": session.received_chunks()}
+
+
+@router.delete("/sessions/{upload_id}")
+async def abort_upload_session(
+    upload_id: str,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Cancela la sesión y borra los trozos recibidos"""
+    session = resumable_upload.load_session(upload_id, current_user.id)
+    await resumable_upload.discard_session(session)
+    return {"message": "Subida cancelada"}
+
+
+@router.post("/sessions/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """Une los trozos y responde igual que /upload/song, /upload/cover o /upload/album-cover"""
+    require_creator(current_user)
+    session = resumable_upload.load_session(upload_id, current_user.id)
+    stored = await resumable_upload.assemble(session, SESSION_RULES[session.kind])
+    stored = await db.run_sync(blob_store.put, stored)
+    await resumable_upload.discard_session(session)
+    
+    if session.kind == "song":
+        return await song_upload_response(stored)
+    background_tasks.add_task(generate_cover_variants, stored.url)
+    if session.kind == "album_cover":
+        return cover_upload_response(stored, "Portada de álbum subida exitosamente")
+    return cover_upload_response(stored, "Cover subido exitosamente")
+
+
+@router.post("/album/finalize")
+async def finalize_album_upload(
+    data: AlbumFinalize,
+    background_tasks: BackgroundTasks,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Crea un álbum a partir de sesiones reanudables: una de tipo album_cover y
+    una de tipo song por canción, todas con sus trozos completos. Si algo falla
+    las sesiones se conservan y se puede reintentar.
+    """
+    require_creator(current_user)
+    
+    cover_session = resumable_upload.load_session(data.cover_upload_id, current_user.id)
+    if cover_session.kind != "album_cover":
+        raise HTTPException(status_code=400, detail="cover_upload_id debe ser una sesión de tipo album_cover")
+    song_sessions = []
+    for track in data.songs:
+        session = resumable_upload.load_session(track.upload_id, current_user.id)
+        if session.kind != "song":
+            raise HTTPException(status_code=400, detail=f"La sesión {track.upload_id} no es de tipo song")
+        song_sessions.append(session)
+    
+    # Comprobar que todo llegó antes de unir nada
+    for session in [cover_session] + song_sessions:
+        if len(session.received_chunks()) != session.total_chunks:
+            raise HTTPException(status_code=409, detail=f"La sesión {session.id} tiene trozos pendientes")
+    
+    assembled: List[StoredFile] = []
+    try:
+        assembled.append(await resumable_upload.assemble(cover_session, ALBUM_COVER_RULE))
+        for session in song_sessions:
+            assembled.append(await resumable_upload.assemble(session, SONG_RULE))
+    except Exception:
+        for stored in assembled:
+            stored.path.unlink(missing_ok=True)
+        raise
+    
+    stored = await db.run_sync(blob_store.put_many, assembled)
+    try:
+        album, new_songs = await db.run_sync(
+            create_album, current_user, data.album_title, data.release_year, stored[0], stored[1:],
+            song_titles=[track.title for track in data.songs],
+            song_artists=[track.artist for track in data.songs],
+            song_durations=[track.duration for track in data.songs],
+            song_genres=[track.genre for track in data.songs],
+        )
+    except Exception:
+        await db.run_sync(blob_store.discard_many, [item.url for item in stored])
+        raise
+    
+    for session in [cover_session] + song_sessions:
+        await resumable_upload.discard_session(session)
+    
+    # Miniaturas de la portada, transcodificar y segmentar el audio después de responder
+    background_tasks.add_task(generate_cover_variants, stored[0].url)
+    for new_song in new_songs:
+        background_tasks.add_task(process_new_song, new_song.id)
+    
+    return album
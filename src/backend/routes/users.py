@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database import get_db
 from models import User, UserRole
 from schemas import UserResponse
-from dependencies import get_current_user, require_role
+from dependencies import Principal, get_current_principal, get_current_user, require_role
+from user_cache import invalidate_user
+from pagination import fetch_page
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -19,22 +22,24 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 @router.get("/", response_model=List[UserResponse])
 async def get_all_users(
-    skip: int = 0,
+    response: Response,
+    cursor: Optional[str] = None,
+    skip: int = Query(0, ge=0, deprecated=True),
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
 ):
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    """Usuarios por orden de alta, paginados por cursor (cabecera X-Next-Cursor)"""
+    return await fetch_page(db, select(User), [(User.id, False)], "users", cursor, skip, limit, response)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,10 +52,10 @@ async def get_user(
 async def update_user_role(
     user_id: int,
     new_role: UserRole,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,8 +63,10 @@ async def update_user_role(
         )
     
     user.role = new_role
-    db.commit()
-    db.refresh(user)
+    user.token_version = (user.token_version or 0) + 1  # Revoca los tokens con el rol anterior
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_user(user.email)
     
     return {"message": f"User role updated to {new_role.value}", "user": user}
 
@@ -67,10 +74,10 @@ async def update_user_role(
 @router.patch("/{user_id}/deactivate")
 async def deactivate_user(
     user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_role([UserRole.ADMIN]))
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(require_role([UserRole.ADMIN]))
 ):
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -78,6 +85,8 @@ async def deactivate_user(
         )
     
     user.is_active = False
-    db.commit()
+    user.token_version = (user.token_version or 0) + 1
+    await db.commit()
+    await invalidate_user(user.email)
     
     return {"message": "User deactivated successfully"}
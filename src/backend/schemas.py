@@ -44,6 +44,9 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    role: Optional[str] = None
+    token_version: int = 0
 
 
 class SongBase(BaseModel):
@@ -66,12 +69,22 @@ class SongResponse(SongBase):
     creator_id: int
     is_approved: bool
     play_count: int
+    bitrate: Optional[int] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
 
+class ChartEntry(BaseModel):
+    rank: int
+    plays: int
+    listened_seconds: int
+    song: SongResponse
+
+
 class AlbumBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -82,18 +95,46 @@ class AlbumCreate(AlbumBase):
     pass
 
 
-class AlbumResponse(AlbumBase):
+class AlbumSummary(AlbumBase):
     id: int
     cover_image: Optional[str] = None
     creator_id: int
     is_approved: bool
     created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class AlbumResponse(AlbumSummary):
     songs: List[SongResponse] = []
     
     class Config:
         from_attributes = True
 
 
+class CreatorResponse(BaseModel):
+    id: int
+    username: str
+    role: UserRole
+    profile_picture: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class Suggestion(BaseModel):
+    kind: str  # song, artist o album
+    id: Optional[int] = None  # Los artistas no tienen id
+    text: str
+
+
+class SearchResults(BaseModel):
+    songs: List[SongResponse] = []
+    albums: List[AlbumSummary] = []
+    creators: List[CreatorResponse] = []
+
+
 class PlaylistBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -119,3 +160,25 @@ class PlaylistWithSongs(PlaylistResponse):
     
     class Config:
         from_attributes = True
+
+
+class UploadSessionCreate(BaseModel):
+    kind: str  # song, cover o album_cover
+    filename: str
+    content_type: str
+    size: int
+
+
+class AlbumTrack(BaseModel):
+    upload_id: str
+    title: Optional[str] = None
+    artist: Optional[str] = None
+    duration: Optional[int] = None
+    genre: Optional[str] = None
+
+
+class AlbumFinalize(BaseModel):
+    album_title: str
+    release_year: Optional[int] = None
+    cover_upload_id: str
+    songs: List[AlbumTrack]
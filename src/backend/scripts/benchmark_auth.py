@@ -0,0 +1,152 @@
+"""
+Benchmark de login: throughput de /auth/login y latencia de otras peticiones
+durante una ráfaga de logins.
+
+Levanta un servidor uvicorn por cada valor de --workers (PASSWORD_HASH_WORKERS),
+registra un usuario de prueba y lanza logins concurrentes mientras otra tarea
+pide --probe (por defecto /health; p. ej. /stream/1 para medir un stream) a
+ritmo constante. Con bcrypt en el event loop la latencia del probe sube a la de
+un hash por cada login en cola; en el pool de hilos debe quedarse cerca de la
+medida sin logins.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+from benchmark_db import percentile, wait_until_ready
+
+backend_dir = Path(__file__).parent.parent
+
+PASSWORD = "benchmark-password"
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PASSWORD_HASH_WORKERS=str(workers))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+
+
+async def register_user(base_url: str) -> str:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        response = await client.post("/auth/register", json={
+            "email": email,
+            "username": email.split("@")[0],
+            "password": PASSWORD,
+        })
+        response.raise_for_status()
+    return email
+
+
+async def probe(client: httpx.AsyncClient, path: str, interval: float, stop: asyncio.Event):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers={"Range": "bytes=0-65535"})
+            if response.status_code < 500:
+                latencies.append((time.perf_counter() - start) * 1000)
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def measure_probe(base_url: str, path: str, seconds: float, interval: float):
+    """Latencia del probe sin logins, como referencia"""
+    stop = asyncio.Event()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        task = asyncio.create_task(probe(client, path, interval, stop))
+        await asyncio.sleep(seconds)
+        stop.set()
+        return await task
+
+
+async def login_storm(base_url: str, email: str, total: int, concurrency: int, path: str, interval: float):
+    login_latencies = []
+    statuses = {}
+    counter = iter(range(total))
+    stop = asyncio.Event()
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            for _ in counter:
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+                    status = response.status_code
+                except httpx.TransportError:
+                    status = "error"
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    login_latencies.append((time.perf_counter() - start) * 1000)
+
+        probe_task = asyncio.create_task(probe(client, path, interval, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        probe_latencies = await probe_task
+
+    return login_latencies, probe_latencies, statuses, elapsed
+
+
+def describe(values) -> str:
+    if not values:
+        return "sin respuestas"
+    return (
+        f"p50 {percentile(values, 0.50):7.1f}ms  p99 {percentile(values, 0.99):7.1f}ms  "
+        f"max {max(values):7.1f}ms  media {statistics.mean(values):7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200, help="Logins por configuración")
+    parser.add_argument("--concurrency", type=int, default=32, help="Logins simultáneos")
+    parser.add_argument("--workers", default="1,2,4", help="Valores de PASSWORD_HASH_WORKERS a comparar")
+    parser.add_argument("--probe", default="/health", help="Ruta medida durante la ráfaga")
+    parser.add_argument("--interval", type=float, default=0.02, help="Segundos entre peticiones del probe")
+    parser.add_argument("--port", type=int, default=8011)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔐 BENCHMARK DE LOGIN (bcrypt)")
+    print("=" * 60)
+    print(f"   {args.logins} logins, {args.concurrency} concurrentes, probe: {args.probe}")
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    for workers in [int(value) for value in args.workers.split(",")]:
+        server = start_server(workers, args.port)
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            email = asyncio.run(register_user(base_url))
+            idle = asyncio.run(measure_probe(base_url, args.probe, 2, args.interval))
+            logins, during, statuses, elapsed = asyncio.run(
+                login_storm(base_url, email, args.logins, args.concurrency, args.probe, args.interval)
+            )
+            print(f"\n📊 PASSWORD_HASH_WORKERS={workers}: {len(logins) / elapsed:.1f} logins/s "
+                  f"en {elapsed:.1f}s, respuestas: {statuses}")
+            print(f"   login               {describe(logins)}")
+            print(f"   {args.probe:<19} {describe(idle)}  (sin logins)")
+            print(f"   {args.probe:<19} {describe(during)}  (durante la ráfaga)")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark de latencia de la API con sesiones asíncronas (DB_ASYNC=true) y con
+la sesión síncrona en hilos (DB_ASYNC=false).
+
+Levanta un servidor uvicorn por modo (un solo worker, como en producción por
+proceso), lanza peticiones concurrentes repartidas entre varias rutas y
+muestra p50/p95/p99 por ruta. /health no toca la base de datos: su latencia
+muestra cuánto frenan las consultas al resto de peticiones del worker
+(por ejemplo los streams).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+backend_dir = Path(__file__).parent.parent
+
+DEFAULT_PATHS = ["/songs/?limit=50", "/albums/", "/health"]
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor en {base_url} no respondió")
+
+
+async def run_load(base_url: str, paths, total: int, concurrency: int):
+    latencies = {path: [] for path in paths}
+    errors = 0
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                path = paths[i % len(paths)]
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    ok = response.status_code < 500
+                except httpx.TransportError:
+                    ok = False
+                if ok:
+                    latencies[path].append((time.perf_counter() - start) * 1000)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    return latencies, errors, elapsed
+
+
+def start_server(db_async: bool, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DB_ASYNC="true" if db_async else "false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+    )
+
+
+def print_results(mode: str, latencies, errors: int, elapsed: float) -> None:
+    done = sum(len(values) for values in latencies.values())
+    print(f"\n📊 {mode}: {done} peticiones en {elapsed:.1f}s ({done / elapsed:.0f} req/s), {errors} errores")
+    print(f"   {'ruta':<24} {'p50':>8} {'p95':>8} {'p99':>8} {'media':>8}")
+    for path, values in latencies.items():
+        if not values:
+            print(f"   {path:<24} sin respuestas")
+            continue
+        print(
+            f"   {path:<24} {percentile(values, 0.50):>6.1f}ms {percentile(values, 0.95):>6.1f}ms "
+            f"{percentile(values, 0.99):>6.1f}ms {statistics.mean(values):>6.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000, help="Peticiones por modo")
+    parser.add_argument("--concurrency", type=int, default=64, help="Peticiones simultáneas")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--path", action="append", dest="paths", help="Ruta a medir (se puede repetir)")
+    parser.add_argument("--modes", default="async,sync", help="Modos a comparar: async, sync o ambos")
+    args = parser.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    print("=" * 60)
+    print("⏱️  BENCHMARK DE LA CAPA DE BASE DE DATOS")
+    print("=" * 60)
+    print(f"   {args.requests} peticiones, {args.concurrency} concurrentes, rutas: {', '.join(paths)}")
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    for mode in args.modes.split(","):
+        server = start_server(mode == "async", args.port)
+        try:
+            asyncio.run(wait_until_ready(base_url))
+            # Calentar el pool de conexiones y los cachés antes de medir
+            asyncio.run(run_load(base_url, paths, min(200, args.requests), args.concurrency))
+            latencies, errors, elapsed = asyncio.run(run_load(base_url, paths, args.requests, args.concurrency))
+            print_results(mode, latencies, errors, elapsed)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark de búsqueda sobre un catálogo sintético.
+
+Inserta --songs canciones generadas (género "benchmark-search", creadas por un
+usuario bench-search) y compara, para las mismas consultas, el filtro
+anterior (`title ILIKE '%term%' OR artist ILIKE '%term%'`) con el de
+search_index.py (tsvector + GIN en PostgreSQL; en otros motores es un LIKE
+y la comparación no es representativa). Muestra p50/p95/p99 por método y,
+en PostgreSQL, el plan de la primera consulta.
+
+Usar con una base de datos de pruebas: --cleanup borra el catálogo generado.
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import delete, func, insert, select, text
+
+from database import SessionLocal, engine
+from migrations import upgrade_database
+from models import Song, User, UserRole
+from search_index import enable_fulltext_search, parse_terms, search_filter
+
+GENRE = "benchmark-search"
+SYLLABLES = ["la", "mo", "ra", "te", "sol", "mar", "ni", "do", "be", "can", "ci", "on", "lu", "na", "fue", "go",
+             "vi", "da", "so", "ña", "cie", "lo", "tri", "bu", "ka", "ze", "ro", "pi", "ma", "el"]
+
+
+def make_words(count: int, rng: random.Random):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def seed_catalog(total: int, batch: int, rng: random.Random, words):
+    db = SessionLocal()
+    try:
+        creator = db.scalar(select(User).where(User.username == "bench-search"))
+        if creator is None:
+            creator = User(email="bench-search@example.com", username="bench-search",
+                           hashed_password="!", role=UserRole.CREATOR)
+            db.add(creator)
+            db.commit()
+        existing = db.scalar(select(func.count()).select_from(Song).where(Song.genre == GENRE))
+        artists = [" ".join(rng.sample(words, 2)).title() for _ in range(max(100, total // 50))]
+
+        print(f"🎵 Catálogo actual: {existing} canciones; insertando {max(0, total - existing)}...")
+        started = time.perf_counter()
+        for offset in range(existing, total, batch):
+            rows = [
+                {
+                    "title": " ".join(rng.sample(words, rng.randint(1, 4))).capitalize(),
+                    "artist": rng.choice(artists),
+                    "duration": rng.randint(90, 420),
+                    "file_path": f"/uploads/songs/bench-{offset + i}.mp3",
+                    "genre": GENRE,
+                    "creator_id": creator.id,
+                    "is_approved": True,
+                    "play_count": int(rng.paretovariate(1.2)),
+                }
+                for i in range(min(batch, total - offset))
+            ]
+            db.execute(insert(Song), rows)
+            db.commit()
+            print(f"   {offset + len(rows)}/{total}", end="\r")
+        print(f"   listo en {time.perf_counter() - started:.1f}s" + " " * 20)
+    finally:
+        db.close()
+
+
+def old_filter(search: str):
+    term = f"%{search}%"
+    return Song.title.ilike(term) | Song.artist.ilike(term)
+
+
+def new_filter(search: str):
+    condition, rank = search_filter("songs", [Song.title, Song.artist], parse_terms(search))
+    return condition, rank
+
+
+def run_queries(queries, limit: int):
+    results = {"ILIKE '%term%'": [], "search_index": []}
+    with engine.connect() as connection:
+        for search in queries:
+            statement = (
+                select(Song.id).where(Song.is_approved == True, old_filter(search))
+                .order_by(Song.play_count.desc()).limit(limit)
+            )
+            start = time.perf_counter()
+            connection.execute(statement).all()
+            results["ILIKE '%term%'"].append((time.perf_counter() - start) * 1000)
+
+            condition, rank = new_filter(search)
+            statement = (
+                select(Song.id).where(Song.is_approved == True, condition)
+                .order_by(rank.desc(), Song.play_count.desc()).limit(limit)
+            )
+            start = time.perf_counter()
+            connection.execute(statement).all()
+            results["search_index"].append((time.perf_counter() - start) * 1000)
+    return results
+
+
+def explain(search: str, limit: int) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+    condition, rank = new_filter(search)
+    statement = (
+        select(Song.id).where(Song.is_approved == True, condition)
+        .order_by(rank.desc(), Song.play_count.desc()).limit(limit)
+    )
+    compiled = statement.compile(engine)
+    with engine.connect() as connection:
+        plan = connection.execute(text(f"EXPLAIN ANALYZE {compiled}"), compiled.params).scalars().all()
+    print(f"\n🔎 Plan para {search!r}:")
+    for line in plan:
+        print(f"   {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=1_000_000, help="Tamaño del catálogo sintético")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas por método")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=10_000, help="Filas por INSERT")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cleanup", action="store_true", help="Borrar el catálogo generado y salir")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔍 BENCHMARK DE BÚSQUEDA")
+    print("=" * 60)
+
+    if args.cleanup:
+        with engine.begin() as connection:
+            deleted = connection.execute(delete(Song).where(Song.genre == GENRE)).rowcount
+        print(f"🗑️  {deleted} canciones sintéticas eliminadas")
+        return
+
+    upgrade_database(engine)
+    fulltext = enable_fulltext_search(engine)
+    print(f"   Motor: {engine.dialect.name}, texto completo: {'sí' if fulltext else 'no (LIKE)'}")
+
+    rng = random.Random(args.seed)
+    words = make_words(2000, rng)
+    seed_catalog(args.songs, args.batch, rng, words)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE songs"))
+
+    # Palabras completas y prefijos, como al escribir en el buscador
+    queries = []
+    for _ in range(args.queries):
+        word = rng.choice(words)
+        queries.append(word if rng.random() < 0.5 else word[:max(3, len(word) - 2)])
+
+    results = run_queries(queries, args.limit)
+    print(f"\n📊 {args.queries} consultas, LIMIT {args.limit}")
+    print(f"   {'método':<16} {'p50':>9} {'p95':>9} {'p99':>9} {'media':>9}")
+    for method, values in results.items():
+        print(
+            f"   {method:<16} {percentile(values, 0.50):>7.2f}ms {percentile(values, 0.95):>7.2f}ms "
+            f"{percentile(values, 0.99):>7.2f}ms {statistics.mean(values):>7.2f}ms"
+        )
+    explain(queries[0], args.limit)
+
+
+if __name__ == "__main__":
+    main()
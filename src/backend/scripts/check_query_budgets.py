@@ -0,0 +1,191 @@
+"""
+Cuenta las consultas SQL de cada ruta y falla si alguna supera su presupuesto.
+
+Un N+1 (p. ej. serializar 50 álbumes cargando las canciones de cada uno por
+separado) no se ve en los tests funcionales: la respuesta es la misma, solo
+que con 51 consultas en lugar de 2. Este script inserta un catálogo pequeño
+(álbumes con descripción "query-budgets" y sus canciones, un admin
+bench-budgets), llama a las rutas con TestClient y cuenta las sentencias que
+ejecuta cada petición, en modo asíncrono y síncrono (DB_ASYNC).
+
+Solo se cuentan las consultas de la propia petición (una ContextVar marca la
+petición), no las de las tareas de fondo. Cada ruta se llama una vez antes de
+medir para que la caché de usuarios ya esté llena, como en producción.
+
+Termina con código 1 si alguna ruta supera su presupuesto. Usar con una base
+de datos de pruebas: --cleanup borra los datos generados.
+"""
+
+import argparse
+import os
+import sys
+from contextvars import ContextVar
+from pathlib import Path
+from typing import List, Optional
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import delete, event, select
+
+MARKER = "query-budgets"
+ADMIN_EMAIL = "bench-budgets@example.com"
+
+# (ruta, consultas como máximo). {album}, {song} y {playlist} se sustituyen
+BUDGETS = [
+    ("/albums/?limit=50", 1),
+    ("/albums/?limit=50&include=songs", 2),
+    ("/albums/{album}", 2),
+    ("/songs/?limit=50", 1),
+    ("/songs/?limit=50&order_by=title", 1),
+    ("/songs/{song}", 1),
+    ("/songs/liked/all", 1),
+    ("/playlists/", 1),
+    ("/playlists/{playlist}", 2),
+    ("/users/", 1),
+    ("/search?q=budget", 3),
+    ("/charts/daily", 1),
+]
+
+_statements: ContextVar[Optional[List[str]]] = ContextVar("statements", default=None)
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
+
+
+class QueryCounter:
+    """Envuelve la app ASGI y guarda las sentencias de la última petición"""
+
+    def __init__(self, app):
+        self.app = app
+        self.last: List[str] = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        statements: List[str] = []
+        token = _statements.set(statements)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _statements.reset(token)
+            self.last = statements
+
+
+def seed(albums: int, songs_per_album: int) -> dict:
+    from auth import create_user_token
+    from database import SessionLocal
+    from models import Album, LikedSong, Playlist, PlaylistSong, Song, User, UserRole
+
+    db = SessionLocal()
+    try:
+        admin = db.scalar(select(User).where(User.email == ADMIN_EMAIL))
+        if admin is None:
+            admin = User(email=ADMIN_EMAIL, username="bench-budgets", hashed_password="!", role=UserRole.ADMIN)
+            db.add(admin)
+            db.commit()
+        if not db.scalar(select(Album.id).where(Album.description == MARKER).limit(1)):
+            for i in range(albums):
+                album = Album(title=f"Budget album {i}", description=MARKER, creator_id=admin.id, is_approved=True)
+                album.songs = [
+                    Song(title=f"Budget song {i}-{j}", artist="Budget artist", duration=180,
+                         file_path=f"/uploads/songs/budget-{i}-{j}.mp3", genre=MARKER,
+                         creator_id=admin.id, is_approved=True)
+                    for j in range(songs_per_album)
+                ]
+                db.add(album)
+            db.commit()
+            songs = db.scalars(select(Song).where(Song.genre == MARKER).limit(50)).all()
+            playlist = Playlist(name="Budget playlist", description=MARKER, owner_id=admin.id)
+            playlist.playlist_songs = [PlaylistSong(song_id=song.id, position=i) for i, song in enumerate(songs)]
+            db.add(playlist)
+            db.add_all([LikedSong(user_id=admin.id, song_id=song.id) for song in songs])
+            db.commit()
+        return {
+            "token": create_user_token(admin),
+            "album": db.scalar(select(Album.id).where(Album.description == MARKER).limit(1)),
+            "song": db.scalar(select(Song.id).where(Song.genre == MARKER).limit(1)),
+            "playlist": db.scalar(select(Playlist.id).where(Playlist.description == MARKER).limit(1)),
+        }
+    finally:
+        db.close()
+
+
+def cleanup() -> None:
+    from database import engine
+    from models import Album, LikedSong, Playlist, PlaylistSong, Song, User
+
+    with engine.begin() as connection:
+        admin_id = select(User.id).where(User.email == ADMIN_EMAIL).scalar_subquery()
+        playlists = select(Playlist.id).where(Playlist.description == MARKER)
+        connection.execute(delete(PlaylistSong).where(PlaylistSong.playlist_id.in_(playlists)))
+        connection.execute(delete(Playlist).where(Playlist.description == MARKER))
+        connection.execute(delete(LikedSong).where(LikedSong.user_id == admin_id))
+        deleted = connection.execute(delete(Song).where(Song.genre == MARKER)).rowcount
+        connection.execute(delete(Album).where(Album.description == MARKER))
+        connection.execute(delete(User).where(User.email == ADMIN_EMAIL))
+    print(f"🗑️  Datos de prueba eliminados ({deleted} canciones)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--albums", type=int, default=60, help="Más que el tamaño de página, para ver un N+1")
+    parser.add_argument("--songs-per-album", type=int, default=8)
+    parser.add_argument("--mode", choices=["async", "sync"], default=None,
+                        help="Solo un modo (por defecto el de DB_ASYNC)")
+    parser.add_argument("--verbose", action="store_true", help="Mostrar las sentencias de cada ruta")
+    parser.add_argument("--cleanup", action="store_true", help="Borrar los datos generados y salir")
+    args = parser.parse_args()
+
+    if args.mode is not None:
+        os.environ["DB_ASYNC"] = "true" if args.mode == "async" else "false"
+
+    from fastapi.testclient import TestClient
+
+    import main as app_module
+    from database import AsyncSessionLocal, async_engine, engine
+
+    print("=" * 60)
+    print("🧮 PRESUPUESTO DE CONSULTAS POR RUTA")
+    print("=" * 60)
+
+    if args.cleanup:
+        cleanup()
+        return
+
+    for bound in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+        event.listen(bound, "before_cursor_execute", count_statement)
+
+    ids = seed(args.albums, args.songs_per_album)
+    headers = {"Authorization": f"Bearer {ids['token']}"}
+    mode = "async" if AsyncSessionLocal is not None else "sync (hilos)"
+    print(f"   Motor: {engine.dialect.name}, sesiones: {mode}")
+
+    counter = QueryCounter(app_module.app)
+    failures = 0
+    with TestClient(counter) as client:
+        for path, budget in BUDGETS:
+            url = path.format(**ids)
+            client.get(url, headers=headers)  # Calentar la caché de usuarios
+            response = client.get(url, headers=headers)
+            count = len(counter.last)
+            over = count > budget or response.status_code != 200
+            failures += over
+            status = "❌" if over else "✅"
+            print(f"   {status} {count:>3} / {budget:<3} {url}" + (f"  (HTTP {response.status_code})" if response.status_code != 200 else ""))
+            if args.verbose or over:
+                for statement in counter.last:
+                    print(f"            {' '.join(statement.split())[:150]}")
+
+    print()
+    if failures:
+        print(f"❌ {failures} rutas superan su presupuesto de consultas")
+        sys.exit(1)
+    print("✅ Todas las rutas dentro de su presupuesto")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Comprueba con EXPLAIN que las consultas de las rutas usan índices.
+
+Inserta un conjunto de datos grande (usuarios bench-plans, canciones con
+género "query-plans" y sus blobs, álbumes, favoritos, playlists y agregados
+de reproducciones), construye las mismas consultas que routes/ (mismas claves de
+orden y paginación por cursor) y revisa su plan:
+
+- PostgreSQL: ningún "Seq Scan" sobre las tablas consultadas.
+- SQLite: ningún "SCAN <tabla>" sin índice. Recorrer una tabla en el orden
+  de su clave primaria con LIMIT (listado de usuarios y playlists) se acepta.
+
+Antes aplica las migraciones (`alembic upgrade head`), así comprueba los
+índices que crean. Termina con código 1 si algún plan recorre una tabla
+entera, así se puede usar en CI. Usar con una base de datos de pruebas:
+--cleanup borra los datos generados.
+"""
+
+import argparse
+import hashlib
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from sqlalchemy import delete, func, insert, select, text
+
+from database import engine
+from migrations import upgrade_database
+from models import (
+    Album, Blob, LikedSong, Playlist, PlaylistSong, Song, SongPlaysHourly, SongRanking, User, UserRole,
+)
+from pagination import after
+from play_events import hour_bucket
+from rankings import refresh_rankings
+from routes.songs import SONG_ORDERS
+from search_index import enable_fulltext_search, parse_terms, search_filter
+
+MARKER = "query-plans"
+PAGE = 50
+
+
+def insert_batches(connection, model, rows, batch: int) -> None:
+    for start in range(0, len(rows), batch):
+        connection.execute(insert(model), rows[start:start + batch])
+
+
+def seed(args, rng: random.Random) -> None:
+    with engine.begin() as connection:
+        existing = connection.scalar(select(func.count()).select_from(Song).where(Song.genre == MARKER))
+    if existing:
+        print(f"🎵 Datos ya generados ({existing} canciones); --cleanup para empezar de cero")
+        return
+
+    print(f"🎵 Insertando {args.users} usuarios, {args.albums} álbumes y {args.songs} canciones...")
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        insert_batches(connection, User, [
+            {
+                "email": f"bench-plans-{i}@example.com",
+                "username": f"bench-plans-{i}",
+                "hashed_password": "!",
+                "role": UserRole.CREATOR if i % 10 == 0 else UserRole.USER,
+                "is_active": True,
+            }
+            for i in range(args.users)
+        ], args.batch)
+        user_ids = connection.scalars(select(User.id).where(User.username.like("bench-plans-%"))).all()
+        creator_ids = user_ids[::10]
+
+        insert_batches(connection, Album, [
+            {"title": f"Álbum {i}", "description": MARKER, "creator_id": rng.choice(creator_ids),
+             "is_approved": rng.random() < 0.9}
+            for i in range(args.albums)
+        ], args.batch)
+        album_ids = connection.scalars(select(Album.id).where(Album.description == MARKER)).all()
+
+        insert_batches(connection, Song, [
+            {
+                "title": f"Canción {rng.randrange(args.songs)}",
+                "artist": f"Artista {rng.randrange(args.songs // 20 + 1)}",
+                "duration": rng.randint(90, 420),
+                "file_path": f"/uploads/songs/plans-{i}.mp3",
+                "genre": MARKER,
+                "album_id": rng.choice(album_ids) if rng.random() < 0.7 else None,
+                "creator_id": rng.choice(creator_ids),
+                "is_approved": rng.random() < 0.95,
+                "play_count": int(rng.paretovariate(1.2)),
+            }
+            for i in range(args.songs)
+        ], args.batch)
+        song_ids = connection.scalars(select(Song.id).where(Song.genre == MARKER)).all()
+        insert_batches(connection, Blob, [
+            {"sha256": hashlib.sha256(f"plans-{i}".encode()).hexdigest(),
+             "path": f"/uploads/songs/plans-{i}.mp3", "size": 0, "ref_count": 1, "unclaimed": 0}
+            for i in range(args.songs)
+        ], args.batch)
+
+        print("❤️  Favoritos, playlists y reproducciones...")
+        insert_batches(connection, LikedSong, [
+            {"user_id": user_id, "song_id": song_id}
+            for user_id in user_ids
+            for song_id in rng.sample(song_ids, args.likes)
+        ], args.batch)
+        insert_batches(connection, Playlist, [
+            {"name": f"Playlist {i}", "description": MARKER, "owner_id": rng.choice(user_ids),
+             "is_public": rng.random() < 0.5}
+            for i in range(args.playlists)
+        ], args.batch)
+        playlist_ids = connection.scalars(select(Playlist.id).where(Playlist.description == MARKER)).all()
+        insert_batches(connection, PlaylistSong, [
+            {"playlist_id": playlist_id, "song_id": song_id, "position": position}
+            for playlist_id in playlist_ids
+            for position, song_id in enumerate(rng.sample(song_ids, args.playlist_size))
+        ], args.batch)
+
+        now = hour_bucket(datetime.utcnow())
+        insert_batches(connection, SongPlaysHourly, [
+            {"hour": now - timedelta(hours=hours), "song_id": song_id, "plays": rng.randint(1, 50),
+             "listened_seconds": 0}
+            for hours in range(24 * 8)
+            for song_id in rng.sample(song_ids, min(len(song_ids), 500))
+        ], args.batch)
+    print(f"   listo en {time.perf_counter() - started:.1f}s")
+
+
+def cleanup() -> None:
+    with engine.begin() as connection:
+        songs = select(Song.id).where(Song.genre == MARKER)
+        users = select(User.id).where(User.username.like("bench-plans-%"))
+        playlists = select(Playlist.id).where(Playlist.description == MARKER)
+        connection.execute(delete(SongPlaysHourly).where(SongPlaysHourly.song_id.in_(songs)))
+        connection.execute(delete(SongRanking).where(SongRanking.song_id.in_(songs)))
+        connection.execute(delete(PlaylistSong).where(PlaylistSong.playlist_id.in_(playlists)))
+        connection.execute(delete(Playlist).where(Playlist.description == MARKER))
+        connection.execute(delete(LikedSong).where(LikedSong.user_id.in_(users)))
+        deleted = connection.execute(delete(Song).where(Song.genre == MARKER)).rowcount
+        connection.execute(delete(Blob).where(Blob.path.like("/uploads/songs/plans-%")))
+        connection.execute(delete(Album).where(Album.description == MARKER))
+        connection.execute(delete(User).where(User.username.like("bench-plans-%")))
+    print(f"🗑️  Datos de prueba eliminados ({deleted} canciones)")
+
+
+def analyze() -> None:
+    """Estadísticas para el planificador
+
+    En PostgreSQL, VACUUM además vuelca al índice la lista pendiente que los
+    INSERT dejan en los GIN de search_vector; mientras está llena el
+    planificador prefiere recorrer la tabla.
+    """
+    statement = "VACUUM ANALYZE" if engine.dialect.name == "postgresql" else "ANALYZE"
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(statement))
+
+
+def second_page(connection, query, keys):
+    """La consulta de la segunda página, con el cursor de la primera"""
+    ordered = query.add_columns(*[column for column, _ in keys]).order_by(
+        *[column.desc() if descending else column.asc() for column, descending in keys]
+    )
+    last = connection.execute(ordered.limit(PAGE)).all()[-1]
+    # Con Connection las columnas de la entidad vienen sueltas: las claves son las últimas
+    return ordered.where(after(keys, list(last[-len(keys):]))).limit(PAGE)
+
+
+def route_queries(connection):
+    """(nombre, consulta, ordenada por la clave primaria) por cada ruta"""
+    user = connection.execute(
+        select(User.id, User.email).join(LikedSong, LikedSong.user_id == User.id)
+        .where(User.username.like("bench-plans-%")).limit(1)
+    ).one()
+    song = connection.execute(select(Song.id, Song.file_path).where(Song.genre == MARKER).limit(1)).one()
+    album_ids = connection.scalars(
+        select(Album.id).where(Album.description == MARKER, Album.is_approved == True).limit(PAGE)
+    ).all()
+    creator_id = connection.scalar(select(Song.creator_id).where(Song.genre == MARKER).limit(1))
+    playlist_id = connection.scalar(select(Playlist.id).where(Playlist.description == MARKER).limit(1))
+    approved = select(Song).where(Song.is_approved == True)
+
+    queries = [
+        ("GET /songs/?order_by=trending (ranking)", second_page(
+            connection, select(Song).join(SongRanking, SongRanking.song_id == Song.id),
+            [(SongRanking.trending_rank, False)]), False),
+    ]
+    for order, keys in SONG_ORDERS.items():
+        queries.append((f"GET /songs/?order_by={order}", second_page(connection, approved, keys), False))
+    queries += [
+        ("GET /songs/{id}", select(Song).where(Song.id == song.id), False),
+        ("DELETE /songs/{id} (referencia del archivo)", select(Blob).where(Blob.path == song.file_path), False),
+        ("GET /songs/liked/all", second_page(
+            connection, select(Song).join(LikedSong).where(LikedSong.user_id == user.id),
+            [(LikedSong.id, True)]), False),
+        ("GET /songs/{id}/is-liked", select(LikedSong).where(
+            LikedSong.user_id == user.id, LikedSong.song_id == song.id), False),
+        ("DELETE /songs/{id} (favoritos en cascada)", select(LikedSong).where(LikedSong.song_id == song.id), False),
+        ("DELETE /songs/{id} (playlists en cascada)",
+         select(PlaylistSong).where(PlaylistSong.song_id == song.id), False),
+        ("GET /albums/", second_page(
+            connection, select(Album).where(Album.is_approved == True), [(Album.id, True)]), False),
+        ("GET /albums/ (canciones, selectinload)", select(Song).where(Song.album_id.in_(album_ids)), False),
+        ("Canciones de un creador", select(Song).where(Song.creator_id == creator_id), False),
+        ("Álbumes de un creador", select(Album).where(Album.creator_id == creator_id), False),
+        ("GET /playlists/", second_page(
+            connection, select(Playlist).where((Playlist.is_public == True) | (Playlist.owner_id == user.id)),
+            [(Playlist.id, True)]), True),
+        ("GET /playlists/my", select(Playlist).where(Playlist.owner_id == user.id), False),
+        ("GET /playlists/{id}", select(Song).join(PlaylistSong).where(
+            PlaylistSong.playlist_id == playlist_id).order_by(PlaylistSong.position), False),
+        ("POST /playlists/{id}/songs (duplicado)", select(PlaylistSong).where(
+            PlaylistSong.playlist_id == playlist_id, PlaylistSong.song_id == song.id), False),
+        ("POST /playlists/{id}/songs (posición)", select(func.count()).select_from(PlaylistSong).where(
+            PlaylistSong.playlist_id == playlist_id), False),
+        ("GET /users/", second_page(connection, select(User), [(User.id, False)]), True),
+        ("POST /auth/login", select(User).where(User.email == user.email), False),
+        ("GET /charts/daily", select(SongPlaysHourly.song_id, func.sum(SongPlaysHourly.plays)).where(
+            SongPlaysHourly.hour >= hour_bucket(datetime.utcnow()) - timedelta(hours=24)
+        ).group_by(SongPlaysHourly.song_id), False),
+    ]
+    if engine.dialect.name == "postgresql":
+        # Un término que casi ninguna fila contiene: con "canción", que está en todos los títulos,
+        # el planificador prefiere con razón recorrer la tabla
+        condition, rank = search_filter("songs", [Song.title, Song.artist], parse_terms("1234"))
+        queries.append(("GET /search (canciones)", approved.where(condition).order_by(
+            rank.desc(), Song.play_count.desc(), Song.id).limit(PAGE), False))
+    return queries
+
+
+def explain(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+    if engine.dialect.name == "postgresql":
+        return [row[0] for row in connection.exec_driver_sql(f"EXPLAIN {compiled}", params)]
+    return [row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def full_scans(plan, pk_order: bool):
+    if engine.dialect.name == "postgresql":
+        return [match.group(1) for line in plan for match in re.finditer(r"Seq Scan on (\w+)", line)]
+    scans = [match.group(1) for line in plan for match in [re.fullmatch(r"SCAN (\w+)", line.strip())] if match]
+    if pk_order and not any("TEMP B-TREE" in line for line in plan):
+        return []  # Recorrido en el orden de la clave primaria, corta en el LIMIT
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--songs", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--albums", type=int, default=10_000)
+    parser.add_argument("--likes", type=int, default=20, help="Favoritos por usuario")
+    parser.add_argument("--playlists", type=int, default=5_000)
+    parser.add_argument("--playlist-size", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=10_000, help="Filas por INSERT")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Mostrar el plan completo de cada consulta")
+    parser.add_argument("--cleanup", action="store_true", help="Borrar los datos generados y salir")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🔎 PLANES DE CONSULTA DE LAS RUTAS")
+    print("=" * 60)
+
+    if args.cleanup:
+        cleanup()
+        return
+
+    upgrade_database(engine)
+    enable_fulltext_search(engine)
+    seed(args, random.Random(args.seed))
+    analyze()  # Sin estadísticas, refresh_rankings se planifica como si las tablas estuvieran vacías
+    refresh_rankings()
+    analyze()
+
+    failures = 0
+    with engine.connect() as connection:
+        for name, statement, pk_order in route_queries(connection):
+            plan = explain(connection, statement)
+            scans = full_scans(plan, pk_order)
+            failures += bool(scans)
+            status = f"❌ recorre {', '.join(sorted(set(scans)))}" if scans else "✅"
+            print(f"   {status:<28} {name}")
+            if args.verbose or scans:
+                for line in plan:
+                    print(f"         {line}")
+
+    print()
+    if failures:
+        print(f"❌ {failures} consultas recorren tablas enteras (¿falta un índice en alembic/versions?)")
+        sys.exit(1)
+    print(f"✅ Todas las consultas usan índices ({engine.dialect.name})")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,12 +13,28 @@ sys.path.insert(0, str(backend_dir))
 
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
-from models import User, Song, Album, Playlist, PlaylistSong, LikedSong, UserRole
+from models import (
+    User, Song, Album, Playlist, PlaylistSong, LikedSong, Blob, ImageVariant, UserRole,
+    PlayEvent, SongPlaysHourly, SongPlaysDaily, SongRanking,
+)
+from config import settings
+from storage import storage
 import shutil
 
 
+def clean_storage():
+    """Elimina todos los objetos del backend de almacenamiento excepto .gitkeep"""
+    deleted = 0
+    for key in list(storage.iter_keys()):
+        if Path(key).name == ".gitkeep":
+            continue
+        if storage.delete(key):
+            deleted += 1
+    print(f"🗑️  {deleted} archivos eliminados del almacenamiento ({settings.STORAGE_BACKEND})")
+
+
 def clean_uploads_directory():
-    """Limpia el directorio uploads excepto .gitkeep"""
+    """Limpia el directorio uploads (o el espacio de trabajo local con S3) excepto .gitkeep"""
     uploads_dir = backend_dir / "uploads"
     
     if uploads_dir.exists():
@@ -70,6 +86,13 @@ def clean_database(db: Session):
     deleted_playlists = db.query(Playlist).delete()
     print(f"   🗑️  {deleted_playlists} playlists eliminadas")
     
+    # Reproducciones y sus agregados (dependen de songs y users)
+    deleted_plays = db.query(PlayEvent).delete()
+    db.query(SongPlaysHourly).delete()
+    db.query(SongPlaysDaily).delete()
+    db.query(SongRanking).delete()
+    print(f"   🗑️  {deleted_plays} reproducciones eliminadas")
+    
     # 4. Eliminar todas las canciones (depende de albums y users)
     deleted_songs = db.query(Song).delete()
     print(f"   🗑️  {deleted_songs} canciones eliminadas")
@@ -82,6 +105,11 @@ def clean_database(db: Session):
     deleted_users = db.query(User).delete()
     print(f"   🗑️  {deleted_users} usuarios eliminados")
     
+    # 7. Eliminar el registro de archivos por contenido y sus miniaturas (los archivos se borran después)
+    db.query(ImageVariant).delete()
+    deleted_blobs = db.query(Blob).delete()
+    print(f"   🗑️  {deleted_blobs} archivos registrados eliminados")
+    
     db.commit()
     print("✅ Base de datos limpiada completamente")
 
@@ -106,6 +134,7 @@ def main():
         
         # Limpiar archivos
         print("\n🧹 Limpiando archivos uploads...")
+        clean_storage()
         clean_uploads_directory()
         
         print("\n" + "=" * 60)
@@ -0,0 +1,115 @@
+"""
+Script para recalcular los metadatos de audio de todas las canciones.
+Lee duración real, bitrate, sample rate y canales de cada archivo en uploads/songs
+usando un pool de procesos y actualiza la base de datos, mostrando el progreso.
+"""
+
+import sys
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Agregar el directorio raíz al path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from database import SessionLocal
+from models import Song
+from audio_metadata import read_audio_info, apply_audio_info
+from peaks import PEAKS_SUFFIX
+from storage import UPLOAD_DIR
+from streaming import resolve_upload_path
+from config import settings
+
+SONGS_DIR = UPLOAD_DIR / "songs"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def main():
+    print("=" * 60)
+    print("🎧 EXTRACCIÓN DE METADATOS DE AUDIO")
+    print("=" * 60)
+
+    db = SessionLocal()
+
+    try:
+        songs = db.query(Song).all()
+        paths = {song.id: resolve_upload_path(UPLOAD_DIR, song.file_path) for song in songs}
+        pending = {song_id: path for song_id, path in paths.items() if path is not None and path.is_file()}
+        missing = len(songs) - len(pending)
+
+        print(f"\n📀 {len(songs)} canciones en la base de datos, {len(pending)} con archivo")
+
+        updated = 0
+        failed = 0
+        errors = 0
+        songs_by_id = {song.id: song for song in songs}
+
+        with ProcessPoolExecutor(max_workers=settings.TRANSCODE_WORKERS) as executor:
+            futures = {
+                executor.submit(read_audio_info, str(path)): song_id
+                for song_id, path in pending.items()
+            }
+            for index, future in enumerate(as_completed(futures), start=1):
+                song = songs_by_id[futures[future]]
+                prefix = f"   [{index}/{len(futures)}]"
+                try:
+                    info = future.result()
+                except Exception as e:
+                    errors += 1
+                    print(f"{prefix} ❌ {song.title}: {e}")
+                    continue
+
+                if info is None:
+                    failed += 1
+                    print(f"{prefix} ⚠️  {song.title}: formato no reconocido")
+                    continue
+
+                previous = song.duration
+                apply_audio_info(song, info)
+                updated += 1
+                print(
+                    f"{prefix} ✅ {song.title}: {format_duration(info['duration'])} "
+                    f"(antes {format_duration(previous)}), {info['bitrate']} kbps, "
+                    f"{info['sample_rate']} Hz, {info['channels']} canal(es)"
+                )
+
+                # Guardar por lotes para no perder el avance si se interrumpe
+                if updated % 50 == 0:
+                    db.commit()
+
+        db.commit()
+
+        # Archivos en disco que ninguna canción referencia (sin contar los
+        # picos .peaks, que se generan junto a cada audio)
+        referenced = {path.resolve() for path in pending.values()}
+        orphans = [
+            path for path in SONGS_DIR.iterdir()
+            if path.is_file() and path.name != ".gitkeep" and path.suffix != PEAKS_SUFFIX
+            and path.resolve() not in referenced
+        ] if SONGS_DIR.exists() else []
+
+        print("\n" + "=" * 60)
+        print("✅ EXTRACCIÓN COMPLETADA")
+        print("=" * 60)
+        print(f"   ✅ {updated} canciones actualizadas")
+        print(f"   ⚠️  {failed} archivos no reconocidos")
+        print(f"   ❌ {errors} archivos con error al leerlos")
+        print(f"   ❌ {missing} canciones sin archivo")
+        print(f"   📁 {len(orphans)} archivos sin canción asociada")
+
+    except Exception as e:
+        print(f"\n❌ Error durante la extracción: {e}")
+        db.rollback()
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Búsqueda de texto completo sobre canciones, álbumes y creadores.
+
+El filtro anterior (`title ILIKE '%term%'`) empieza con comodín y no puede
+usar ningún índice: con el catálogo grande es un recorrido completo de songs.
+
+En PostgreSQL cada tabla buscable tiene una columna generada `search_vector`
+(tsvector, configuración 'simple') con un índice GIN. Al ser GENERATED
+ALWAYS ... STORED la mantiene el propio PostgreSQL en cada INSERT/UPDATE de
+Song, Album o User, sin código en las rutas. La crea la migración
+0010_search_vectors; al arrancar, enable_fulltext_search comprueba que está.
+
+La consulta se convierte en un tsquery con todos los términos y el último
+como prefijo (`amor & prop:*`), para que funcione mientras se escribe; el
+orden es ts_rank, con el título pesando más que el artista o la descripción.
+
+Con otros motores (SQLite en desarrollo) se usa el LIKE de antes, exigiendo
+cada término en alguno de los campos.
+"""
+import logging
+import re
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import and_, case, false, func, inspect, literal, literal_column, or_
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = "simple"  # Sin stemming: títulos y nombres en varios idiomas
+MAX_TERMS = 8
+
+# Tablas con columna search_vector; las expresiones están en 0010_search_vectors
+SEARCH_TABLES = ("songs", "albums", "users")
+
+fulltext_enabled = False
+
+
+def enable_fulltext_search(engine: Engine) -> bool:
+    """Usa las columnas search_vector si existen (PostgreSQL con 0010_search_vectors)"""
+    global fulltext_enabled
+    if engine.dialect.name != "postgresql":
+        return False
+    inspector = inspect(engine)
+    fulltext_enabled = all(
+        any(column["name"] == "search_vector" for column in inspector.get_columns(table))
+        for table in SEARCH_TABLES
+    )
+    if not fulltext_enabled:
+        logger.warning("Faltan las columnas search_vector (alembic upgrade head), se usa LIKE")
+    return fulltext_enabled
+
+
+def parse_terms(query: str) -> List[str]:
+    """Palabras de la consulta en minúsculas; descarta signos (y la sintaxis de tsquery)"""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def tsquery_text(terms: Sequence[str]) -> str:
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+
+def search_filter(table_name: str, columns: Sequence, terms: Sequence[str]) -> Tuple:
+    """
+    (condición, relevancia) para buscar `terms` en la tabla. Sin términos la
+    condición no encuentra nada.
+    """
+    if not terms:
+        return false(), literal(0.0)
+
+    if fulltext_enabled:
+        vector = literal_column(f"{table_name}.search_vector")
+        query = func.to_tsquery(SEARCH_CONFIG, tsquery_text(terms))
+        return vector.op("@@")(query), func.ts_rank(vector, query)
+
+    condition = and_(*[
+        or_(*[column.ilike(f"%{term}%") for column in columns])
+        for term in terms
+    ])
+    # Sin índice no hay relevancia real: primero lo que empieza por la consulta
+    rank = case((columns[0].ilike(f"{' '.join(terms)}%"), 1.0), else_=0.0)
+    return condition, rank
@@ -0,0 +1,121 @@
+"""
+Segmentación HLS de canciones.
+
+Divide cada canción en segmentos de duración fija (AAC en MPEG-TS) más un
+manifiesto index.m3u8, guardados en uploads/segments/<song_id>/. Así un oyente
+que salta la canción a los pocos segundos solo descarga unos cuantos segmentos
+pequeños y cacheables, en lugar del archivo completo.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import subprocess
+from pathlib import Path
+
+from config import settings
+from database import SessionLocal
+from models import Song
+from storage import publish, storage, storage_key
+from streaming import invalidate_cached_file, resolve_upload_path
+from transcoding import encoder_available, get_executor
+
+logger = logging.getLogger(__name__)
+
+SEGMENTS_SUBDIR = "segments"
+MANIFEST_NAME = "index.m3u8"
+SEGMENT_PATTERN = re.compile(r"^segment_\d{5}\.ts$")
+HLS_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+
+def segments_dir(upload_dir: Path, song_id: int) -> Path:
+    return upload_dir / SEGMENTS_SUBDIR / str(song_id)
+
+
+def is_valid_hls_filename(filename: str) -> bool:
+    return filename == MANIFEST_NAME or SEGMENT_PATTERN.match(filename) is not None
+
+
+def remove_segments(upload_dir: Path, song_id: int) -> None:
+    directory = segments_dir(upload_dir, song_id)
+    if directory.is_dir():
+        for path in directory.iterdir():
+            invalidate_cached_file(path)
+    storage.delete_prefix(storage_key(directory))
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _segment_audio(encoder: str, source: str, output_dir: str, segment_seconds: int) -> None:
+    """
+    Se ejecuta en un proceso del pool. Genera primero en un directorio temporal
+    y lo renombra al final, para no exponer nunca un manifiesto a medias.
+    """
+    partial_dir = output_dir + ".part"
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+    try:
+        subprocess.run(
+            [
+                encoder, "-nostdin", "-loglevel", "error", "-y",
+                "-i", source,
+                "-vn", "-map_metadata", "-1",
+                "-codec:a", "aac", "-b:a", "128k",
+                "-f", "hls",
+                "-hls_time", str(segment_seconds),
+                "-hls_playlist_type", "vod",
+                "-hls_segment_filename", os.path.join(partial_dir, "segment_%05d.ts"),
+                os.path.join(partial_dir, MANIFEST_NAME),
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(partial_dir, output_dir)
+    except Exception:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+
+
+async def segment_song(song_id: int) -> None:
+    """Genera los segmentos HLS de una canción en el pool de procesos"""
+    # Importación diferida: routes.upload programa esta tarea
+    from routes.upload import UPLOAD_DIR
+
+    if not encoder_available():
+        logger.warning("Encoder '%s' no disponible; se omite la segmentación HLS", settings.FFMPEG_PATH)
+        return
+
+    db = SessionLocal()
+    try:
+        song = db.query(Song).filter(Song.id == song_id).first()
+        source = resolve_upload_path(UPLOAD_DIR, song.file_path) if song else None
+    finally:
+        db.close()
+
+    if source is None or not source.is_file():
+        return
+
+    output_dir = segments_dir(UPLOAD_DIR, song_id)
+    if (output_dir / MANIFEST_NAME).is_file():
+        return
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            get_executor(), _segment_audio,
+            settings.FFMPEG_PATH, str(source), str(output_dir), settings.HLS_SEGMENT_SECONDS,
+        )
+    except Exception as e:
+        logger.error("Error al segmentar canción %s: %s", song_id, e)
+        return
+
+    # El manifiesto al final: los clientes no lo verán antes que sus segmentos
+    paths = sorted(output_dir.iterdir(), key=lambda path: path.name == MANIFEST_NAME)
+    for path in paths:
+        await asyncio.to_thread(publish, path, HLS_MEDIA_TYPES[path.suffix])
@@ -0,0 +1,281 @@
+"""
+Almacenamiento de los archivos servidos bajo /uploads.
+
+Las rutas de subida, el streaming y los scripts de mantenimiento hablan con un
+StorageBackend en lugar de con el disco. Los archivos se identifican por su
+clave: la ruta relativa a UPLOAD_DIR con barras normales (songs/<sha256>.mp3),
+la misma que aparece en las URLs públicas /uploads/<clave>.
+
+- LocalStorage (por defecto): el directorio UPLOAD_DIR. local_path() permite
+  que el streaming siga usando sendfile, el caché de descriptores y el mmap.
+- S3Storage: un bucket S3 o compatible (MinIO, etc.). Las descargas se sirven
+  con URLs prefirmadas, así los nodos de la API no necesitan disco compartido.
+
+Con S3 el directorio local sigue existiendo como espacio de trabajo: las
+subidas se escriben ahí primero y el pipeline de procesamiento (metadatos,
+transcodificación, HLS, picos) lee esa copia y publica sus resultados en el
+backend.
+"""
+import os
+import posixpath
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from config import settings
+
+UPLOAD_DIR = Path(settings.UPLOAD_DIR)
+
+
+@dataclass
+class ObjectStat:
+    size: int
+    mtime: float
+    etag: Optional[str] = None
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def put_file(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        """Publica el archivo local `source` bajo `key` (reemplaza si ya existe)"""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Contenido completo. Lanza FileNotFoundError si no existe"""
+
+    @abstractmethod
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        """Bytes de start a end (inclusivo). Lanza FileNotFoundError si no existe"""
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        """Elimina el objeto. Retorna False si no existía"""
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> None:
+        """Elimina todos los objetos bajo `prefix` (un "directorio")"""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        """Tamaño y fecha del objeto, o None si no existe"""
+
+    @abstractmethod
+    def presign(self, key: str, expires: int) -> Optional[str]:
+        """URL temporal de descarga directa, o None si el backend no las ofrece"""
+
+    @abstractmethod
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        """Claves de todos los objetos bajo `prefix`"""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """Ruta en disco del objeto si el backend es local; None en otro caso"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def put_file(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        destination = self._path(key)
+        if destination.resolve() == source.resolve():
+            return  # Ya está en su sitio (el caso normal: se escribe directo en UPLOAD_DIR)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial = destination.with_name(f"{destination.name}.{uuid.uuid4().hex}.part")
+        try:
+            shutil.copyfile(source, partial)
+            os.replace(partial, destination)
+        finally:
+            partial.unlink(missing_ok=True)
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        with self._path(key).open("rb") as file:
+            file.seek(start)
+            return file.read(end - start + 1)
+
+    def delete(self, key: str) -> bool:
+        try:
+            self._path(key).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_prefix(self, prefix: str) -> None:
+        target = self._path(prefix)
+        if target.resolve() == self.root.resolve():
+            raise ValueError("delete_prefix no puede borrar la raíz del almacenamiento")
+        shutil.rmtree(target, ignore_errors=True)
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        try:
+            result = self._path(key).stat()
+        except OSError:
+            return None
+        return ObjectStat(size=result.st_size, mtime=result.st_mtime)
+
+    def presign(self, key: str, expires: int) -> Optional[str]:
+        return None  # Se sirve desde la propia API (/uploads y /stream)
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        base = self._path(prefix)
+        if not base.is_dir():
+            return
+        for path in base.rglob("*"):
+            if path.is_file():
+                yield path.relative_to(self.root).as_posix()
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self._path(key)
+
+
+class S3Storage(StorageBackend):
+    """
+    Bucket S3 o compatible. Para MinIO u otro servicio local basta con
+    S3_ENDPOINT_URL (p. ej. http://localhost:9000); se usa direccionamiento por
+    ruta para no depender de DNS por bucket.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        region: Optional[str] = None,
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requiere boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self._client_error = ClientError
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            config=Config(s3={"addressing_style": "path"}, signature_version="s3v4"),
+        )
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, key: str, source: Path, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(str(source), self.bucket, key, ExtraArgs=extra)
+
+    def _get_object(self, key: str, **kwargs) -> bytes:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key, **kwargs)
+        except self._client_error as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+        return response["Body"].read()
+
+    def get(self, key: str) -> bytes:
+        return self._get_object(key)
+
+    def get_range(self, key: str, start: int, end: int) -> bytes:
+        return self._get_object(key, Range=f"bytes={start}-{end}")
+
+    def delete(self, key: str) -> bool:
+        if self.stat(key) is None:
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        return True
+
+    def delete_prefix(self, prefix: str) -> None:
+        if not prefix:
+            raise ValueError("delete_prefix no puede borrar la raíz del almacenamiento")
+        prefix = prefix.rstrip("/") + "/"
+        batch = []
+        for key in self.iter_keys(prefix):
+            batch.append({"Key": key})
+            if len(batch) == 1000:  # Máximo por petición de DeleteObjects
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+                batch = []
+        if batch:
+            self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": batch})
+
+    def stat(self, key: str) -> Optional[ObjectStat]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self._client_error as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return ObjectStat(
+            size=response["ContentLength"],
+            mtime=response["LastModified"].timestamp(),
+            etag=response.get("ETag"),
+        )
+
+    def presign(self, key: str, expires: int) -> Optional[str]:
+        if expires <= 0:
+            return None  # Prefirmado desactivado: la API hace de proxy
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires
+        )
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"]
+
+
+def storage_key(location: Union[str, Path]) -> Optional[str]:
+    """
+    Clave de almacenamiento para una URL pública (/uploads/songs/x.mp3) o una
+    ruta dentro de UPLOAD_DIR. Retorna None si apunta fuera de los uploads.
+    """
+    if isinstance(location, Path):
+        root = UPLOAD_DIR.resolve()
+        path = location.resolve()
+        if root not in path.parents:
+            return None
+        return path.relative_to(root).as_posix()
+
+    relative = location.replace("\\", "/").lstrip("/")
+    if relative.startswith("uploads/"):
+        relative = relative[len("uploads/"):]
+    relative = posixpath.normpath(relative)
+    if relative in (".", "") or relative.startswith("../") or relative == "..":
+        return None
+    return relative
+
+
+def publish(path: Path, content_type: Optional[str] = None) -> None:
+    """Publica en el backend un archivo generado dentro de UPLOAD_DIR, bajo su propia clave"""
+    storage.put_file(storage_key(path), path, content_type)
+
+
+def create_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(UPLOAD_DIR)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            access_key=settings.S3_ACCESS_KEY,
+            secret_key=settings.S3_SECRET_KEY,
+            region=settings.S3_REGION,
+        )
+    raise ValueError(f"STORAGE_BACKEND desconocido: {settings.STORAGE_BACKEND}")
+
+
+storage = create_storage()
@@ -0,0 +1,447 @@
+"""
+Utilidades para servir audio por HTTP con soporte de rangos.
+
+Incluye el parseo de cabeceras Range, los validadores de caché (ETag /
+Last-Modified), la evaluación de peticiones condicionales y una respuesta ASGI
+que envía únicamente los bytes pedidos, usando zero-copy (sendfile) cuando el
+servidor ASGI lo ofrece. Las canciones del conjunto caliente se sirven
+directamente desde su mmap. Con un backend de almacenamiento remoto se redirige
+a una URL prefirmada o se hace de proxy leyendo rangos del objeto.
+"""
+import mimetypes
+import os
+import stat as stat_module
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+import uuid
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import RedirectResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from file_cache import CachedFile, file_cache
+from config import settings
+from hot_set import MappedFile, hot_set
+from storage import ObjectStat, storage
+
+CHUNK_SIZE = 64 * 1024  # 64 KB por lectura cuando no hay zero-copy
+MAX_RANGES = 16  # Más rangos que esto se ignoran y se sirve el archivo completo
+PROXY_CHUNK_SIZE = 1024 * 1024  # 1 MB por lectura remota (cada una es una petición)
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+# Para archivos derivados (segmentos HLS, picos) que nunca cambian una vez generados
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ByteRange = Tuple[int, int]  # (inicio, fin) inclusivo
+
+
+class RangeNotSatisfiable(Exception):
+    """Ninguno de los rangos pedidos cae dentro del archivo"""
+
+
+def parse_range_header(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Interpreta una cabecera Range de tipo bytes.
+    Retorna None si la cabecera no existe o es inválida (se sirve el archivo completo),
+    o la lista de rangos ordenados y fusionados. Lanza RangeNotSatisfiable si ninguno aplica.
+    """
+    if not header:
+        return None
+
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start_str, sep, end_str = part.partition("-")
+        if not sep:
+            return None
+        try:
+            if start_str == "":
+                # Sufijo: los últimos N bytes
+                suffix = int(end_str)
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+            else:
+                start = int(start_str)
+                end = int(end_str) if end_str else start + size
+                if end < start:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Fusionar rangos solapados o contiguos
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """ETag fuerte derivado de la fecha de modificación y el tamaño"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def make_last_modified(stat_result: os.stat_result) -> str:
+    return formatdate(stat_result.st_mtime, usegmt=True)
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    """Compara una lista de ETags (If-None-Match / If-Range) con el actual"""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+def _if_range_allows(header: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range solo permite la respuesta parcial si el validador coincide exactamente"""
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        return header == etag
+    return header == last_modified
+
+
+def is_not_modified(request: Request, mtime: float, etag: str) -> bool:
+    """Evalúa If-None-Match / If-Modified-Since para responder 304"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag, weak=True)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        return _not_modified_since(if_modified_since, mtime)
+    return False
+
+
+class FileRangeResponse(Response):
+    """
+    Respuesta que envía un archivo completo o una lista de rangos del mismo.
+    Lee del descriptor compartido del caché y libera su referencia al terminar.
+    """
+
+    def __init__(
+        self,
+        entry: Union[CachedFile, MappedFile],
+        size: int,
+        ranges: Optional[List[ByteRange]],
+        media_type: str,
+        headers: dict,
+        send_body: bool = True,
+    ):
+        self.entry = entry
+        self.size = size
+        self.ranges = ranges
+        self.send_body = send_body
+        self.media_type = media_type
+        self.background = None
+        self.body = b""
+
+        if ranges is None:
+            self.status_code = 200
+            self._parts: List[Tuple[bytes, int, int]] = [(b"", 0, size - 1)] if size else []
+            content_type = media_type
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.status_code = 206
+            self._parts = [(b"", start, end)]
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            content_type = media_type
+        else:
+            # multipart/byteranges: cada parte lleva sus propias cabeceras
+            self.status_code = 206
+            boundary = uuid.uuid4().hex
+            self._parts = [
+                (
+                    (
+                        f"--{boundary}\r\n"
+                        f"Content-Type: {media_type}\r\n"
+                        f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                    ).encode("latin-1"),
+                    start,
+                    end,
+                )
+                for start, end in ranges
+            ]
+            self._trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            content_type = f"multipart/byteranges; boundary={boundary}"
+
+        content_length = sum(len(prefix) + end - start + 1 for prefix, start, end in self._parts)
+        if ranges is not None and len(ranges) > 1:
+            # Cada parte después de la primera va precedida de CRLF, más el cierre
+            content_length += 2 * (len(self._parts) - 1) + len(self._trailer)
+
+        headers["Content-Length"] = str(content_length)
+        headers["Content-Type"] = content_type
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self._send(scope, send)
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        file_cache.release(self.entry)
+
+    async def _send(self, scope: Scope, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or not self._parts:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        zerocopy = ZEROCOPY_EXTENSION in scope.get("extensions", {})
+        multipart = len(self._parts) > 1
+        file = getattr(self.entry, "file", None)
+        for index, (prefix, start, end) in enumerate(self._parts):
+            if multipart and index > 0:
+                prefix = b"\r\n" + prefix
+            if prefix:
+                await send({"type": "http.response.body", "body": prefix, "more_body": True})
+            is_last = index == len(self._parts) - 1 and not multipart
+            await self._send_range(send, file, start, end - start + 1, zerocopy, more_body=not is_last)
+        if multipart:
+            await send({"type": "http.response.body", "body": self._trailer, "more_body": False})
+
+    async def _send_range(self, send: Send, file, offset: int, count: int, zerocopy: bool, more_body: bool):
+        if zerocopy:
+            # El servidor hace os.sendfile directamente sobre el socket
+            await send({
+                "type": ZEROCOPY_EXTENSION,
+                "file": file,
+                "offset": offset,
+                "count": count,
+                "more_body": more_body,
+            })
+            return
+
+        fd = file.fileno()
+        remaining = count
+        while remaining > 0:
+            # pread no mueve el cursor, así que es seguro con descriptores compartidos
+            chunk = await anyio.to_thread.run_sync(os.pread, fd, min(CHUNK_SIZE, remaining), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body or remaining > 0,
+            })
+        if remaining > 0:
+            # El archivo se truncó mientras se enviaba; cerrar el cuerpo igualmente
+            await send({"type": "http.response.body", "body": b"", "more_body": more_body})
+
+
+class MappedRangeResponse(FileRangeResponse):
+    """Igual que FileRangeResponse pero rebanando el mmap de una canción caliente"""
+
+    def _release(self) -> None:
+        pass
+
+    async def _send_range(self, send: Send, file, offset: int, count: int, zerocopy: bool, more_body: bool):
+        view = self.entry.view
+        end = offset + count
+        while offset < end:
+            chunk_end = min(offset + CHUNK_SIZE, end)
+            await send({
+                "type": "http.response.body",
+                "body": view[offset:chunk_end],
+                "more_body": more_body or chunk_end < end,
+            })
+            offset = chunk_end
+
+
+class ObjectRangeResponse(FileRangeResponse):
+    """Proxy de un objeto remoto: cada rango se pide al backend por trozos"""
+
+    def _release(self) -> None:
+        pass
+
+    async def _send_range(self, send: Send, file, offset: int, count: int, zerocopy: bool, more_body: bool):
+        end = offset + count
+        while offset < end:
+            chunk_end = min(offset + PROXY_CHUNK_SIZE, end)
+            chunk = await anyio.to_thread.run_sync(storage.get_range, self.entry, offset, chunk_end - 1)
+            await send({
+                "type": "http.response.body",
+                "body": chunk,
+                "more_body": more_body or chunk_end < end,
+            })
+            offset = chunk_end
+
+
+def invalidate_cached_file(path: Path) -> None:
+    """Saca un archivo de ambas capas de caché (descriptores y mmap)"""
+    file_cache.invalidate(path)
+    hot_set.invalidate(path)
+
+
+def resolve_upload_path(upload_dir: Path, url_path: str) -> Optional[Path]:
+    """
+    Convierte una ruta pública (/uploads/songs/x.mp3) en la ruta real dentro de
+    upload_dir. Retorna None si la ruta intenta salir del directorio de uploads.
+    """
+    relative = url_path.replace("\\", "/").lstrip("/")
+    if relative.startswith("uploads/"):
+        relative = relative[len("uploads/"):]
+    root = upload_dir.resolve()
+    candidate = (root / relative).resolve()
+    if root not in candidate.parents:
+        return None
+    return candidate
+
+
+def build_file_response(
+    request: Request,
+    path: Path,
+    media_type: Optional[str] = None,
+    cache_control: str = "public, max-age=0, must-revalidate",
+) -> Response:
+    """
+    Construye la respuesta adecuada (200, 206, 304 o 416) para servir un archivo
+    según las cabeceras Range y condicionales de la petición.
+    Las canciones calientes salen de su mmap; el resto usa el caché de descriptores.
+    """
+    entry = hot_set.get(path)
+    if entry is not None:
+        response_class = MappedRangeResponse
+        release = lambda: None
+    else:
+        entry = file_cache.acquire(path)
+        response_class = FileRangeResponse
+        release = lambda: file_cache.release(entry)
+
+    stat_result = entry.stat
+    if not stat_module.S_ISREG(stat_result.st_mode):
+        release()
+        raise FileNotFoundError(str(path))
+
+    etag = make_etag(stat_result)
+    last_modified = make_last_modified(stat_result)
+    if media_type is None:
+        media_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control,
+    }
+
+    size = stat_result.st_size
+    early, ranges = _evaluate_conditions(request, size, stat_result.st_mtime, etag, last_modified, headers)
+    if early is not None:
+        release()
+        return early
+
+    return response_class(
+        entry=entry,
+        size=size,
+        ranges=ranges,
+        media_type=media_type,
+        headers=headers,
+        send_body=request.method != "HEAD",
+    )
+
+
+def _evaluate_conditions(
+    request: Request, size: int, mtime: float, etag: str, last_modified: str, headers: dict
+) -> Tuple[Optional[Response], Optional[List[ByteRange]]]:
+    """Retorna una respuesta 304/416 si corresponde, o los rangos a enviar"""
+    if is_not_modified(request, mtime, etag):
+        return Response(status_code=304, headers=headers), None
+
+    ranges = None
+    if _if_range_allows(request.headers.get("if-range"), etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers), None
+    return None, ranges
+
+
+def build_storage_response(
+    request: Request,
+    key: str,
+    media_type: Optional[str] = None,
+    cache_control: str = "public, max-age=0, must-revalidate",
+) -> Response:
+    """
+    Sirve el objeto `key` del backend de almacenamiento. Si es local se usa
+    build_file_response (sendfile, caché de descriptores, mmap); si no, se
+    redirige a una URL prefirmada o, si están desactivadas, se hace de proxy.
+    Lanza FileNotFoundError si el objeto no existe.
+    """
+    path = storage.local_path(key)
+    if path is not None:
+        return build_file_response(request, path, media_type, cache_control)
+
+    url = storage.presign(key, settings.S3_PRESIGN_SECONDS)
+    if url is not None:
+        return RedirectResponse(url, status_code=307)
+
+    stat_result: Optional[ObjectStat] = storage.stat(key)
+    if stat_result is None:
+        raise FileNotFoundError(key)
+
+    etag = stat_result.etag or f'"{int(stat_result.mtime * 1e9):x}-{stat_result.size:x}"'
+    last_modified = formatdate(stat_result.mtime, usegmt=True)
+    if media_type is None:
+        media_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control,
+    }
+
+    early, ranges = _evaluate_conditions(request, stat_result.size, stat_result.mtime, etag, last_modified, headers)
+    if early is not None:
+        return early
+
+    return ObjectRangeResponse(
+        entry=key,
+        size=stat_result.size,
+        ranges=ranges,
+        media_type=media_type,
+        headers=headers,
+        send_body=request.method != "HEAD",
+    )
@@ -0,0 +1,300 @@
+"""
+Índice de prefijos en memoria para las sugerencias del buscador.
+
+Search.tsx pide sugerencias con cada tecla; consultarlas en la base de datos
+sería una petición SQL por pulsación. Aquí se guardan los títulos de las
+canciones aprobadas, los nombres de artista y los títulos de los álbumes
+aprobados, normalizados (minúsculas, sin acentos ni signos), en un arreglo
+ordenado de (clave, entrada). Cada texto se indexa desde el inicio de cada
+palabra, así "vien" encuentra "Rosa de los vientos". Una consulta son dos
+búsquedas binarias y un recorrido acotado del rango.
+
+Los artistas se guardan una sola vez aunque tengan muchas canciones.
+
+Con prefijos cortos el rango abarca buena parte del catálogo. Cuando tiene
+más de MAX_SCAN claves el resultado se calcula una vez y se guarda hasta que
+cambie alguna clave que empiece por ese prefijo; son las consultas más
+frecuentes (las primeras teclas) y hay pocas, porque sus rangos no se solapan.
+
+El índice se construye al arrancar y se reconstruye cada
+SUGGEST_REBUILD_SECONDS. Entre medias se actualiza al confirmar cualquier
+sesión que cree, borre o apruebe canciones o álbumes (eventos de la Session
+de SQLAlchemy). Cada worker tiene su propio índice: lo que se cambie en otro
+proceso aparece en la siguiente reconstrucción.
+
+La reconstrucción añade todas las claves y ordena una sola vez (insertarlas
+de una en una en la lista ordenada es cuadrático). Los cambios confirmados
+mientras se reconstruye se guardan y se vuelven a aplicar sobre el índice
+nuevo antes de sustituir al anterior; aplicar un cambio dos veces no altera
+el resultado.
+"""
+import asyncio
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Album, Song
+
+logger = logging.getLogger(__name__)
+
+MAX_SCAN = 256  # Rangos más grandes se calculan una vez y se guardan
+MAX_WORDS = 8  # Palabras de un texto desde las que se indexa
+MAX_SUGGESTIONS = 20
+
+
+def normalize(value: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", stripped.casefold()))
+
+
+class Entry:
+    __slots__ = ("kind", "id", "text", "normalized", "score", "keys", "refs")
+
+    def __init__(self, kind: str, id: Optional[int], text: str, score: int):
+        self.kind = kind
+        self.id = id
+        self.text = text
+        self.normalized = normalize(text)
+        self.score = score
+        self.keys: List[str] = []
+        self.refs = 1  # Canciones que usan este artista
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, int]] = []  # (clave, número de entrada), ordenado
+        self._entries: Dict[int, Entry] = {}
+        self._by_ref: Dict[Tuple[str, object], int] = {}  # (tipo, id o artista) -> entrada
+        self._songs: Dict[int, Tuple[str, int]] = {}  # canción -> (artista, reproducciones)
+        self._next_id = 0
+        self._cached: Dict[str, List[Entry]] = {}  # Prefijo con rango grande -> mejores entradas
+        self._loading = False  # Carga inicial: claves sin ordenar hasta el final
+        self._pending: Optional[List[List[tuple]]] = None  # Cambios durante una reconstrucción
+        self.rebuilds = 0
+
+    # Se llaman con el lock tomado
+    def _add_entry(self, ref: Tuple[str, object], entry: Entry) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        normalized = entry.normalized
+        words = normalized.split(" ")
+        positions = [0]
+        for word in words[:-1]:
+            positions.append(positions[-1] + len(word) + 1)
+        entry.keys = sorted({normalized[position:] for position in positions[:MAX_WORDS]} - {""})
+        if self._loading:
+            self._keys.extend((key, entry_id) for key in entry.keys)
+        else:
+            for key in entry.keys:
+                insort(self._keys, (key, entry_id))
+                self._invalidate(key)
+        self._entries[entry_id] = entry
+        self._by_ref[ref] = entry_id
+
+    def _remove_entry(self, ref: Tuple[str, object]) -> None:
+        entry_id = self._by_ref.pop(ref, None)
+        if entry_id is None:
+            return
+        entry = self._entries.pop(entry_id)
+        for key in entry.keys:
+            position = bisect_left(self._keys, (key, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, entry_id):
+                del self._keys[position]
+            self._invalidate(key)
+
+    def _invalidate(self, key: str) -> None:
+        if self._cached:
+            for length in range(1, len(key) + 1):
+                self._cached.pop(key[:length], None)
+
+    def _add_song(self, song_id: int, title: str, artist: str, play_count: int) -> None:
+        self._remove_song(song_id)
+        self._add_entry(("song", song_id), Entry("song", song_id, title, play_count))
+        self._songs[song_id] = (artist, play_count)
+        artist_ref = ("artist", normalize(artist))
+        if not artist_ref[1]:
+            return
+        entry_id = self._by_ref.get(artist_ref)
+        if entry_id is None:
+            self._add_entry(artist_ref, Entry("artist", None, artist, play_count))
+        else:
+            self._entries[entry_id].refs += 1
+            self._entries[entry_id].score += play_count
+
+    def _remove_song(self, song_id: int) -> None:
+        if song_id not in self._songs:
+            return
+        artist, play_count = self._songs.pop(song_id)
+        self._remove_entry(("song", song_id))
+        artist_ref = ("artist", normalize(artist))
+        entry_id = self._by_ref.get(artist_ref)
+        if entry_id is not None:
+            entry = self._entries[entry_id]
+            entry.refs -= 1
+            entry.score -= play_count
+            if entry.refs <= 0:
+                self._remove_entry(artist_ref)
+
+    def _add_album(self, album_id: int, title: str, score: int) -> None:
+        self._remove_entry(("album", album_id))
+        self._add_entry(("album", album_id), Entry("album", album_id, title, score))
+
+    def _load(self, songs: List[tuple], albums: List[tuple]) -> None:
+        """Llena un índice vacío y ordena las claves una sola vez"""
+        self._loading = True
+        for song_id, title, artist, play_count in songs:
+            self._add_song(song_id, title, artist, play_count or 0)
+        for album_id, title, score in albums:
+            self._add_album(album_id, title, int(score))
+        self._keys.sort()
+        self._loading = False
+
+    def rebuild(self) -> None:
+        """Reconstruye el índice desde la base de datos"""
+        with self._lock:
+            self._pending = []  # Antes de leer: lo que se confirme después se repite
+        try:
+            db = SessionLocal()
+            try:
+                songs = db.execute(
+                    select(Song.id, Song.title, Song.artist, Song.play_count).where(Song.is_approved == True)
+                ).all()
+                albums = db.execute(
+                    select(Album.id, Album.title, func.coalesce(func.sum(Song.play_count), 0))
+                    .outerjoin(Song, Song.album_id == Album.id)
+                    .where(Album.is_approved == True)
+                    .group_by(Album.id, Album.title)
+                ).all()
+            finally:
+                db.close()
+
+            fresh = SuggestIndex()
+            fresh._load(songs, albums)
+
+            with self._lock:
+                for changes in self._pending:
+                    fresh._apply(changes)
+                self._keys, self._entries, self._by_ref = fresh._keys, fresh._entries, fresh._by_ref
+                self._songs, self._next_id = fresh._songs, fresh._next_id
+                self._cached = {}
+                self.rebuilds += 1
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def apply(self, changes: List[tuple]) -> None:
+        """Cambios capturados en una sesión confirmada (ver _collect_changes)"""
+        with self._lock:
+            self._apply(changes)
+            if self._pending is not None:
+                self._pending.append(changes)
+
+    def _apply(self, changes: List[tuple]) -> None:
+        for change in changes:
+            kind, item_id = change[0], change[1]
+            if kind == "song":
+                _, _, title, artist, play_count, visible = change
+                if visible:
+                    self._add_song(item_id, title, artist, play_count or 0)
+                else:
+                    self._remove_song(item_id)
+            elif kind == "album":
+                _, _, title, visible = change
+                if visible:
+                    entry_id = self._by_ref.get(("album", item_id))
+                    score = self._entries[entry_id].score if entry_id is not None else 0
+                    self._add_album(item_id, title, score)
+                else:
+                    self._remove_entry(("album", item_id))
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        with self._lock:
+            best = self._cached.get(prefix)
+            if best is None:
+                start = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + "\uffff",), lo=start)
+                if end - start > MAX_SCAN:
+                    best = self._cached[prefix] = self._top(prefix, start, end, MAX_SUGGESTIONS)
+                else:
+                    best = self._top(prefix, start, end, limit)
+            return [{"kind": entry.kind, "id": entry.id, "text": entry.text} for entry in best[:limit]]
+
+    def _top(self, prefix: str, start: int, end: int, limit: int) -> List[Entry]:
+        matches = {entry_id for _, entry_id in self._keys[start:end]}
+        return heapq.nlargest(
+            limit,
+            (self._entries[entry_id] for entry_id in matches),
+            # Primero lo que empieza por la consulta, luego lo más escuchado
+            key=lambda entry: (entry.normalized.startswith(prefix), entry.score, -len(entry.text)),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            kinds: Dict[str, int] = {}
+            for entry in self._entries.values():
+                kinds[entry.kind] = kinds.get(entry.kind, 0) + 1
+            return {
+                "keys": len(self._keys),
+                "entries": len(self._entries),
+                "cached_prefixes": len(self._cached),
+                "rebuilds": self.rebuilds,
+                **kinds,
+            }
+
+
+suggest_index = SuggestIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context) -> None:
+    """Guarda en la sesión los cambios que afectan al índice; se aplican al confirmar"""
+    changes = session.info.setdefault("suggest_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Song):
+            changes.append(("song", obj.id, obj.title, obj.artist, obj.play_count, bool(obj.is_approved)))
+        elif isinstance(obj, Album):
+            changes.append(("album", obj.id, obj.title, bool(obj.is_approved)))
+    for obj in session.deleted:
+        if isinstance(obj, Song):
+            changes.append(("song", obj.id, None, None, None, False))
+        elif isinstance(obj, Album):
+            changes.append(("album", obj.id, None, False))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session: Session) -> None:
+    changes = session.info.pop("suggest_changes", None)
+    if changes:
+        suggest_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop("suggest_changes", None)
+
+
+async def run_suggest_index_refresher() -> None:
+    """Construye el índice al arrancar y lo reconstruye cada SUGGEST_REBUILD_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(suggest_index.rebuild)
+        except Exception:
+            logger.exception("Error al construir el índice de sugerencias")
+        if settings.SUGGEST_REBUILD_SECONDS <= 0:
+            return
+        await asyncio.sleep(settings.SUGGEST_REBUILD_SECONDS)
@@ -0,0 +1,222 @@
+"""
+Pipeline de transcodificación de canciones a varias calidades (renditions).
+
+Después de crear una canción se generan versiones MP3 a 64/128/256 kbps con el
+encoder instalado localmente (ffmpeg). Cada codificación corre en un pool de
+procesos para no bloquear el event loop, y el resultado se registra en la
+tabla song_renditions. Si el encoder no está instalado el pipeline se omite y
+se sigue sirviendo el archivo original.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional
+
+from config import settings
+from database import SessionLocal
+from models import Song, SongRendition
+from storage import publish, storage, storage_key
+from streaming import invalidate_cached_file, resolve_upload_path
+
+logger = logging.getLogger(__name__)
+
+RENDITION_BITRATES = (64, 128, 256)  # kbps
+QUALITY_BITRATES = {"low": 64, "medium": 128, "high": 256}
+# Calidad que sirve /stream sin ?quality= ni pistas del cliente
+DEFAULT_BITRATE = QUALITY_BITRATES["high"]
+RENDITIONS_SUBDIR = "renditions"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.TRANSCODE_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def encoder_available() -> bool:
+    return shutil.which(settings.FFMPEG_PATH) is not None
+
+
+def estimate_bitrate(size: int, duration: int) -> Optional[int]:
+    """Bitrate aproximado en kbps a partir del tamaño y la duración en segundos"""
+    if not duration or duration <= 0:
+        return None
+    return int(size * 8 / duration / 1000)
+
+
+def _encode_rendition(encoder: str, source: str, destination: str, bitrate: int) -> int:
+    """Se ejecuta en un proceso del pool. Retorna el tamaño del archivo generado"""
+    partial = destination + ".part"
+    subprocess.run(
+        [
+            encoder, "-nostdin", "-loglevel", "error", "-y",
+            "-i", source,
+            "-vn", "-map_metadata", "-1",
+            "-codec:a", "libmp3lame", "-b:a", f"{bitrate}k",
+            "-f", "mp3", partial,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    os.replace(partial, destination)
+    return os.path.getsize(destination)
+
+
+def renditions_dir(upload_dir: Path, song_id: int) -> Path:
+    return upload_dir / RENDITIONS_SUBDIR / str(song_id)
+
+
+def remove_renditions(upload_dir: Path, song_id: int) -> None:
+    directory = renditions_dir(upload_dir, song_id)
+    if directory.is_dir():
+        for path in directory.iterdir():
+            invalidate_cached_file(path)
+    storage.delete_prefix(storage_key(directory))
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+async def transcode_song(song_id: int) -> None:
+    """
+    Genera las renditions de una canción y las registra en la base de datos.
+    Pensado para ejecutarse como tarea de fondo después de crear la canción.
+    """
+    # Importación diferida: routes.upload importa este módulo
+    from routes.upload import UPLOAD_DIR
+
+    if not encoder_available():
+        logger.warning("Encoder '%s' no disponible; se omite la transcodificación", settings.FFMPEG_PATH)
+        return
+
+    db = SessionLocal()
+    try:
+        song = db.query(Song).filter(Song.id == song_id).first()
+        if song is None:
+            return
+        source = resolve_upload_path(UPLOAD_DIR, song.file_path)
+        existing = {rendition.bitrate for rendition in song.renditions}
+        duration = song.duration
+        source_bitrate = song.bitrate
+    finally:
+        db.close()
+
+    if source is None or not source.is_file():
+        logger.warning("Canción %s sin archivo de audio; se omite la transcodificación", song_id)
+        return
+
+    # No generar versiones con más bitrate que el original
+    if source_bitrate is None:
+        source_bitrate = estimate_bitrate(source.stat().st_size, duration)
+    bitrates: List[int] = [
+        bitrate for bitrate in RENDITION_BITRATES
+        if bitrate not in existing and (source_bitrate is None or bitrate < source_bitrate)
+    ]
+    if not bitrates:
+        return
+
+    output_dir = renditions_dir(UPLOAD_DIR, song_id)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    destinations = [output_dir / f"{bitrate}k.mp3" for bitrate in bitrates]
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(
+                executor, _encode_rendition, settings.FFMPEG_PATH, str(source), str(destination), bitrate
+            )
+            for bitrate, destination in zip(bitrates, destinations)
+        ],
+        return_exceptions=True,
+    )
+
+    # Publicar en el backend de almacenamiento las versiones generadas
+    for destination, result in zip(destinations, results):
+        if not isinstance(result, Exception):
+            await asyncio.to_thread(publish, destination, "audio/mpeg")
+
+    db = SessionLocal()
+    try:
+        if db.query(Song.id).filter(Song.id == song_id).first() is None:
+            # La canción se eliminó mientras se transcodificaba
+            remove_renditions(UPLOAD_DIR, song_id)
+            return
+        for bitrate, destination, result in zip(bitrates, destinations, results):
+            if isinstance(result, Exception):
+                logger.error("Error al transcodificar canción %s a %s kbps: %s", song_id, bitrate, result)
+                continue
+            relative_path = str(destination.relative_to(UPLOAD_DIR)).replace("\\", "/")
+            db.add(SongRendition(
+                song_id=song_id,
+                bitrate=bitrate,
+                format="mp3",
+                file_path=f"/uploads/{relative_path}",
+                size=result,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def choose_bitrate(quality: Optional[str], save_data: Optional[str], downlink: Optional[str]) -> Optional[int]:
+    """
+    Bitrate objetivo en kbps según ?quality= o las pistas del cliente
+    (Save-Data, Downlink en Mbps). Sin ninguna de ellas, DEFAULT_BITRATE.
+    None significa servir el original.
+    """
+    if quality:
+        quality = quality.lower()
+        if quality == "original":
+            return None
+        if quality in QUALITY_BITRATES:
+            return QUALITY_BITRATES[quality]
+        if quality.isdigit():
+            # Ajustar al escalón de calidad más cercano por debajo
+            requested = int(quality)
+            tiers = [bitrate for bitrate in RENDITION_BITRATES if bitrate <= requested]
+            return tiers[-1] if tiers else RENDITION_BITRATES[0]
+        return None
+
+    if save_data and save_data.strip().lower() == "on":
+        return QUALITY_BITRATES["low"]
+
+    if downlink:
+        try:
+            mbps = float(downlink)
+        except ValueError:
+            mbps = None
+        if mbps is not None:
+            if mbps < 0.5:
+                return QUALITY_BITRATES["low"]
+            if mbps < 1.5:
+                return QUALITY_BITRATES["medium"]
+
+    return DEFAULT_BITRATE
+
+
+def select_rendition(song: Song, bitrate: Optional[int]) -> Optional[SongRendition]:
+    """
+    Rendition a servir para el bitrate objetivo. Si no existe es porque el
+    original ya tiene menor bitrate (no se generan versiones más pesadas) o
+    porque aún no se transcodificó; en ambos casos se sirve el original.
+    """
+    if bitrate is None:
+        return None
+    for rendition in song.renditions:
+        if rendition.bitrate == bitrate:
+            return rendition
+    return None
@@ -0,0 +1,241 @@
+"""
+Recepción de subidas multipart leyendo el cuerpo de la petición como stream.
+
+UploadFile obliga a Starlette a volcar todo el cuerpo a un archivo temporal
+antes de que el endpoint pueda rechazarlo, y después había que copiarlo otra
+vez a su destino. Aquí cada parte de archivo se escribe directamente en su
+ubicación final con aiofiles a medida que llegan los bytes: el tipo MIME se
+valida con las cabeceras de la parte (antes de escribir nada), el límite de
+tamaño se comprueba en cada trozo y el SHA-256 se calcula de paso. Si la
+subida falla a mitad, los archivos ya escritos se borran.
+"""
+import hashlib
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import aiofiles
+from fastapi import HTTPException
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import ClientDisconnect, Request
+
+from storage import UPLOAD_DIR
+MAX_FIELD_SIZE = 64 * 1024  # Campos de texto (títulos, artistas, ...)
+FORM_OVERHEAD = 64 * 1024  # Margen para cabeceras y campos al comparar Content-Length
+
+
+def upload_url(path: Path) -> str:
+    """Ruta pública con barras normales, p. ej. /uploads/songs/<uuid>.mp3"""
+    return "/uploads/" + path.relative_to(UPLOAD_DIR).as_posix()
+
+
+@dataclass
+class FileRule:
+    """Qué se acepta en un campo de archivo y dónde se guarda"""
+    label: str
+    allowed_types: Sequence[str]
+    max_size: int
+    directory: Path
+    multiple: bool = False  # Varias partes con el mismo nombre (canciones de un álbum)
+
+
+@dataclass
+class StoredFile:
+    field: str
+    filename: str
+    content_type: str
+    path: Path
+    size: int
+    sha256: str
+
+    @property
+    def url(self) -> str:
+        return upload_url(self.path)
+
+
+@dataclass
+class UploadForm:
+    fields: Dict[str, List[str]] = field(default_factory=dict)
+    files: Dict[str, List[StoredFile]] = field(default_factory=dict)
+
+    def get(self, name: str) -> Optional[str]:
+        values = self.fields.get(name)
+        return values[0] if values else None
+
+    def getlist(self, name: str) -> List[str]:
+        return self.fields.get(name, [])
+
+    def file(self, name: str) -> Optional[StoredFile]:
+        stored = self.files.get(name)
+        return stored[0] if stored else None
+
+    def filelist(self, name: str) -> List[StoredFile]:
+        return self.files.get(name, [])
+
+    def discard(self) -> None:
+        """Borra todo lo escrito (se usa cuando la petición se rechaza después de recibirla)"""
+        for stored in self.files.values():
+            for item in stored:
+                item.path.unlink(missing_ok=True)
+
+
+class _FilePart:
+    """Archivo que se está recibiendo"""
+
+    def __init__(self, name: str, filename: str, content_type: str, rule: FileRule, label: str):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.rule = rule
+        self.label = label
+        extension = filename.split(".")[-1]
+        self.path = rule.directory / f"{uuid.uuid4()}.{extension}"
+        self.size = 0
+        self.hash = hashlib.sha256()
+        self.file = None
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > self.rule.max_size:
+            max_size_mb = self.rule.max_size / (1024 * 1024)
+            raise HTTPException(
+                status_code=413,
+                detail=f"{self.label} no debe superar {max_size_mb} MB"
+            )
+        self.hash.update(data)
+        await self.file.write(data)
+
+    def stored(self) -> StoredFile:
+        return StoredFile(
+            field=self.name,
+            filename=self.filename,
+            content_type=self.content_type,
+            path=self.path,
+            size=self.size,
+            sha256=self.hash.hexdigest(),
+        )
+
+
+def _check_content_length(request: Request, rules: Dict[str, FileRule]) -> None:
+    """Rechaza sin leer el cuerpo si Content-Length ya supera lo que se puede aceptar"""
+    if any(rule.multiple for rule in rules.values()):
+        return
+    try:
+        content_length = int(request.headers.get("content-length", ""))
+    except ValueError:
+        return
+    limit = sum(rule.max_size for rule in rules.values()) + FORM_OVERHEAD
+    if content_length > limit:
+        raise HTTPException(status_code=413, detail="La petición supera el tamaño permitido")
+
+
+async def receive_upload(request: Request, rules: Dict[str, FileRule]) -> UploadForm:
+    """
+    Lee un cuerpo multipart/form-data como stream. Las partes de archivo deben
+    tener una regla en `rules` (por nombre de campo); el resto se guardan como
+    texto. Lanza HTTPException si algo no es válido, sin dejar archivos a medias.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Se esperaba multipart/form-data")
+    _check_content_length(request, rules)
+
+    # Los callbacks del parser son síncronos: acumulan eventos y se procesan
+    # después de cada trozo, donde sí se puede esperar la escritura
+    events: List[tuple] = []
+    parser = MultipartParser(boundary, {
+        "on_part_begin": lambda: events.append(("begin", b"")),
+        "on_header_field": lambda data, start, end: events.append(("header_field", data[start:end])),
+        "on_header_value": lambda data, start, end: events.append(("header_value", data[start:end])),
+        "on_header_end": lambda: events.append(("header_end", b"")),
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", b"")),
+    })
+
+    form = UploadForm()
+    headers: Dict[bytes, bytes] = {}
+    header_field = b""
+    header_value = b""
+    field_name = ""
+    field_value = bytearray()
+    part: Optional[_FilePart] = None
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    headers = {}
+                    header_field = header_value = b""
+                    field_value = bytearray()
+                elif kind == "header_field":
+                    header_field += data
+                elif kind == "header_value":
+                    header_value += data
+                elif kind == "header_end":
+                    headers[header_field.lower()] = header_value
+                    header_field = header_value = b""
+                elif kind == "headers_finished":
+                    _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                    field_name = options.get(b"name", b"").decode("latin-1")
+                    if b"filename" in options:
+                        part = await _open_file_part(form, rules, field_name, options, headers)
+                elif kind == "data":
+                    if part is not None:
+                        await part.write(data)
+                    else:
+                        field_value += data
+                        if len(field_value) > MAX_FIELD_SIZE:
+                            raise HTTPException(status_code=413, detail=f"Campo {field_name} demasiado grande")
+                elif kind == "end":
+                    if part is not None:
+                        await part.file.close()
+                        form.files.setdefault(field_name, []).append(part.stored())
+                        part = None
+                    else:
+                        form.fields.setdefault(field_name, []).append(field_value.decode("utf-8"))
+            events.clear()
+        parser.finalize()
+    except BaseException as e:
+        if part is not None:
+            if part.file is not None:
+                await part.file.close()
+            part.path.unlink(missing_ok=True)
+        form.discard()
+        if isinstance(e, ClientDisconnect):
+            raise HTTPException(status_code=400, detail="La subida se interrumpió")
+        raise
+
+    return form
+
+
+async def _open_file_part(
+    form: UploadForm,
+    rules: Dict[str, FileRule],
+    name: str,
+    options: Dict[bytes, bytes],
+    headers: Dict[bytes, bytes],
+) -> _FilePart:
+    rule = rules.get(name)
+    if rule is None:
+        raise HTTPException(status_code=400, detail=f"Campo de archivo inesperado: {name}")
+
+    count = len(form.files.get(name, []))
+    if count and not rule.multiple:
+        raise HTTPException(status_code=400, detail=f"Solo se permite un archivo en {name}")
+    label = f"{rule.label} {count + 1}" if rule.multiple else rule.label
+
+    content_type = headers.get(b"content-type", b"").decode("latin-1")
+    if content_type not in rule.allowed_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{label} debe ser uno de: {', '.join(rule.allowed_types)}"
+        )
+
+    filename = options[b"filename"].decode("utf-8", errors="replace")
+    part = _FilePart(name, filename, content_type, rule, label)
+    part.file = await aiofiles.open(part.path, "wb")
+    return part
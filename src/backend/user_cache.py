@@ -0,0 +1,208 @@
+"""
+Caché del usuario autenticado para get_current_user.
+
+Cada petición autenticada decodifica el JWT y buscaba el usuario por email: una
+consulta extra incluso en rutas tan frecuentes como POST /songs/{id}/play.
+Aquí se guarda por unos segundos (USER_CACHE_TTL_SECONDS) una copia de las
+columnas del usuario, indexada por el sujeto del token. En un acierto se
+reconstruye el User y se adjunta a la sesión de la petición sin consultar la
+base de datos (merge con load=False), así las rutas lo usan como siempre.
+
+Por defecto el caché vive en memoria del proceso. Con USER_CACHE_REDIS_URL
+se comparte entre workers (requiere el paquete redis) y la invalidación llega
+a todos; en memoria, los demás workers pueden ver el valor anterior hasta que
+expire el TTL. Toda ruta que modifica una fila de users invalida su entrada
+después del commit: update_user_role, deactivate_user y upload_avatar.
+
+El hash de la contraseña no se guarda en el caché.
+
+get_current_principal solo necesita comprobar token_version e is_active:
+load_user_values devuelve las columnas sin adjuntar nada a la sesión.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from sqlalchemy import DateTime, Enum, select
+from sqlalchemy.orm import make_transient_to_detached
+
+from config import settings
+from models import User
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_COLUMNS = {"hashed_password"}
+REDIS_PREFIX = "p-music:user:"
+
+
+def snapshot(user: User) -> dict:
+    return {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+        if column.key not in EXCLUDED_COLUMNS
+    }
+
+
+def user_from_snapshot(values: dict) -> User:
+    """User desacoplado y sin cambios pendientes, listo para db.merge(..., load=False)"""
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def _encode(values: dict) -> str:
+    return json.dumps({
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in values.items()
+    })
+
+
+def _decode(data: Union[str, bytes]) -> dict:
+    values = json.loads(data)
+    for column in User.__table__.columns:
+        value = values.get(column.key)
+        if value is None:
+            continue
+        if isinstance(column.type, DateTime):
+            values[column.key] = datetime.fromisoformat(value)
+        elif isinstance(column.type, Enum) and column.type.enum_class is not None:
+            values[column.key] = column.type.enum_class(value)
+    return values
+
+
+class MemoryUserCache:
+    def __init__(self, ttl: int, capacity: int):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, subject: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    async def set(self, subject: str, values: dict) -> None:
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    async def invalidate(self, subject: str) -> None:
+        with self._lock:
+            self._entries.pop(subject, None)
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class RedisUserCache:
+    def __init__(self, ttl: int, url: str):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self.client = redis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, subject: str) -> Optional[dict]:
+        data = await self.client.get(REDIS_PREFIX + subject)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _decode(data)
+
+    async def set(self, subject: str, values: dict) -> None:
+        await self.client.set(REDIS_PREFIX + subject, _encode(values), ex=self.ttl)
+
+    async def invalidate(self, subject: str) -> None:
+        await self.client.delete(REDIS_PREFIX + subject)
+
+    def stats(self) -> Dict[str, Union[int, float, str]]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_user_cache():
+    if settings.USER_CACHE_TTL_SECONDS <= 0:
+        return None
+    if settings.USER_CACHE_REDIS_URL:
+        try:
+            return RedisUserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_REDIS_URL)
+        except ImportError:
+            logger.warning("USER_CACHE_REDIS_URL requiere el paquete redis; se usa el caché en memoria")
+    return MemoryUserCache(settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_SIZE)
+
+
+user_cache = create_user_cache()
+
+
+async def _cached(email: str) -> Optional[dict]:
+    if user_cache is None:
+        return None
+    try:
+        return await user_cache.get(email)
+    except Exception as e:
+        logger.warning("Error al leer el caché de usuarios: %s", e)
+        return None
+
+
+async def _fetch(db, email: str) -> Optional[User]:
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is not None and user_cache is not None:
+        try:
+            await user_cache.set(email, snapshot(user))
+        except Exception as e:
+            logger.warning("Error al escribir en el caché de usuarios: %s", e)
+    return user
+
+
+async def load_user(db, email: str) -> Optional[User]:
+    """
+    Usuario con ese email adjunto a la sesión `db`: del caché si está, si no de
+    la base de datos (y se guarda en el caché)
+    """
+    values = await _cached(email)
+    if values is not None:
+        return await db.merge(user_from_snapshot(values), load=False)
+    return await _fetch(db, email)
+
+
+async def load_user_values(db, email: str) -> Optional[dict]:
+    """Columnas del usuario (como snapshot()) sin adjuntarlo a la sesión"""
+    values = await _cached(email)
+    if values is not None:
+        return values
+    user = await _fetch(db, email)
+    return snapshot(user) if user is not None else None
+
+
+async def invalidate_user(email: str) -> None:
+    """Se llama después de confirmar cualquier cambio en una fila de users"""
+    if user_cache is not None:
+        await user_cache.invalidate(email)
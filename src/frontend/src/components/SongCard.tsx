@@ -31,7 +31,7 @@ export const SongCard: React.FC<SongCardProps> = ({ song, index, allSongs }) =>
     >
       <div className="relative aspect-square mb-4 rounded-md overflow-hidden">
         <img
-          src={song.cover_url || '/placeholder-album.jpg'}
+          src={song.cover_url ? `http://127.0.0.1:8000/songs/${song.id}/cover?size=300` : '/placeholder-album.jpg'}
           alt={song.title}
           className="w-full h-full object-cover"
         />
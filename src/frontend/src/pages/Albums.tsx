@@ -4,7 +4,6 @@ import { Music, Calendar, Play } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import api from '@/lib/axios';
 import { toast } from 'react-hot-toast';
-import { getFileUrl } from '@/lib/utils';
 
 interface Album {
   id: number;
@@ -15,7 +14,6 @@ interface Album {
   creator_id: number;
   is_approved: boolean;
   created_at: string;
-  songs?: any[];
 }
 
 export const Albums: React.FC = () => {
@@ -89,7 +87,7 @@ export const Albums: React.FC = () => {
               <div className="relative aspect-square rounded-lg overflow-hidden bg-gradient-to-br from-gruvbox-purple/20 to-gruvbox-aqua/20 mb-4 shadow-lg shadow-gruvbox-bg0/50">
                 {album.cover_image ? (
                   <img
-                    src={getFileUrl(album.cover_image)}
+                    src={`http://127.0.0.1:8000/albums/${album.id}/cover?size=300`}
                     alt={album.title}
                     className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"
                   />
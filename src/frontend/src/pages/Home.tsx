@@ -3,7 +3,7 @@ import { motion } from 'framer-motion';
 import { Play, Flame, Disc3, Heart, Sparkles, Music, Plus, ListMusic } from 'lucide-react';
 import { Link } from 'react-router-dom';
 import api from '@/lib/axios';
-import { Song, Album } from '@/types';
+import { Song, AlbumSummary } from '@/types';
 import { usePlayerStore } from '@/store/playerStore';
 import { toast } from 'react-hot-toast';
 import { getFileUrl } from '@/lib/utils';
@@ -11,7 +11,7 @@ import { AddToPlaylistModal } from '@/components/AddToPlaylistModal';
 
 export const Home: React.FC = () => {
   const [songs, setSongs] = useState<Song[]>([]);
-  const [albums, setAlbums] = useState<Album[]>([]);
+  const [albums, setAlbums] = useState<AlbumSummary[]>([]);
   const [likedSongs, setLikedSongs] = useState<Set<number>>(new Set());
   const [loading, setLoading] = useState(true);
   const [showPlaylistModal, setShowPlaylistModal] = useState(false);
@@ -39,7 +39,7 @@ export const Home: React.FC = () => {
     try {
       setLoading(true);
       const [songsRes, albumsRes] = await Promise.all([
-        api.get('/songs/', { params: { limit: 20, approved_only: true, order_by: 'play_count' } }),
+        api.get('/songs/', { params: { limit: 20, approved_only: true, order_by: 'trending' } }),
         api.get('/albums/', { params: { limit: 6, approved_only: true } })
       ]);
       setSongs(songsRes.data);
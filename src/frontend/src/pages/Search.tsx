@@ -1,8 +1,9 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
-import { Search as SearchIcon, Play, Heart, Music, Plus } from 'lucide-react';
+import { Search as SearchIcon, Play, Heart, Music, Plus, User as UserIcon } from 'lucide-react';
+import { useNavigate } from 'react-router-dom';
 import api from '@/lib/axios';
-import { Song } from '@/types';
+import { AlbumSummary, Creator, SearchResults, Song, Suggestion } from '@/types';
 import { usePlayerStore } from '@/store/playerStore';
 import { toast } from 'react-hot-toast';
 import { getFileUrl } from '@/lib/utils';
@@ -11,12 +12,16 @@ import { AddToPlaylistModal } from '@/components/AddToPlaylistModal';
 export const Search: React.FC = () => {
   const [searchQuery, setSearchQuery] = useState('');
   const [songs, setSongs] = useState<Song[]>([]);
+  const [albums, setAlbums] = useState<AlbumSummary[]>([]);
+  const [creators, setCreators] = useState<Creator[]>([]);
   const [likedSongs, setLikedSongs] = useState<Set<number>>(new Set());
   const [loading, setLoading] = useState(false);
   const [hasSearched, setHasSearched] = useState(false);
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
   const [showPlaylistModal, setShowPlaylistModal] = useState(false);
   const [selectedSong, setSelectedSong] = useState<{ id: number; title: string } | null>(null);
   const { playQueue, currentSong, isPlaying } = usePlayerStore();
+  const navigate = useNavigate();
 
   useEffect(() => {
     fetchLikedSongs();
@@ -30,11 +35,38 @@ export const Search: React.FC = () => {
 
       return () => clearTimeout(delayDebounceFn);
     } else {
+      setSuggestions([]);
       setSongs([]);
+      setAlbums([]);
+      setCreators([]);
       setHasSearched(false);
     }
   }, [searchQuery]);
 
+  // Sugerencias en cada tecla: salen del índice en memoria del backend
+  useEffect(() => {
+    if (!searchQuery.trim()) return;
+    let cancelled = false;
+    api.get<Suggestion[]>('/search/suggest', { params: { q: searchQuery, limit: 8 } })
+      .then((response) => {
+        if (!cancelled) setSuggestions(response.data);
+      })
+      .catch(() => {
+        if (!cancelled) setSuggestions([]);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [searchQuery]);
+
+  const handleSuggestion = (suggestion: Suggestion) => {
+    if (suggestion.kind === 'album' && suggestion.id !== null) {
+      navigate(`/albums/${suggestion.id}`);
+      return;
+    }
+    setSearchQuery(suggestion.text);
+  };
+
   const fetchLikedSongs = async () => {
     try {
       const likedRes = await api.get('/songs/liked/all');
@@ -51,15 +83,17 @@ export const Search: React.FC = () => {
     try {
       setLoading(true);
       setHasSearched(true);
-      const response = await api.get('/songs/', {
+      setSuggestions([]);
+      // Canciones, álbumes y creadores en una sola petición
+      const response = await api.get<SearchResults>('/search', {
         params: {
-          search: searchQuery,
-          approved_only: true,
-          order_by: 'play_count',
+          q: searchQuery,
           limit: 50
         }
       });
-      setSongs(response.data);
+      setSongs(response.data.songs);
+      setAlbums(response.data.albums.slice(0, 10));
+      setCreators(response.data.creators.slice(0, 10));
     } catch (error) {
       console.error('Error:', error);
       toast.error('Error al buscar canciones');
@@ -125,6 +159,24 @@ export const Search: React.FC = () => {
             className="w-full bg-gruvbox-bg1 text-gruvbox-fg placeholder-gruvbox-fg4 pl-14 pr-6 py-4 rounded-xl border-2 border-gruvbox-aqua/20 focus:border-gruvbox-aqua focus:outline-none transition-colors text-lg"
             autoFocus
           />
+          {suggestions.length > 0 && !loading && (
+            <ul className="absolute left-0 right-0 mt-2 rounded-xl bg-gruvbox-bg1 border border-gruvbox-aqua/20 overflow-hidden">
+              {suggestions.map((suggestion) => (
+                <li
+                  key={`${suggestion.kind}-${suggestion.id ?? suggestion.text}`}
+                  onClick={() => handleSuggestion(suggestion)}
+                  className="flex items-center gap-3 px-5 py-3 cursor-pointer hover:bg-gruvbox-aqua/10"
+                >
+                  {suggestion.kind === 'artist' ? (
+                    <UserIcon className="w-5 h-5 text-gruvbox-fg4" />
+                  ) : (
+                    <Music className="w-5 h-5 text-gruvbox-fg4" />
+                  )}
+                  <span className="text-gruvbox-fg truncate">{suggestion.text}</span>
+                </li>
+              ))}
+            </ul>
+          )}
         </div>
       </motion.div>
 
@@ -139,7 +191,7 @@ export const Search: React.FC = () => {
       )}
 
       {/* No Results */}
-      {hasSearched && !loading && songs.length === 0 && (
+      {hasSearched && !loading && songs.length === 0 && albums.length === 0 && creators.length === 0 && (
         <div className="text-center py-20">
           <SearchIcon className="w-20 h-20 text-gruvbox-fg4 mx-auto mb-4" />
           <h3 className="text-2xl font-bold text-gruvbox-fg mb-2">
@@ -151,6 +203,65 @@ export const Search: React.FC = () => {
         </div>
       )}
 
+      {/* Creadores */}
+      {creators.length > 0 && !loading && (
+        <div>
+          <h2 className="text-2xl font-bold text-gruvbox-fg mb-6">Artistas</h2>
+          <div className="flex flex-wrap gap-3">
+            {creators.map((creator) => (
+              <div
+                key={creator.id}
+                className="flex items-center gap-3 px-4 py-2 rounded-full bg-gruvbox-bg1 border border-gruvbox-aqua/20"
+              >
+                {creator.profile_picture ? (
+                  <img
+                    src={getFileUrl(creator.profile_picture)}
+                    alt={creator.username}
+                    className="w-8 h-8 rounded-full object-cover"
+                  />
+                ) : (
+                  <UserIcon className="w-8 h-8 p-1 rounded-full bg-gruvbox-bg2 text-gruvbox-fg4" />
+                )}
+                <span className="font-semibold text-gruvbox-fg">{creator.username}</span>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
+      {/* Álbumes */}
+      {albums.length > 0 && !loading && (
+        <div>
+          <h2 className="text-2xl font-bold text-gruvbox-fg mb-6">Álbumes</h2>
+          <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-5 gap-6">
+            {albums.map((album) => (
+              <div
+                key={album.id}
+                onClick={() => navigate(`/albums/${album.id}`)}
+                className="group cursor-pointer"
+              >
+                <div className="aspect-square rounded-lg overflow-hidden bg-gruvbox-bg2 mb-3 border-2 border-gruvbox-aqua/20">
+                  {album.cover_image ? (
+                    <img
+                      src={`http://127.0.0.1:8000/albums/${album.id}/cover?size=300`}
+                      alt={album.title}
+                      className="w-full h-full object-cover transition-transform duration-300 group-hover:scale-110"
+                    />
+                  ) : (
+                    <div className="w-full h-full flex items-center justify-center">
+                      <Music className="w-12 h-12 text-gruvbox-fg4" />
+                    </div>
+                  )}
+                </div>
+                <h3 className="font-semibold text-gruvbox-fg truncate group-hover:text-gruvbox-aqua transition-colors">
+                  {album.title}
+                </h3>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Results */}
       {songs.length > 0 && !loading && (
         <div>
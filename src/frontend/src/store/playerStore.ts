@@ -34,10 +34,10 @@ export const usePlayerStore = create<PlayerState>((set, get) => ({
       howl.unload();
     }
 
-    // Construir URL completa para el audio
+    // Construir URL completa para el audio (endpoint de streaming con soporte de rangos)
     const audioUrl = song.file_path.startsWith('http') 
       ? song.file_path 
-      : `http://127.0.0.1:8000${song.file_path}`;
+      : `http://127.0.0.1:8000/stream/${song.id}`;
 
     const newHowl = new Howl({
       src: [audioUrl],
@@ -72,10 +72,10 @@ export const usePlayerStore = create<PlayerState>((set, get) => ({
 
     const song = songs[startIndex];
     
-    // Construir URL completa para el audio
+    // Construir URL completa para el audio (endpoint de streaming con soporte de rangos)
     const audioUrl = song.file_path.startsWith('http') 
       ? song.file_path 
-      : `http://127.0.0.1:8000${song.file_path}`;
+      : `http://127.0.0.1:8000/stream/${song.id}`;
 
     const newHowl = new Howl({
       src: [audioUrl],
@@ -35,6 +35,27 @@ export interface Album {
   songs: Song[];
 }
 
+export type AlbumSummary = Omit<Album, 'songs'>;
+
+export interface Creator {
+  id: number;
+  username: string;
+  role: 'creator' | 'admin';
+  profile_picture?: string;
+}
+
+export interface Suggestion {
+  kind: 'song' | 'artist' | 'album';
+  id: number | null;
+  text: string;
+}
+
+export interface SearchResults {
+  songs: Song[];
+  albums: AlbumSummary[];
+  creators: Creator[];
+}
+
 export interface Playlist {
   id: number;
   name: string;